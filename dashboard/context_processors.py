@@ -1,3 +1,5 @@
+from django.utils.functional import SimpleLazyObject
+
 from .models import ClubGeneralSettings
 
 def club_settings(request):
@@ -20,8 +22,11 @@ def club_settings(request):
 from .models import ClubTeamMember
 
 def current_members(request):
-    if request.user.is_authenticated:
-        members = ClubTeamMember.objects.select_related("role", "user_account")
-    else:
-        members = []
-    return {"members": members}
+    # Evaluated only by templates that use it, so public pages don't load
+    # the session (and send Vary: Cookie) just to check the user
+    def members():
+        if request.user.is_authenticated:
+            return ClubTeamMember.objects.select_related("role", "user_account")
+        return []
+
+    return {"members": SimpleLazyObject(members)}
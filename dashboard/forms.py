@@ -1,8 +1,14 @@
+from datetime import timedelta
+
 from django import forms
+from django.utils import timezone
 from .models import ClubGeneralSettings, ClubTeamMember, ClubRole, ClubIntegrationSettings
 from django.contrib.auth.models import User
 from django.forms import inlineformset_factory
 from .models import ClubGeneralSettings, MenuItem, SocialLink
+from .export import FORMATS
+from .report import DEFAULT_RANGE, GRANULARITIES, RANGES
+from .rollups import SECTIONS
 
 
 class ClubGeneralSettingsForm(forms.ModelForm):
@@ -141,3 +147,50 @@ class ClubIntegrationSettingsForm(forms.ModelForm):
     class Meta:
         model = ClubIntegrationSettings
         fields = "__all__"
+
+
+class AnalyticsExportForm(forms.Form):
+    """Query parameters of the raw analytics export (see dashboard/export.py)."""
+    dataset = forms.ChoiceField(
+        choices=[("pageviews", "Page views"), ("sessions", "Visitor sessions")],
+        required=False,
+    )
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    section = forms.ChoiceField(choices=[("", "All")] + [(name, name) for name in SECTIONS], required=False)
+    format = forms.ChoiceField(choices=[(fmt, fmt.upper()) for fmt in FORMATS], required=False)
+    gzip = forms.BooleanField(required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        today = timezone.localdate()
+        cleaned["dataset"] = cleaned.get("dataset") or "pageviews"
+        cleaned["format"] = cleaned.get("format") or "csv"
+        cleaned["end"] = cleaned.get("end") or today
+        cleaned["start"] = cleaned.get("start") or cleaned["end"] - timedelta(days=7)
+        if cleaned["start"] > cleaned["end"]:
+            raise forms.ValidationError("The start date must not be after the end date.")
+        return cleaned
+
+
+class AnalyticsRangeForm(forms.Form):
+    """Date range, granularity and comparison toggle of the analytics dashboard."""
+    range = forms.ChoiceField(choices=list(RANGES.items()), required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    granularity = forms.ChoiceField(choices=list(GRANULARITIES.items()), required=False)
+    compare = forms.BooleanField(required=False)
+    # URL pattern name whose top objects are listed, e.g. "news:news_detail"
+    route = forms.CharField(max_length=100, required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        cleaned["range"] = cleaned.get("range") or DEFAULT_RANGE
+        cleaned["granularity"] = cleaned.get("granularity") or "day"
+        if cleaned["range"] == "custom":
+            start, end = cleaned.get("start"), cleaned.get("end")
+            if not start or not end:
+                raise forms.ValidationError("A custom range needs a start and an end date.")
+            if start > end:
+                raise forms.ValidationError("The start date must not be after the end date.")
+        return cleaned
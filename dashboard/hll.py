@@ -0,0 +1,90 @@
+"""
+HyperLogLog sketches for approximate distinct counts.
+
+A sketch keeps one small register per hash bucket instead of the values
+themselves, so it has a fixed size (REGISTERS bytes) however many values go
+in. Two sketches merge by taking the register-wise maximum, and the merged
+sketch counts the union, which is how unique visitors over any date range
+are answered from per-day sketches (see rollups.py).
+
+Error bound: with PRECISION = 12 (4096 registers) the relative standard
+error is 1.04 / sqrt(4096), about 1.6%. About 99% of estimates fall
+within three standard errors (about 4.9%) of the exact count. Below
+roughly 10,000 distinct values the estimate switches to linear counting,
+which is usually closer than that. A handful of values is counted
+exactly.
+"""
+
+import hashlib
+import math
+
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+# Bias correction constant for REGISTERS >= 128
+ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+_HASH_BITS = 64
+_REST_BITS = _HASH_BITS - PRECISION
+_REST_MASK = (1 << _REST_BITS) - 1
+_POWERS = [2.0 ** -rank for rank in range(_REST_BITS + 2)]
+
+
+def _hash(value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8, person=b"hll").digest()
+    return int.from_bytes(digest, "big")
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch; see the module docstring for accuracy."""
+
+    __slots__ = ("registers",)
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers else bytearray(REGISTERS)
+        if len(self.registers) != REGISTERS:
+            raise ValueError(f"Expected {REGISTERS} registers, got {len(self.registers)}.")
+
+    @classmethod
+    def union(cls, sketches):
+        """A new sketch counting every value added to any of ``sketches``."""
+        registers = [sketch.registers for sketch in sketches]
+        if not registers:
+            return cls()
+        if len(registers) == 1:
+            return cls(registers[0])
+        return cls(bytes(map(max, *registers)))
+
+    def add(self, value):
+        hashed = _hash(value)
+        index = hashed >> _REST_BITS
+        # Position of the first 1 bit in the remaining bits
+        rank = _REST_BITS - (hashed & _REST_MASK).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """Estimated number of distinct values added (a float)."""
+        zeros = self.registers.count(0)
+        if zeros == REGISTERS:
+            return 0.0
+        estimate = ALPHA * REGISTERS * REGISTERS / sum(map(_POWERS.__getitem__, self.registers))
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            return REGISTERS * math.log(REGISTERS / zeros)
+        return estimate
+
+    def __len__(self):
+        return round(self.count())
+
+    def to_bytes(self):
+        return bytes(self.registers)
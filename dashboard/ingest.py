@@ -0,0 +1,476 @@
+"""
+Write-behind ingestion for analytics hits.
+
+AnalyticsMiddleware turns every tracked request into a small "hit" dict and
+hands it to the module-level ``hit_buffer``. The buffer keeps hits in a
+bounded in-process queue; a background flusher thread drains it every
+``FLUSH_INTERVAL_MS`` or as soon as ``FLUSH_BATCH_SIZE`` hits are waiting,
+and writes the whole batch with ``bulk_create`` / ``bulk_update`` inside a
+single transaction. That keeps SQLite's single writer lock off the request
+thread.
+
+Configuration lives in ``settings.ANALYTICS_BUFFER``:
+    - ENABLED: queue hits (True) or write them on the request thread (False).
+    - MAX_SIZE: maximum number of hits held in memory.
+    - FLUSH_INTERVAL_MS / FLUSH_BATCH_SIZE: flush triggers.
+    - ON_FULL: "drop" the hit, or "block" up to BLOCK_TIMEOUT_MS then drop.
+
+Returning sessions are not updated on every hit: ``session_heartbeats``
+keeps their last-seen time and page-count delta in memory and writes each
+session at most once every ``settings.ANALYTICS_HEARTBEAT_SECONDS``.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BotTraffic, PageView, ReferrerHost, UrlPath, UserAgent, VisitorSession
+from .routers import analytics_db
+from .tracking import route_for_path
+from .ua import is_bot, parse_user_agent
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    "ENABLED": False,
+    "MAX_SIZE": 10000,
+    "FLUSH_INTERVAL_MS": 1000,
+    "FLUSH_BATCH_SIZE": 500,
+    "ON_FULL": "drop",
+    "BLOCK_TIMEOUT_MS": 50,
+}
+
+
+def get_buffer_config():
+    return {**DEFAULTS, **getattr(settings, "ANALYTICS_BUFFER", {})}
+
+
+class DimensionCache:
+    """
+    In-process {value: row} cache for one of the analytics dimension tables.
+
+    Values missing from the cache are looked up, and created when new, in
+    bulk. Rows are only cached outside atomic blocks, so an insert that gets
+    rolled back can never leave a dangling id in the cache.
+    """
+
+    def __init__(self, model, field, build=None, max_size=5000):
+        self.model = model
+        self.field = field
+        self.build = build or (lambda value: model(**{field: value}))
+        self.max_size = max_size
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, values):
+        values = set(values)
+        with self._lock:
+            found = {value: self._rows[value] for value in values if value in self._rows}
+
+        missing = values - found.keys()
+        if missing:
+            rows = self.model.objects.in_bulk(list(missing), field_name=self.field)
+            new = missing - rows.keys()
+            if new:
+                self.model.objects.bulk_create(
+                    [self.build(value) for value in new], ignore_conflicts=True
+                )
+                rows.update(self.model.objects.in_bulk(list(new), field_name=self.field))
+            found.update(rows)
+
+            if not transaction.get_connection(analytics_db()).in_atomic_block:
+                with self._lock:
+                    if len(self._rows) + len(rows) > self.max_size:
+                        self._rows.clear()
+                    self._rows.update(rows)
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+def _build_user_agent(user_agent_string):
+    # Only reached the first time a user-agent string is ever seen
+    ua = parse_user_agent(user_agent_string)
+    return UserAgent(
+        user_agent=user_agent_string,
+        device_type=ua.device_type,
+        browser=ua.browser,
+        operating_system=ua.operating_system,
+        is_bot=is_bot(user_agent_string),
+    )
+
+
+def _build_url_path(path):
+    # Route and object key are resolved once per path, when it is first seen
+    route, object_key = route_for_path(path)
+    return UrlPath(path=path, route=route[:100], object_key=object_key[:255])
+
+
+user_agent_dimension = DimensionCache(UserAgent, "user_agent", build=_build_user_agent)
+url_path_dimension = DimensionCache(UrlPath, "path", build=_build_url_path)
+referrer_host_dimension = DimensionCache(ReferrerHost, "host")
+
+
+def clear_dimension_caches():
+    for cache in (user_agent_dimension, url_path_dimension, referrer_host_dimension):
+        cache.clear()
+
+
+class SessionHeartbeats:
+    """
+    Rate-limited end_time / page_count writes for returning sessions.
+
+    A session is written at most once every ``interval`` seconds, with a
+    narrow ``update(end_time=..., page_count=F("page_count") + n)``. Hits
+    in between only move its last-seen time and page-count delta in
+    memory. Pending values are written once the interval has passed (on
+    the next batch or buffer flush) and when the process stops.
+    """
+
+    def __init__(self, interval=None):
+        if interval is None:
+            interval = getattr(settings, "ANALYTICS_HEARTBEAT_SECONDS", 30)
+        self.interval = interval
+        self._pending = {}  # session id -> [last seen, page views]
+        self._written = {}  # session id -> monotonic time of the last write
+        self._lock = threading.Lock()
+
+    def created(self, session_ids):
+        """Sessions just inserted with their first hits count as written."""
+        now = time.monotonic()
+        with self._lock:
+            for session_id in session_ids:
+                self._written[session_id] = now
+
+    def record(self, session_id, last_seen, page_views):
+        with self._lock:
+            pending = self._pending.setdefault(session_id, [last_seen, 0])
+            pending[0] = max(pending[0], last_seen)
+            pending[1] += page_views
+
+    def take_due(self, force=False):
+        """Remove and return {session id: [last seen, page views]} ready to write."""
+        now = time.monotonic()
+        cutoff = now - self.interval
+        with self._lock:
+            due = {
+                session_id: pending
+                for session_id, pending in self._pending.items()
+                if force or self._written.get(session_id, cutoff) <= cutoff
+            }
+            for session_id in due:
+                del self._pending[session_id]
+                self._written[session_id] = now
+            # Forget write times that no longer rate-limit anything
+            self._written = {
+                session_id: written for session_id, written in self._written.items()
+                if written > cutoff or session_id in self._pending
+            }
+        return due
+
+    def restore(self, due):
+        """Put entries from a failed write back so they are retried."""
+        for session_id, (last_seen, page_views) in due.items():
+            self.record(session_id, last_seen, page_views)
+
+    def write(self, due):
+        for session_id, (last_seen, page_views) in due.items():
+            VisitorSession.objects.filter(id=session_id).update(
+                end_time=last_seen, page_count=F("page_count") + page_views
+            )
+
+    def flush(self, force=False):
+        """Write the due entries in their own transaction."""
+        due = self.take_due(force=force)
+        if not due:
+            return 0
+        try:
+            with transaction.atomic(using=analytics_db()):
+                self.write(due)
+        except Exception:
+            self.restore(due)
+            raise
+        return len(due)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._written.clear()
+
+
+session_heartbeats = SessionHeartbeats()
+
+
+def recount_page_views(sessions=None):
+    """Recompute VisitorSession.page_count from the stored page views."""
+    sessions = VisitorSession.objects.all() if sessions is None else sessions
+    counts = (
+        PageView.objects.filter(visitor_session=OuterRef("pk"))
+        .order_by()
+        .values("visitor_session")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return sessions.update(page_count=Coalesce(Subquery(counts), 0))
+
+
+def count_bot_hits(days):
+    """Add {day: hits} onto BotTraffic: one INSERT OR IGNORE, then one UPDATE per day."""
+    with transaction.atomic(using=analytics_db()):
+        BotTraffic.objects.bulk_create([BotTraffic(day=day) for day in days], ignore_conflicts=True)
+        for day, count in days.items():
+            BotTraffic.objects.filter(day=day).update(hits=F("hits") + count)
+
+
+def write_hits(hits):
+    """
+    Persist a batch of hits.
+
+    Bot hits (``{"bot": True, "timestamp": ...}``, see AnalyticsMiddleware)
+    only bump the per-day BotTraffic counter. Page views are written in one
+    transaction:
+
+    - User agents, URL paths and referrer hosts are resolved to dimension
+      rows first (normally straight from the in-process cache). A user
+      agent is only parsed the first time it is ever seen.
+    - One SELECT for the sessions already known.
+    - One bulk INSERT for new sessions (conflicts ignored, so two workers
+      creating the same session is harmless) and one SELECT to get their ids.
+    - Returning sessions go through session_heartbeats; only those whose
+      heartbeat is due get a narrow UPDATE.
+    - One bulk INSERT for the page views.
+    """
+    bot_days = Counter(timezone.localdate(hit["timestamp"]) for hit in hits if hit.get("bot"))
+    if bot_days:
+        count_bot_hits(bot_days)
+        hits = [hit for hit in hits if not hit.get("bot")]
+    if not hits:
+        return sum(bot_days.values())
+
+    # Group hits by session so each session is created/updated once
+    by_session = {}
+    for hit in hits:
+        by_session.setdefault(hit["session_key"], []).append(hit)
+
+    agents = user_agent_dimension.resolve(
+        session_hits[0]["user_agent"] for session_hits in by_session.values()
+    )
+    paths = url_path_dimension.resolve(hit["url"] for hit in hits)
+    hosts = referrer_host_dimension.resolve(
+        hit["referrer_host"] for hit in hits if hit["referrer_host"]
+    )
+
+    due = {}
+    try:
+        with transaction.atomic(using=analytics_db()):
+            sessions = VisitorSession.objects.in_bulk(
+                list(by_session), field_name="session_key"
+            )
+
+            new_keys = [key for key in by_session if key not in sessions]
+            if new_keys:
+                new_sessions = []
+                for key in new_keys:
+                    first, last = by_session[key][0], by_session[key][-1]
+                    agent = agents[first["user_agent"]]
+                    new_sessions.append(VisitorSession(
+                        session_key=key,
+                        start_time=first["timestamp"],
+                        end_time=last["timestamp"] if len(by_session[key]) > 1 else None,
+                        page_count=len(by_session[key]),
+                        sample_rate=first.get("sample_rate", 1),
+                        ip_address=first["ip_address"],
+                        user_agent=agent,
+                        device_type=agent.device_type,
+                        browser=agent.browser,
+                        operating_system=agent.operating_system,
+                    ))
+                VisitorSession.objects.bulk_create(new_sessions, ignore_conflicts=True)
+                created = VisitorSession.objects.in_bulk(new_keys, field_name="session_key")
+                sessions.update(created)
+                session_heartbeats.created(session.id for session in created.values())
+
+            # Returning sessions: coalesced end_time / page_count heartbeat
+            for key, session_hits in by_session.items():
+                if key not in new_keys:
+                    session_heartbeats.record(
+                        sessions[key].id, session_hits[-1]["timestamp"], len(session_hits)
+                    )
+            due = session_heartbeats.take_due()
+            session_heartbeats.write(due)
+
+            PageView.objects.bulk_create([
+                PageView(
+                    path=paths[hit["url"]],
+                    timestamp=hit["timestamp"],
+                    referrer=hit["referrer"],
+                    traffic_source=hit["traffic_source"],
+                    referrer_host=hosts.get(hit["referrer_host"]),
+                    sample_rate=hit.get("sample_rate", 1),
+                    visitor_session=sessions.get(hit["session_key"]),
+                )
+                for hit in hits
+            ])
+    except Exception:
+        # Heartbeats taken inside a rolled-back transaction were never written
+        session_heartbeats.restore(due)
+        raise
+
+    return len(hits) + sum(bot_days.values())
+
+
+class HitBuffer:
+    """Bounded queue of hits drained by a background flusher thread."""
+
+    def __init__(self, max_size=None, flush_interval_ms=None, flush_batch_size=None,
+                 on_full=None, block_timeout_ms=None):
+        config = get_buffer_config()
+        self.max_size = max_size or config["MAX_SIZE"]
+        self.flush_interval = (flush_interval_ms or config["FLUSH_INTERVAL_MS"]) / 1000
+        self.flush_batch_size = flush_batch_size or config["FLUSH_BATCH_SIZE"]
+        self.on_full = on_full or config["ON_FULL"]
+        self.block_timeout = (block_timeout_ms or config["BLOCK_TIMEOUT_MS"]) / 1000
+
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    # ---------------- producer side ----------------
+
+    def enqueue(self, hit, autostart=True):
+        """Queue a hit. Returns False if it had to be dropped."""
+        try:
+            if self.on_full == "block":
+                self._queue.put(hit, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(hit)
+        except queue.Full:
+            self._count("dropped", 1)
+            return False
+
+        self._count("queued", 1)
+        if self._queue.qsize() >= self.flush_batch_size:
+            self._wakeup.set()
+        if autostart:
+            self.start()
+        return True
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queued": self.queued,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self._queue.qsize(),
+            }
+
+    # ---------------- consumer side ----------------
+
+    def flush(self):
+        """Synchronously drain everything currently queued."""
+        total = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.flush_batch_size)
+                if not batch:
+                    break
+                total += self._write(batch)
+            self._write_heartbeats(force=self._stop.is_set())
+        return total
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="analytics-flusher", daemon=True
+            )
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout=5):
+        """Stop the flusher and write whatever is still queued."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+        finally:
+            connections.close_all()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        started = time.monotonic()
+        try:
+            written = write_hits(batch)
+        except Exception:
+            logger.exception("Failed to flush %d analytics hits", len(batch))
+            clear_dimension_caches()
+            self._count("failed", len(batch))
+            return 0
+        self._count("flushed", written)
+        logger.debug(
+            "Flushed %d analytics hits in %.1f ms",
+            written, (time.monotonic() - started) * 1000,
+        )
+        return written
+
+    def _write_heartbeats(self, force=False):
+        # Sessions that went quiet still get their last heartbeat written
+        try:
+            session_heartbeats.flush(force=force)
+        except Exception:
+            logger.exception("Failed to write analytics session heartbeats")
+
+    def _count(self, name, amount):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+
+hit_buffer = HitBuffer()
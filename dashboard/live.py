@@ -0,0 +1,199 @@
+"""
+Real-time "active visitors" counter kept in memory.
+
+``ActiveVisitors`` is a ring buffer of WINDOW_SECONDS one-second buckets.
+Each bucket holds the set of visitor ids seen in that second.
+AnalyticsMiddleware records every tracked, non-bot page view before the
+sampling decision, so the live figure is not an estimate. The count is
+the size of the union of the buckets still inside the window, and
+reading it never touches the database.
+
+With several worker processes, each one only sees its own requests. When
+SHARED is on, a background thread publishes this worker's window every
+PUBLISH_SECONDS as a HyperLogLog sketch (see hll.py) to a LiveVisitors
+row in the analytics database. ``live_count()`` merges the fresh sketches
+of every worker, so a visitor whose requests land on two workers is still
+counted once. Workers that stop publishing drop out after STALE_SECONDS.
+
+Configuration lives in ``settings.ANALYTICS_LIVE``:
+    - WINDOW_SECONDS: how far back a visitor counts as active.
+    - SHARED: publish to and merge with the other workers.
+    - PUBLISH_SECONDS: how often a worker publishes its window.
+    - STALE_SECONDS: age after which a worker's published window is ignored.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import LiveVisitors
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    "WINDOW_SECONDS": 300,
+    "SHARED": False,
+    "PUBLISH_SECONDS": 5,
+    "STALE_SECONDS": 30,
+}
+
+
+def get_live_config():
+    return {**DEFAULTS, **getattr(settings, "ANALYTICS_LIVE", {})}
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ActiveVisitors:
+    """Distinct visitor ids seen in the last ``window`` seconds, in memory."""
+
+    def __init__(self, window=None):
+        self.window = window or get_live_config()["WINDOW_SECONDS"]
+        self._seconds = [None] * self.window
+        self._buckets = [set() for _ in range(self.window)]
+        self._lock = threading.Lock()
+
+    def record(self, visitor_id, now=None):
+        second = int(time.time() if now is None else now)
+        index = second % self.window
+        with self._lock:
+            if self._seconds[index] != second:
+                # The slot still holds a second that fell out of the window
+                self._seconds[index] = second
+                self._buckets[index] = set()
+            self._buckets[index].add(visitor_id)
+
+    def visitors(self, now=None):
+        oldest = int(time.time() if now is None else now) - self.window
+        seen = set()
+        with self._lock:
+            for second, bucket in zip(self._seconds, self._buckets):
+                if second is not None and second > oldest:
+                    seen |= bucket
+        return seen
+
+    def count(self, now=None):
+        return len(self.visitors(now))
+
+    def sketch(self, now=None):
+        sketch = HyperLogLog()
+        sketch.update(self.visitors(now))
+        return sketch
+
+    def clear(self):
+        with self._lock:
+            self._seconds = [None] * self.window
+            self._buckets = [set() for _ in range(self.window)]
+
+
+active_visitors = ActiveVisitors()
+
+
+# ============================
+#  Sharing between workers
+# ============================
+
+def publish():
+    """Write this worker's current window to its LiveVisitors row."""
+    config = get_live_config()
+    now = timezone.now()
+    sketch = active_visitors.sketch()
+    LiveVisitors.objects.bulk_create(
+        [LiveVisitors(worker=worker_id(), registers=sketch.to_bytes(), visitors=len(sketch), updated_at=now)],
+        update_conflicts=True,
+        unique_fields=["worker"],
+        update_fields=["registers", "visitors", "updated_at"],
+    )
+    # Rows of workers that are long gone
+    LiveVisitors.objects.filter(
+        updated_at__lt=now - timedelta(seconds=config["STALE_SECONDS"] * 10)
+    ).delete()
+
+
+class LivePublisher:
+    """Background thread calling publish() every PUBLISH_SECONDS."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="analytics-live", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop.wait(get_live_config()["PUBLISH_SECONDS"]):
+                try:
+                    publish()
+                except Exception:
+                    logger.exception("Failed to publish live visitor counts")
+        finally:
+            connections.close_all()
+
+
+live_publisher = LivePublisher()
+
+
+def record_visit(visitor_id):
+    """Count ``visitor_id`` as active now (called by AnalyticsMiddleware)."""
+    active_visitors.record(visitor_id)
+    if get_live_config()["SHARED"]:
+        live_publisher.start()
+
+
+def live_count():
+    """
+    Active visitors over the window, across workers when SHARED is on.
+
+    Returns {"active_visitors", "workers", "window_seconds"}. Without
+    SHARED this is exact and needs no query; with it, the other workers'
+    sketches are read in one small query and the union is an estimate.
+    """
+    config = get_live_config()
+    visitors = active_visitors.visitors()
+    result = {"active_visitors": len(visitors), "workers": 1, "window_seconds": active_visitors.window}
+    if not config["SHARED"]:
+        return result
+
+    others = list(
+        LiveVisitors.objects.filter(
+            updated_at__gte=timezone.now() - timedelta(seconds=config["STALE_SECONDS"])
+        ).exclude(worker=worker_id()).values_list("registers", flat=True)
+    )
+    if others:
+        local = HyperLogLog()
+        local.update(visitors)
+        union = HyperLogLog.union([local] + [HyperLogLog(registers) for registers in others])
+        result["active_visitors"] = len(union)
+        result["workers"] += len(others)
+    return result
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.retention import aggregate_archive_parts, archive_parts, get_retention_config
+from dashboard.rollups import SECTIONS
+
+
+def month(value):
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+class Command(BaseCommand):
+    help = "Aggregate archived page views (see apply_retention) straight from the archive files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            default=None,
+            help='Archive directory (default: ANALYTICS_RETENTION["DIRECTORY"])',
+        )
+        parser.add_argument(
+            '--start',
+            type=month,
+            help='First month to read, YYYY-MM',
+        )
+        parser.add_argument(
+            '--end',
+            type=month,
+            help='Last month to read, YYYY-MM',
+        )
+        parser.add_argument(
+            '--section',
+            choices=list(SECTIONS),
+            help='Only count page views of this site section',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Number of top pages to list',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the figures as JSON',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or get_retention_config()['DIRECTORY']
+        parts = [
+            part for part in archive_parts(directory)
+            if (not options['start'] or part.month >= options['start'])
+            and (not options['end'] or part.month <= options['end'])
+        ]
+        if not parts:
+            raise CommandError(f"No archive parts found in {directory} for that range.")
+
+        figures = aggregate_archive_parts(parts, section=options['section'], top=options['top'])
+
+        if options['json']:
+            figures['monthly'] = [[f"{m:%Y-%m}", hits] for m, hits in figures['monthly']]
+            self.stdout.write(json.dumps(figures, indent=2))
+            return
+
+        self.stdout.write(f"Page views: {figures['page_views']}")
+        self.stdout.write(f"Unique visitors (estimate): {figures['unique_visitors']}")
+        self.stdout.write("By month:")
+        for m, hits in figures['monthly']:
+            self.stdout.write(f"  {m:%Y-%m}  {hits}")
+        self.stdout.write("Traffic sources:")
+        for source, hits in figures['traffic_sources'].items():
+            self.stdout.write(f"  {source}  {hits}")
+        self.stdout.write("Top pages:")
+        for url, hits in figures['top_pages']:
+            self.stdout.write(f"  {hits:>8}  {url}")
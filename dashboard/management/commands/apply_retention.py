@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.retention import RetentionError, apply_retention, get_retention_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive page views older than the retention period to monthly gzip NDJSON files, "
+        "then delete them in small batches (run periodically, e.g. from cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Retention period in days (default: ANALYTICS_RETENTION["DAYS"])',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows read from the database at a time while archiving',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows each month would archive',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = apply_retention(
+                days=options['days'], dry_run=options['dry_run'], chunk_size=options['chunk_size']
+            )
+        except RetentionError as e:
+            raise CommandError(str(e))
+
+        for result in results:
+            if options['dry_run']:
+                self.stdout.write(f"{result['month']:%Y-%m}: would archive {result['archived']} page views.")
+            else:
+                self.stdout.write(
+                    f"{result['month']:%Y-%m}: archived {result['archived']}, "
+                    f"deleted {result['deleted']} page views."
+                )
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Retention applied; archives are in {get_retention_config()['DIRECTORY']}."
+            ))
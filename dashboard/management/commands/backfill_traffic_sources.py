@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from dashboard.ingest import referrer_host_dimension
+from dashboard.models import PageView
+from dashboard.routers import analytics_db
+from dashboard.traffic import classify_referrer
+
+
+class Command(BaseCommand):
+    help = "Classify traffic_source / referrer_host for page views recorded before ingest-time classification"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of page views classified per transaction',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        own_hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+
+        last_id = 0
+        updated = 0
+        while True:
+            rows = list(
+                PageView.objects.filter(id__gt=last_id, traffic_source='')
+                .order_by('id')
+                .values_list('id', 'referrer')[:chunk_size]
+            )
+            if not rows:
+                break
+
+            classified = [
+                (pk, *classify_referrer(referrer, own_hosts=own_hosts))
+                for pk, referrer in rows
+            ]
+            hosts = referrer_host_dimension.resolve(host for _, _, host in classified if host)
+            page_views = [
+                PageView(id=pk, traffic_source=source, referrer_host=hosts.get(host))
+                for pk, source, host in classified
+            ]
+
+            with transaction.atomic(using=analytics_db()):
+                PageView.objects.bulk_update(page_views, ['traffic_source', 'referrer_host'])
+
+            last_id = rows[-1][0]
+            updated += len(rows)
+            self.stdout.write(f'Classified {updated} page views...')
+
+        self.stdout.write(self.style.SUCCESS(f'Classified {updated} page views.'))
+        if updated:
+            self.stdout.write('Run "manage.py rollup_analytics --rebuild" to refresh the traffic-source rollups.')
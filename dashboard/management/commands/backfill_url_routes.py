@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from dashboard.models import UrlPath
+from dashboard.routers import analytics_db
+from dashboard.tracking import route_for_path
+
+
+class Command(BaseCommand):
+    help = "Resolve route / object_key for URL paths recorded before route-level grouping"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of URL paths resolved per transaction',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        last_id = 0
+        updated = 0
+        while True:
+            rows = list(
+                UrlPath.objects.filter(id__gt=last_id, route='')
+                .order_by('id')
+                .values_list('id', 'path')[:chunk_size]
+            )
+            if not rows:
+                break
+
+            url_paths = []
+            for pk, path in rows:
+                route, object_key = route_for_path(path)
+                if route:
+                    url_paths.append(UrlPath(id=pk, route=route[:100], object_key=object_key[:255]))
+
+            with transaction.atomic(using=analytics_db()):
+                UrlPath.objects.bulk_update(url_paths, ['route', 'object_key'])
+
+            last_id = rows[-1][0]
+            updated += len(url_paths)
+            self.stdout.write(f'Resolved {updated} URL paths...')
+
+        self.stdout.write(self.style.SUCCESS(f'Resolved {updated} URL paths.'))
+        if updated:
+            self.stdout.write('Run "manage.py rollup_analytics --rebuild" to refresh the route rollups.')
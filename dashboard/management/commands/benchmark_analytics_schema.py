@@ -0,0 +1,293 @@
+"""
+Compare the legacy (wide) and compact (dimension table) analytics layouts.
+
+Each layout is built in a throwaway SQLite file with the same synthetic
+page views, then the file sizes and the timings of the raw dashboard
+queries are reported side by side. Nothing touches the project database.
+
+The compact layout indexes PageView.timestamp, so the legacy layout is
+also built with that index ("legacy+ts"). The change column compares the
+compact layout with legacy+ts: what normalization buys on its own.
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from dashboard.rollups import EXCLUDED_PREFIXES
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE session (
+    id INTEGER PRIMARY KEY, session_key VARCHAR(100) UNIQUE, start_time DATETIME,
+    end_time DATETIME, ip_address CHAR(39), user_agent TEXT,
+    device_type VARCHAR(50), browser VARCHAR(100), operating_system VARCHAR(100)
+);
+CREATE TABLE pageview (
+    id INTEGER PRIMARY KEY, url VARCHAR(500), timestamp DATETIME, ip_address CHAR(39),
+    user_agent TEXT, referrer VARCHAR(500), traffic_source VARCHAR(10),
+    referrer_host VARCHAR(255), session_key VARCHAR(100),
+    visitor_session_id INTEGER REFERENCES session (id)
+);
+CREATE INDEX pageview_source ON pageview (traffic_source);
+CREATE INDEX pageview_session ON pageview (visitor_session_id);
+"""
+
+TIMESTAMP_INDEX = """
+CREATE INDEX pageview_timestamp ON pageview (timestamp);
+"""
+
+COMPACT_SCHEMA = """
+CREATE TABLE useragent (
+    id INTEGER PRIMARY KEY, user_agent TEXT UNIQUE, device_type VARCHAR(50),
+    browser VARCHAR(100), operating_system VARCHAR(100), is_bot BOOL
+);
+CREATE TABLE urlpath (id INTEGER PRIMARY KEY, path VARCHAR(500) UNIQUE);
+CREATE TABLE referrerhost (id INTEGER PRIMARY KEY, host VARCHAR(255) UNIQUE);
+CREATE TABLE session (
+    id INTEGER PRIMARY KEY, session_key VARCHAR(100) UNIQUE, start_time DATETIME,
+    end_time DATETIME, ip_address CHAR(39), user_agent_id INTEGER REFERENCES useragent (id),
+    device_type VARCHAR(50), browser VARCHAR(100), operating_system VARCHAR(100)
+);
+CREATE TABLE pageview (
+    id INTEGER PRIMARY KEY, path_id INTEGER REFERENCES urlpath (id), timestamp DATETIME,
+    referrer VARCHAR(500), traffic_source VARCHAR(10),
+    referrer_host_id INTEGER REFERENCES referrerhost (id),
+    visitor_session_id INTEGER REFERENCES session (id)
+);
+CREATE INDEX pageview_source ON pageview (traffic_source);
+CREATE INDEX pageview_path ON pageview (path_id);
+CREATE INDEX pageview_host ON pageview (referrer_host_id);
+CREATE INDEX pageview_session ON pageview (visitor_session_id);
+""" + TIMESTAMP_INDEX
+
+USER_AGENTS = [
+    ("Mozilla/5.0 (Linux; Android 13; SM-A145F) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/120.0.0.0 Mobile Safari/537.36", "Mobile", "Chrome Mobile", "Android"),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 "
+     "(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1", "Mobile", "Mobile Safari", "iOS"),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/120.0.0.0 Safari/537.36", "Desktop", "Chrome", "Windows"),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0",
+     "Desktop", "Firefox", "Windows"),
+    ("Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+     "Version/16.6 Mobile/15E148 Safari/604.1", "Tablet", "Mobile Safari", "iOS"),
+]
+
+REFERRERS = [
+    (None, "direct", ""),
+    ("https://www.google.com/", "search", "google.com"),
+    ("https://m.facebook.com/", "social", "m.facebook.com"),
+    ("https://t.co/abc123", "social", "t.co"),
+    ("https://mail.google.com/mail/u/0/", "email", "mail.google.com"),
+    ("https://nugatafc.com/news/", "internal", "nugatafc.com"),
+]
+
+PATHS = (
+    ["/", "/news/", "/players/", "/standings/", "/standings/full/", "/dashboard/"]
+    + [f"/news/article-{i}/" for i in range(300)]
+    + [f"/players/player-{i}/" for i in range(60)]
+)
+
+HEADLINE = """
+SELECT COUNT(*), COUNT(DISTINCT p.visitor_session_id), {sections}
+FROM pageview p WHERE {tracked} AND p.timestamp BETWEEN ? AND ?
+"""
+TOP_PAGES = """
+SELECT {url}, COUNT(*) AS hits FROM pageview p {join}
+WHERE {tracked} AND p.timestamp BETWEEN ? AND ? GROUP BY 1 ORDER BY hits DESC LIMIT 10
+"""
+SOURCES = """
+SELECT p.traffic_source, COUNT(*) FROM pageview p
+WHERE {tracked} AND p.timestamp BETWEEN ? AND ? GROUP BY 1
+"""
+DEVICES = """
+SELECT s.device_type, COUNT(DISTINCT p.visitor_session_id) FROM pageview p
+JOIN session s ON s.id = p.visitor_session_id
+WHERE {tracked} AND p.timestamp BETWEEN ? AND ? GROUP BY 1
+"""
+QUERIES = (("headline", HEADLINE), ("top pages", TOP_PAGES), ("sources", SOURCES), ("devices", DEVICES))
+
+SECTION_PATTERNS = ("= '/'", "LIKE '/news/%'", "LIKE '/players/%'", "LIKE '/standings/%'")
+EXCLUDED = " OR ".join(f"{{column}} LIKE '{prefix}%'" for prefix in EXCLUDED_PREFIXES)
+
+# SQL fragments matching what the dashboard issues against each layout:
+# legacy compares p.url on every row, compact resolves the path test against
+# urlpath once and filters page views by path_id (see rollups.url_paths).
+LEGACY_QUERIES = {
+    "tracked": f"NOT ({EXCLUDED.format(column='p.url')})",
+    "sections": ", ".join(f"COUNT(*) FILTER (WHERE p.url {pattern})" for pattern in SECTION_PATTERNS),
+    "url": "p.url",
+    "join": "",
+}
+LAYOUTS = {
+    "legacy": {"schema": LEGACY_SCHEMA, **LEGACY_QUERIES},
+    "legacy+ts": {"schema": LEGACY_SCHEMA + TIMESTAMP_INDEX, **LEGACY_QUERIES},
+    "compact": {
+        "schema": COMPACT_SCHEMA,
+        "tracked": f"p.path_id NOT IN (SELECT id FROM urlpath WHERE {EXCLUDED.format(column='path')})",
+        "sections": ", ".join(
+            f"COUNT(*) FILTER (WHERE p.path_id IN (SELECT id FROM urlpath WHERE path {pattern}))"
+            for pattern in SECTION_PATTERNS
+        ),
+        "url": "u.path",
+        "join": "JOIN urlpath u ON u.id = p.path_id",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark database size and dashboard query time for the legacy and compact analytics schemas"
+
+    # The change column: compact against the legacy layout with the same indexes
+    BASELINE = "legacy+ts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1_000_000,
+            help='Number of synthetic page views',
+        )
+        parser.add_argument(
+            '--sessions',
+            type=int,
+            default=None,
+            help='Number of synthetic visitor sessions (default: rows / 4)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Days of history the page views are spread over (the dashboard reads the last 7)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per query; the best time is reported',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed for the synthetic data',
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        sessions = options['sessions'] or max(rows // 4, 1)
+        end = datetime(2025, 1, 31)
+        window = (str(end - timedelta(days=7)), str(end))
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, layout in LAYOUTS.items():
+                path = os.path.join(directory, f"{name}.sqlite3")
+                started = time.perf_counter()
+                self._build(path, name, layout, rows, sessions, end, options['days'], options['seed'])
+                self.stdout.write(f"Built {name} layout in {time.perf_counter() - started:.1f}s")
+                results[name] = {
+                    "size": os.path.getsize(path),
+                    **self._time_queries(path, layout, window, options['repeat']),
+                }
+
+        self.stdout.write(f"\n{rows:,} page views, {sessions:,} sessions\n")
+        self.stdout.write(f"{'':<16}" + "".join(f"{name:>12}" for name in LAYOUTS) + f"{'change':>10}")
+        for key in results["legacy"]:
+            if key == "size":
+                label, fmt = "size (MB)", lambda value: f"{value / 1_048_576:.1f}"
+            else:
+                label, fmt = f"{key} (ms)", lambda value: f"{value * 1000:.1f}"
+            before, after = results[self.BASELINE][key], results["compact"][key]
+            change = f"{(after - before) / before:+.0%}" if before else "-"
+            values = "".join(f"{fmt(results[name][key]):>12}" for name in LAYOUTS)
+            self.stdout.write(f"{label:<16}{values}{change:>10}")
+        self.stdout.write(f"change: compact against {self.BASELINE}")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark complete."))
+
+    # ============================
+    #  Synthetic data
+    # ============================
+
+    def _build(self, path, name, layout, rows, sessions, end, days, seed):
+        rng = random.Random(seed)
+        db = sqlite3.connect(path)
+        db.executescript(layout["schema"])
+        compact = name == "compact"
+
+        if compact:
+            db.executemany(
+                "INSERT INTO useragent VALUES (?, ?, ?, ?, ?, 0)",
+                [(i + 1, *ua) for i, ua in enumerate(USER_AGENTS)],
+            )
+            db.executemany("INSERT INTO urlpath VALUES (?, ?)", [(i + 1, p) for i, p in enumerate(PATHS)])
+            hosts = sorted({host for _, _, host in REFERRERS if host})
+            host_ids = {host: i + 1 for i, host in enumerate(hosts)}
+            db.executemany("INSERT INTO referrerhost VALUES (?, ?)", [(i, h) for h, i in host_ids.items()])
+
+        span = days * 24 * 3600
+        session_rows = []
+        for i in range(1, sessions + 1):
+            ua = rng.randrange(len(USER_AGENTS))
+            start = end - timedelta(seconds=rng.randrange(span))
+            session_rows.append((
+                i, f"{i:032x}", str(start), str(start + timedelta(minutes=5)),
+                f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+                ua + 1 if compact else USER_AGENTS[ua][0], *USER_AGENTS[ua][1:],
+            ))
+        db.executemany("INSERT INTO session VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", session_rows)
+
+        batch = []
+        for i in range(1, rows + 1):
+            session = session_rows[rng.randrange(sessions)]
+            url = rng.randrange(len(PATHS))
+            referrer, source, host = REFERRERS[rng.randrange(len(REFERRERS))]
+            timestamp = str(end - timedelta(seconds=rng.randrange(span)))
+            if compact:
+                batch.append((i, url + 1, timestamp, referrer, source, host_ids.get(host), session[0]))
+            else:
+                # ip_address and user_agent were copied from the session
+                batch.append((
+                    i, PATHS[url], timestamp, session[4], session[5],
+                    referrer, source, host, session[1], session[0],
+                ))
+            if len(batch) == 10000:
+                self._insert(db, batch)
+                batch = []
+        if batch:
+            self._insert(db, batch)
+
+        db.commit()
+        db.execute("VACUUM")
+        db.execute("ANALYZE")
+        db.close()
+
+    def _insert(self, db, batch):
+        placeholders = ", ".join("?" * len(batch[0]))
+        db.executemany(f"INSERT INTO pageview VALUES ({placeholders})", batch)
+
+    # ============================
+    #  Queries
+    # ============================
+
+    def _time_queries(self, path, layout, window, repeat):
+        db = sqlite3.connect(path)
+        timings = {}
+        for name, sql in QUERIES:
+            query = sql.format(**{key: layout[key] for key in ("tracked", "sections", "url", "join")})
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                db.execute(query, window).fetchall()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+        db.close()
+        return timings
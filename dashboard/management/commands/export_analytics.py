@@ -0,0 +1,91 @@
+import sys
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard.export import CHUNK_SIZE, COLUMNS, FORMATS, day_range, stream_export
+from dashboard.rollups import SECTIONS
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream raw page views or visitor sessions as CSV or NDJSON (optionally gzipped) "
+        "without loading them into memory, e.g. for sponsor reports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset',
+            choices=sorted(COLUMNS),
+            default='pageviews',
+            help='Rows to export',
+        )
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='First day to export, YYYY-MM-DD (default: 7 days before --end)',
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            help='Last day to export, YYYY-MM-DD (default: today)',
+        )
+        parser.add_argument(
+            '--section',
+            choices=list(SECTIONS),
+            help='Only page views of this site section (sessions: sessions that visited it)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            default='csv',
+            help='Output format',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip-compress the output',
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='File to write to (default: standard output)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Rows fetched from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        end_day = options['end'] or timezone.localdate()
+        start_day = options['start'] or end_day - timedelta(days=7)
+        if start_day > end_day:
+            raise CommandError("--start must not be after --end.")
+
+        start, end = day_range(start_day, end_day)
+        chunks = stream_export(
+            options['dataset'], start, end,
+            fmt=options['format'],
+            section=options['section'],
+            compress=options['gzip'],
+            chunk_size=options['chunk_size'],
+        )
+
+        if options['output'] == '-':
+            self._write(chunks, sys.stdout.buffer)
+            return
+
+        with open(options['output'], 'wb') as output:
+            written = self._write(chunks, output)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}."))
+
+    def _write(self, chunks, output):
+        written = 0
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+        output.flush()
+        return written
@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dashboard.models import (
+    AnalyticsRollup, BotTraffic, PageView, ReferrerHost, RollupState, UrlPath, UserAgent,
+    VisitorSession, VisitorSketch,
+)
+from dashboard.routers import analytics_db
+
+
+# Parents before children, so foreign keys always point at copied rows
+MODELS = (
+    UserAgent, UrlPath, ReferrerHost, VisitorSession, PageView, AnalyticsRollup, RollupState,
+    BotTraffic, VisitorSketch,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy analytics rows (page views, sessions, dimensions, rollups) from one database "
+        "to another, keeping their ids. Run after `migrate` and `migrate --database analytics`, "
+        "before the site starts writing to the analytics database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default='default',
+            help='Database alias to copy from',
+        )
+        parser.add_argument(
+            '--target',
+            default=None,
+            help='Database alias to copy to (default: ANALYTICS_DATABASE)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows copied per transaction',
+        )
+        parser.add_argument(
+            '--delete-source',
+            action='store_true',
+            help='Delete the copied rows from the source database afterwards',
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        target = options['target'] or analytics_db()
+        batch_size = options['batch_size']
+
+        if source == target:
+            raise CommandError(f"Source and target are both '{source}'.")
+        for model in MODELS:
+            if model.objects.using(target).exists():
+                raise CommandError(
+                    f"{model.__name__} already has rows in '{target}'; refusing to merge."
+                )
+
+        for model in MODELS:
+            copied = self._copy(model, source, target, batch_size)
+            self.stdout.write(f"{model.__name__}: {copied} rows copied.")
+
+        if options['delete_source']:
+            for model in reversed(MODELS):
+                self._delete(model, source, batch_size)
+            self.stdout.write(f"Deleted the copied rows from '{source}'.")
+
+        self.stdout.write(self.style.SUCCESS(f"Analytics data moved from '{source}' to '{target}'."))
+
+    def _copy(self, model, source, target, batch_size):
+        copied = 0
+        last_pk = 0
+        queryset = model.objects.using(source).order_by('pk')
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not rows:
+                return copied
+            with transaction.atomic(using=target):
+                model.objects.using(target).bulk_create(rows)
+            copied += len(rows)
+            last_pk = rows[-1].pk
+
+    def _delete(self, model, source, batch_size):
+        queryset = model.objects.using(source)
+        while True:
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return
+            queryset.filter(pk__in=pks).delete()
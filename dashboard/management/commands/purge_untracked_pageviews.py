@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.ingest import recount_page_views
+from dashboard.models import PageView, UrlPath, VisitorSession
+from dashboard.rollups import rebuild
+from dashboard.tracking import is_tracked_path
+
+
+# Path ids per DELETE ... WHERE path_id IN (...), well under SQLite's variable limit
+PATH_CHUNK = 500
+
+
+class Command(BaseCommand):
+    help = "Delete stored page views of URLs the tracking policy no longer records (dashboard, admin, static, 404s...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per statement',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted',
+        )
+        parser.add_argument(
+            '--rebuild-rollups',
+            action='store_true',
+            help='Rebuild the hourly rollups afterwards so they stop counting the deleted rows',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        junk_paths = [
+            pk for pk, path in UrlPath.objects.values_list('id', 'path').iterator()
+            if not is_tracked_path(path)
+        ]
+        self.stdout.write(f"{len(junk_paths)} untracked URL paths found.")
+
+        if options['dry_run']:
+            count = sum(
+                PageView.objects.filter(path_id__in=junk_paths[i:i + PATH_CHUNK]).count()
+                for i in range(0, len(junk_paths), PATH_CHUNK)
+            )
+            self.stdout.write(f"Would delete {count} page views.")
+            return
+
+        deleted = 0
+        for i in range(0, len(junk_paths), PATH_CHUNK):
+            deleted += self._delete_in_batches(
+                PageView.objects.filter(path_id__in=junk_paths[i:i + PATH_CHUNK]), batch_size
+            )
+            self.stdout.write(f"Deleted {deleted} page views...")
+
+        # Sessions that only ever visited untracked pages
+        sessions = self._delete_in_batches(
+            VisitorSession.objects.filter(page_views__isnull=True), batch_size
+        )
+        if deleted:
+            recount_page_views()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} page views and {sessions} empty visitor sessions."
+        ))
+
+        if options['rebuild_rollups']:
+            processed = rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups from {processed} page views."))
+
+    def _delete_in_batches(self, queryset, batch_size):
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
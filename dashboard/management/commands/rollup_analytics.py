@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from dashboard.rollups import rebuild, roll_up
+
+
+class Command(BaseCommand):
+    help = "Fold new page views into the hourly analytics rollups (run periodically, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Number of page views processed per transaction',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rebuild the rollups from the remaining page views (older, archived days are kept)',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            processed = rebuild()
+        else:
+            processed = roll_up(chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {processed} page views."))
@@ -1,72 +1,95 @@
+import time
+
 from django.utils import timezone
-import uuid
-import user_agents
-from .models import PageView, VisitorSession
+from .ingest import get_buffer_config, hit_buffer, write_hits
+from .live import record_visit
+from .tracking import ignored_prefixes, is_tracked_match
+from .traffic import classify_referrer
+from .ua import get_bots_config, is_bot
+from .sampling import is_sampled, sampler
+from .visitor import get_visitor_id, new_visitor_id, set_visitor_cookie
 
 class AnalyticsMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Only track specific paths you want to monitor
-        if self.should_track(request):
-            self.track_page_view(request)
-        
+        started = time.monotonic()
         response = self.get_response(request)
+        # Request latency drives the automatic surge mode (dashboard/sampling.py)
+        sampler.observe(time.monotonic() - started)
+
+        # Decided from the URL pattern Django resolved for the view, so
+        # untracked requests never touch the session or the database
+        if self.should_track(request, response):
+            if is_bot(request.META.get('HTTP_USER_AGENT', '')):
+                self.track_bot(request)
+            else:
+                self.track_page_view(request, response)
         return response
 
-    def should_track(self, request):
-        """Determine if the request should be tracked - only your specified paths"""
-        included_paths = [
-            '/',           # Home page
-            '/news/',      # News section
-            '/players/',   # Players section
-            '/standings/', # Standings section
-        ]
-        
-        current_path = request.path
-        
-        # Track if path starts with any of the included paths
-        return any(current_path.startswith(path) for path in included_paths)
+    def should_track(self, request, response):
+        """Only successful GETs of public pages (see dashboard/tracking.py)"""
+        if request.method != 'GET' or response.status_code != 200:
+            return False
+        if request.path.startswith(ignored_prefixes()):
+            return False
+        return is_tracked_match(getattr(request, 'resolver_match', None))
+
+    def track_page_view(self, request, response):
+        # Visitors are identified by their own signed cookie, never by
+        # request.session (see dashboard/visitor.py)
+        visitor_id = get_visitor_id(request)
+        if visitor_id is None:
+            visitor_id = new_visitor_id()
+            set_visitor_cookie(response, visitor_id)
+
+        # The live "active now" counter sees every visitor, sampled or not
+        record_visit(visitor_id)
 
-    def track_page_view(self, request):
-        # Get or create session
-        session_key = request.session.session_key or str(uuid.uuid4())
-        if not request.session.session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        
-        # Parse user agent
+        # Keep 1 in N visitors, decided by their id so a visitor is either
+        # fully tracked or not at all; the rate is stored as the hit's weight
+        sample_rate = sampler.rate()
+        if not is_sampled(visitor_id, sample_rate):
+            return
+
+        # The user agent is parsed only the first time it is ever seen,
+        # see dashboard/ingest.write_hits
         user_agent_string = request.META.get('HTTP_USER_AGENT', '')
-        ua = user_agents.parse(user_agent_string)
-        
-        # Get or create visitor session
-        session, created = VisitorSession.objects.get_or_create(
-            session_key=session_key,
-            defaults={
-                'ip_address': self.get_client_ip(request),
-                'user_agent': user_agent_string,
-                'device_type': self.get_device_type(ua),
-                'browser': ua.browser.family,
-                'operating_system': ua.os.family,
-            }
-        )
-        
-        if not created:
-            # Update session end time
-            session.end_time = timezone.now()
-            session.save()
-        
-        # Create page view with foreign key relationship
-        PageView.objects.create(
-            url=request.path,
-            ip_address=self.get_client_ip(request),
-            user_agent=user_agent_string,
-            referrer=request.META.get('HTTP_REFERER'),
-            session_key=session_key,
-            visitor_session=session
+
+        # Classify the referrer once, here, instead of pattern matching later
+        referrer = request.META.get('HTTP_REFERER')
+        traffic_source, referrer_host = classify_referrer(
+            referrer, own_hosts=(request.get_host(),)
         )
 
+        hit = {
+            'session_key': visitor_id,
+            'url': request.path,
+            'timestamp': timezone.now(),
+            'ip_address': self.get_client_ip(request),
+            'user_agent': user_agent_string,
+            'referrer': referrer,
+            'traffic_source': traffic_source,
+            'referrer_host': referrer_host,
+            'sample_rate': sample_rate,
+        }
+
+        self.submit(hit)
+
+    def track_bot(self, request):
+        # Crawlers and link-preview fetchers get no visitor cookie, session
+        # or page view; at most a per-day counter (ANALYTICS_BOTS["MODE"])
+        if get_bots_config()['MODE'] == 'count':
+            self.submit({'bot': True, 'timestamp': timezone.now()})
+
+    def submit(self, hit):
+        # Buffered mode: hand the hit to the background flusher
+        if get_buffer_config()['ENABLED']:
+            hit_buffer.enqueue(hit)
+        else:
+            write_hits([hit])
+
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -74,13 +97,3 @@ class AnalyticsMiddleware:
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
-
-    def get_device_type(self, ua):
-        if ua.is_mobile:
-            return 'Mobile'
-        elif ua.is_tablet:
-            return 'Tablet'
-        elif ua.is_pc:
-            return 'Desktop'
-        else:
-            return 'Other'
\ No newline at end of file
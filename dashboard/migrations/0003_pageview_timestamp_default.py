@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-17 01:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_remove_clubteammember_name_clubteammember_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pageview',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='visitorsession',
+            name='start_time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-17 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_pageview_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_pageview_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnalyticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('url', 'URL'), ('source', 'Traffic Source'), ('device', 'Device Type'), ('browser', 'Browser'), ('os', 'Operating System')], max_length=20)),
+                ('value', models.CharField(blank=True, max_length=500)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('sessions', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'hour'], name='dashboard_a_dimensi_9caa81_idx')],
+                'unique_together': {('hour', 'dimension', 'value')},
+            },
+        ),
+    ]
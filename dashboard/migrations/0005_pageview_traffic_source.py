@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pageview',
+            name='referrer_host',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='pageview',
+            name='traffic_source',
+            field=models.CharField(blank=True, choices=[('direct', 'Direct'), ('search', 'Search'), ('social', 'Social'), ('email', 'Email'), ('internal', 'Internal'), ('other', 'Other')], db_index=True, max_length=10),
+        ),
+    ]
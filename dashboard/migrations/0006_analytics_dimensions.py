@@ -0,0 +1,205 @@
+"""
+Compact analytics schema.
+
+User agents, URL paths and referrer hosts move into deduplicated dimension
+tables referenced by integer ids. PageView stops storing the user agent,
+IP address and session key (all available through visitor_session), and
+gains an index on timestamp for the dashboard's date-range filters.
+
+Existing rows are converted in id-ordered batches so memory stays flat on
+large tables. The conversion drops per-hit IP addresses, so this migration
+is irreversible.
+"""
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+BATCH_SIZE = 5000
+
+
+def _dimension_ids(db, model, field, values, defaults=None):
+    """Return {value: id} for ``values``, creating missing dimension rows."""
+    values = set(values)
+    objects = model.objects.using(db)
+    ids = dict(objects.filter(**{f"{field}__in": values}).values_list(field, "id"))
+    missing = values - ids.keys()
+    if missing:
+        objects.bulk_create(
+            [model(**{field: value}, **(defaults or {}).get(value, {})) for value in missing],
+            ignore_conflicts=True,
+        )
+        ids.update(objects.filter(**{f"{field}__in": missing}).values_list(field, "id"))
+    return ids
+
+
+def _batches(queryset, fields):
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).order_by("id").values(*fields)[:BATCH_SIZE])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["id"]
+
+
+def convert_sessions(apps, schema_editor):
+    db = schema_editor.connection.alias
+    VisitorSession = apps.get_model("dashboard", "VisitorSession")
+    UserAgent = apps.get_model("dashboard", "UserAgent")
+
+    fields = ("id", "user_agent", "device_type", "browser", "operating_system")
+    for rows in _batches(VisitorSession.objects.using(db), fields):
+        parsed = {
+            row["user_agent"]: {
+                "device_type": row["device_type"],
+                "browser": row["browser"],
+                "operating_system": row["operating_system"],
+            }
+            for row in rows
+        }
+        ua_ids = _dimension_ids(db, UserAgent, "user_agent", parsed, defaults=parsed)
+        VisitorSession.objects.using(db).bulk_update(
+            [VisitorSession(id=row["id"], user_agent_ref_id=ua_ids[row["user_agent"]]) for row in rows],
+            ["user_agent_ref"],
+        )
+
+
+def convert_page_views(apps, schema_editor):
+    db = schema_editor.connection.alias
+    PageView = apps.get_model("dashboard", "PageView")
+    VisitorSession = apps.get_model("dashboard", "VisitorSession")
+    UrlPath = apps.get_model("dashboard", "UrlPath")
+    ReferrerHost = apps.get_model("dashboard", "ReferrerHost")
+
+    fields = ("id", "url", "referrer_host", "session_key", "visitor_session_id")
+    for rows in _batches(PageView.objects.using(db), fields):
+        path_ids = _dimension_ids(db, UrlPath, "path", {row["url"] for row in rows})
+        host_ids = _dimension_ids(
+            db, ReferrerHost, "host", {row["referrer_host"] for row in rows if row["referrer_host"]}
+        )
+
+        # Link old rows that predate the visitor_session foreign key
+        orphan_keys = {row["session_key"] for row in rows if not row["visitor_session_id"]}
+        session_ids = dict(
+            VisitorSession.objects.using(db).filter(session_key__in=orphan_keys).values_list("session_key", "id")
+        ) if orphan_keys else {}
+
+        PageView.objects.using(db).bulk_update(
+            [
+                PageView(
+                    id=row["id"],
+                    path_id=path_ids[row["url"]],
+                    referrer_host_ref_id=host_ids.get(row["referrer_host"]),
+                    visitor_session_id=row["visitor_session_id"] or session_ids.get(row["session_key"]),
+                )
+                for row in rows
+            ],
+            ["path", "referrer_host_ref", "visitor_session"],
+        )
+
+
+def convert(apps, schema_editor):
+    convert_sessions(apps, schema_editor)
+    convert_page_views(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_pageview_traffic_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferrerHost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UrlPath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_agent', models.TextField(unique=True)),
+                ('device_type', models.CharField(blank=True, max_length=50)),
+                ('browser', models.CharField(blank=True, max_length=100)),
+                ('operating_system', models.CharField(blank=True, max_length=100)),
+                ('is_bot', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='visitorsession',
+            name='user_agent_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='dashboard.useragent'),
+        ),
+        migrations.AddField(
+            model_name='pageview',
+            name='path',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='page_views', to='dashboard.urlpath'),
+        ),
+        migrations.AddField(
+            model_name='pageview',
+            name='referrer_host_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='page_views', to='dashboard.referrerhost'),
+        ),
+        migrations.RunPython(convert),
+        migrations.RemoveField(
+            model_name='visitorsession',
+            name='user_agent',
+        ),
+        migrations.RenameField(
+            model_name='visitorsession',
+            old_name='user_agent_ref',
+            new_name='user_agent',
+        ),
+        migrations.AlterField(
+            model_name='visitorsession',
+            name='user_agent',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='dashboard.useragent'),
+        ),
+        migrations.RemoveField(
+            model_name='pageview',
+            name='url',
+        ),
+        migrations.RemoveField(
+            model_name='pageview',
+            name='ip_address',
+        ),
+        migrations.RemoveField(
+            model_name='pageview',
+            name='user_agent',
+        ),
+        migrations.RemoveField(
+            model_name='pageview',
+            name='session_key',
+        ),
+        migrations.RemoveField(
+            model_name='pageview',
+            name='referrer_host',
+        ),
+        migrations.RenameField(
+            model_name='pageview',
+            old_name='referrer_host_ref',
+            new_name='referrer_host',
+        ),
+        migrations.AlterField(
+            model_name='pageview',
+            name='path',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='page_views', to='dashboard.urlpath'),
+        ),
+        migrations.AlterField(
+            model_name='pageview',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-17 02:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_page_views(apps, schema_editor):
+    db = schema_editor.connection.alias
+    VisitorSession = apps.get_model("dashboard", "VisitorSession")
+    PageView = apps.get_model("dashboard", "PageView")
+    counts = (
+        PageView.objects.filter(visitor_session=OuterRef("pk"))
+        .order_by()
+        .values("visitor_session")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    VisitorSession.objects.using(db).update(page_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_analytics_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitorsession',
+            name='page_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_page_views, migrations.RunPython.noop),
+    ]
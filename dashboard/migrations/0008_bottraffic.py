@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_visitorsession_page_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotTraffic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('hits', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
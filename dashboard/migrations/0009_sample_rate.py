@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_bottraffic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pageview',
+            name='sample_rate',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='visitorsession',
+            name='sample_rate',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_sample_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitorSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('kind', models.CharField(choices=[('sessions', 'Visitor sessions'), ('ips', 'IP addresses')], max_length=20)),
+                ('sample_rate', models.PositiveSmallIntegerField(default=1)),
+                ('registers', models.BinaryField()),
+            ],
+            options={
+                'unique_together': {('day', 'kind', 'sample_rate')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_visitorsketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveVisitors',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker', models.CharField(max_length=255, unique=True)),
+                ('registers', models.BinaryField()),
+                ('visitors', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
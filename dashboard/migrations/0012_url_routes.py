@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-17 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_livevisitors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlpath',
+            name='object_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='urlpath',
+            name='route',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='analyticsrollup',
+            name='dimension',
+            field=models.CharField(choices=[('total', 'Total'), ('url', 'URL'), ('route', 'Route'), ('source', 'Traffic Source'), ('device', 'Device Type'), ('browser', 'Browser'), ('os', 'Operating System')], max_length=20),
+        ),
+    ]
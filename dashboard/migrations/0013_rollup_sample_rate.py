@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-17 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_url_routes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analyticsrollup',
+            name='dimension',
+            field=models.CharField(choices=[('total', 'Total'), ('url', 'URL'), ('route', 'Route'), ('source', 'Traffic Source'), ('device', 'Device Type'), ('browser', 'Browser'), ('os', 'Operating System'), ('rate', 'Sample Rate')], max_length=20),
+        ),
+    ]
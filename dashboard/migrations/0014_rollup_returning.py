@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_rollup_sample_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsrollup',
+            name='returning',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_rollup_returning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsrollup',
+            name='bounces',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analyticsrollup',
+            name='duration',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
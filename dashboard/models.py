@@ -8,20 +8,66 @@ from PIL import Image
 from django.db import models
 from django.core.files.base import ContentFile
 from django.urls import reverse, NoReverseMatch
+from django.utils import timezone
 
 
 
 
 
+# ============================
+#  Analytics dimension tables
+# ============================
+# Strings that repeat on every hit are stored once and referenced by id.
+
+class UserAgent(models.Model):
+    user_agent = models.TextField(unique=True)
+    # Parsed once, when the user agent is first seen
+    device_type = models.CharField(max_length=50, blank=True)
+    browser = models.CharField(max_length=100, blank=True)
+    operating_system = models.CharField(max_length=100, blank=True)
+    is_bot = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.user_agent[:80]
+
+
+class UrlPath(models.Model):
+    path = models.CharField(max_length=500, unique=True)
+    # URL pattern name and its main argument, e.g. "news:news_detail" and
+    # the article slug; resolved once per path (see dashboard/tracking.py)
+    route = models.CharField(max_length=100, blank=True, db_index=True)
+    object_key = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return self.path
+
+
+class ReferrerHost(models.Model):
+    host = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.host
+
+
 class VisitorSession(models.Model):
+    # Visitor id from the signed analytics cookie (see dashboard/visitor.py);
+    # older rows hold Django session keys
     session_key = models.CharField(max_length=100, unique=True)
-    start_time = models.DateTimeField(auto_now_add=True)
+    # Set from the hit itself, so buffered writes keep the request time
+    start_time = models.DateTimeField(default=timezone.now)
     end_time = models.DateTimeField(null=True, blank=True)
     ip_address = models.GenericIPAddressField()
-    user_agent = models.TextField()
+    user_agent = models.ForeignKey(
+        UserAgent, on_delete=models.PROTECT, related_name='sessions'
+    )
     device_type = models.CharField(max_length=50, blank=True)
     browser = models.CharField(max_length=100, blank=True)
     operating_system = models.CharField(max_length=100, blank=True)
+    # Kept up to date by the ingest heartbeat (see dashboard/ingest.py)
+    page_count = models.PositiveIntegerField(default=0)
+    # 1-in-N sampling rate when the session was first tracked; it stands
+    # for this many sessions in counts (see dashboard/sampling.py)
+    sample_rate = models.PositiveSmallIntegerField(default=1)
     
     class Meta:
         ordering = ['-start_time']
@@ -30,12 +76,28 @@ class VisitorSession(models.Model):
         return f"{self.session_key} - {self.start_time}"
 
 class PageView(models.Model):
-    url = models.CharField(max_length=500)
-    timestamp = models.DateTimeField(auto_now_add=True)
-    ip_address = models.GenericIPAddressField()
-    user_agent = models.TextField()
+    TRAFFIC_SOURCE_CHOICES = [
+        ("direct", "Direct"),
+        ("search", "Search"),
+        ("social", "Social"),
+        ("email", "Email"),
+        ("internal", "Internal"),
+        ("other", "Other"),
+    ]
+
+    path = models.ForeignKey(UrlPath, on_delete=models.PROTECT, related_name='page_views')
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     referrer = models.CharField(max_length=500, blank=True, null=True)
-    session_key = models.CharField(max_length=100)
+    # Classified once at ingest (see dashboard/traffic.py); blank = not yet classified
+    traffic_source = models.CharField(
+        max_length=10, choices=TRAFFIC_SOURCE_CHOICES, blank=True, db_index=True
+    )
+    referrer_host = models.ForeignKey(
+        ReferrerHost, on_delete=models.PROTECT, related_name='page_views',
+        null=True, blank=True
+    )
+    # Sampling weight: this row stands for this many page views
+    sample_rate = models.PositiveSmallIntegerField(default=1)
     # Add foreign key relationship
     visitor_session = models.ForeignKey(
         VisitorSession, 
@@ -50,6 +112,101 @@ class PageView(models.Model):
     
     def __str__(self):
         return f"{self.url} - {self.timestamp}"
+
+    @property
+    def url(self):
+        return self.path.path
+
+
+class AnalyticsRollup(models.Model):
+    """Hourly pre-aggregated page-view counts, one row per (hour, dimension, value)."""
+    DIMENSION_CHOICES = [
+        ("total", "Total"),
+        ("url", "URL"),
+        ("route", "Route"),
+        ("source", "Traffic Source"),
+        ("device", "Device Type"),
+        ("browser", "Browser"),
+        ("os", "Operating System"),
+        ("rate", "Sample Rate"),
+    ]
+
+    hour = models.DateTimeField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=500, blank=True)
+    hits = models.PositiveIntegerField(default=0)
+    # Sessions whose first tracked page view fell in this bucket
+    sessions = models.PositiveIntegerField(default=0)
+    # Of those, the ones from an IP address an earlier session used, the
+    # ones with a single tracked page view, and the seconds from their first
+    # to their latest page view ("total" rows only)
+    returning = models.PositiveIntegerField(default=0)
+    bounces = models.PositiveIntegerField(default=0)
+    duration = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("hour", "dimension", "value")
+        indexes = [models.Index(fields=["dimension", "hour"])]
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} {self.dimension}={self.value} ({self.hits})"
+
+
+class RollupState(models.Model):
+    """High-water mark of the last PageView folded into AnalyticsRollup."""
+    name = models.CharField(max_length=50, unique=True)
+    last_pageview_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_pageview_id}"
+
+
+class VisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of the visitors (or IP addresses) seen on one day.
+
+    One row per (day, kind, sample_rate). The sample_rate row is the
+    1-in-sample_rate subsample of the day's visitors, scaled when read;
+    the subsamples nest, so ranges that span a rate change are counted
+    from the coarsest one (see rollups.sketch_rows and unique_counts).
+    """
+    KIND_CHOICES = [
+        ("sessions", "Visitor sessions"),
+        ("ips", "IP addresses"),
+    ]
+
+    day = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    sample_rate = models.PositiveSmallIntegerField(default=1)
+    registers = models.BinaryField()
+
+    class Meta:
+        unique_together = ("day", "kind", "sample_rate")
+
+    def __str__(self):
+        return f"{self.day} {self.kind} 1/{self.sample_rate}"
+
+
+class LiveVisitors(models.Model):
+    """One worker's active-visitor window, published for the others (see dashboard/live.py)."""
+    worker = models.CharField(max_length=255, unique=True)
+    # HyperLogLog sketch of the visitor ids in the window
+    registers = models.BinaryField()
+    visitors = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.worker}: {self.visitors}"
+
+
+class BotTraffic(models.Model):
+    """Crawler hits per day; bots never get a VisitorSession or PageView."""
+    day = models.DateField(unique=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.hits} bot hits"
     
 
 
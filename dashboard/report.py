@@ -0,0 +1,300 @@
+"""
+Date ranges, period comparison and cached figures for the analytics dashboard.
+
+``resolve_range()`` turns the ``?range=`` choice (today, 7d, 30d, season or
+custom start/end days) into a ReportRange. A range is *live* while it
+includes today; its end is then "now".
+
+``dashboard_report()`` computes the dashboard figures for a range, and
+optionally the previous period of the same length for comparison. It
+runs the rollup job first (see rollups.roll_up), so a lagging cron job
+never leaves it reading a large raw backlog. The result is cached per (range, granularity, compare, route):
+    - LIVE_TTL for live ranges, since new hits keep arriving;
+    - HISTORICAL_TTL for closed ranges, whose figures no longer change.
+
+Computation is single-flight. Threads of one process asking for the same
+key share a single call, and workers take a short cache.add() lock and
+wait for the result instead of computing it again. The cross-worker lock
+only helps with a shared cache backend, not the default per-process
+LocMemCache.
+
+Configuration lives in ``settings.ANALYTICS_DASHBOARD_CACHE``:
+    - LIVE_TTL: seconds a live range stays cached.
+    - HISTORICAL_TTL: seconds a closed range stays cached.
+    - LOCK_TIMEOUT: seconds a worker waits for another one's computation.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import BotTraffic, get_current_season
+from .rollups import roll_up, top_objects, traffic_summary
+
+
+DEFAULTS = {
+    "LIVE_TTL": 60,
+    "HISTORICAL_TTL": 60 * 60 * 24,
+    "LOCK_TIMEOUT": 30,
+}
+
+RANGES = {
+    "today": "Today",
+    "7d": "Last 7 Days",
+    "30d": "Last 30 Days",
+    "season": "This Season",
+    "custom": "Custom",
+}
+DEFAULT_RANGE = "7d"
+
+GRANULARITIES = {
+    "day": "Daily",
+    "week": "Weekly",
+    "month": "Monthly",
+}
+
+# Headline figures shown with their change against the previous period
+COMPARED_FIGURES = (
+    "total_visits",
+    "unique_visitors",
+    "bounce_rate",
+    "avg_duration",
+    "new_visitors",
+    "returning_visitors",
+    "bot_hits",
+)
+
+CACHE_PREFIX = "analytics:report"
+
+ReportRange = namedtuple("ReportRange", "name start end live")
+
+
+def get_report_cache_config():
+    return {**DEFAULTS, **getattr(settings, "ANALYTICS_DASHBOARD_CACHE", {})}
+
+
+# ============================
+#  Ranges
+# ============================
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _end_of_day(day):
+    return _midnight(day + timedelta(days=1)) - timedelta(microseconds=1)
+
+
+def resolve_range(name=DEFAULT_RANGE, start_day=None, end_day=None, now=None):
+    """
+    The ReportRange for a ``?range=`` choice.
+
+    "season" falls back to the last 30 days when no season exists; custom
+    ranges need both days and are clipped to today.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+
+    if name == "season":
+        season = get_current_season()
+        if season is None:
+            return resolve_range("30d", now=now)
+        start_day, end_day = season.start_date, season.end_date
+    elif name == "custom":
+        end_day = min(end_day, today)
+    else:
+        days = {"today": 1, "7d": 7, "30d": 30}[name]
+        start_day, end_day = today - timedelta(days=days - 1), today
+
+    live = end_day >= today
+    end = now if live else _end_of_day(end_day)
+    return ReportRange(name, _midnight(start_day), end, live)
+
+
+def previous_range(report_range):
+    """The period of the same length ending right before ``report_range``."""
+    length = report_range.end - report_range.start
+    end = report_range.start - timedelta(microseconds=1)
+    return ReportRange("previous", end - length, end, False)
+
+
+# ============================
+#  Figures
+# ============================
+
+def _bucket(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def regroup(daily_data, granularity):
+    """Sum daily_data ({"day", "count"} rows) into weeks or months."""
+    if granularity == "day":
+        return daily_data
+    totals = {}
+    for row in daily_data:
+        bucket = _bucket(row["day"], granularity)
+        totals[bucket] = totals.get(bucket, 0) + row["count"]
+    return [{"day": day, "count": count} for day, count in sorted(totals.items())]
+
+
+def compute_figures(start, end):
+    """Every range-dependent figure of the analytics dashboard, uncached."""
+    # Traffic figures come from the hourly rollups (plus the raw rows the
+    # rollup job has not reached yet), see dashboard/rollups.py
+    summary = traffic_summary(start, end)
+    first_visits = summary["first_visits"]
+
+    # Both from the rollups' session counters: the share of visitors who
+    # left after one page, and the average time between the first and the
+    # latest page view of those who did not
+    bounce_rate = round(summary["bounces"] / first_visits * 100, 1) if first_visits else 0
+    engaged = first_visits - summary["bounces"]
+    avg_duration = summary["session_seconds"] / engaged / 60 if engaged else 0
+
+    # Crawler hits are only counted per day, never as visitors
+    bot_hits = BotTraffic.objects.filter(
+        day__range=(timezone.localdate(start), timezone.localdate(end))
+    ).aggregate(total=Sum("hits", default=0))["total"]
+
+    return {
+        **summary,
+        "bot_hits": bot_hits,
+        "bounce_rate": bounce_rate,
+        "avg_duration": round(avg_duration, 1),
+    }
+
+
+def compare(current, previous):
+    """{figure: {"previous", "delta", "percent"}} for COMPARED_FIGURES."""
+    comparison = {}
+    for figure in COMPARED_FIGURES:
+        before, now = previous[figure], current[figure]
+        comparison[figure] = {
+            "previous": before,
+            "delta": round(now - before, 1),
+            "percent": round((now - before) / before * 100, 1) if before else None,
+        }
+    return comparison
+
+
+# ============================
+#  Caching
+# ============================
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result."""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+single_flight = SingleFlight()
+
+
+def _cached(key, ttl, compute):
+    """``compute()`` through the cache, computing it once across threads and workers."""
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    def load():
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        lock_key = f"{key}:lock"
+        timeout = get_report_cache_config()["LOCK_TIMEOUT"]
+        locked = cache.add(lock_key, 1, timeout)
+        if not locked:
+            # Another worker is computing it; wait for its result
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.1)
+                result = cache.get(key)
+                if result is not None:
+                    return result
+        try:
+            result = compute()
+            cache.set(key, result, ttl)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return result
+
+    return single_flight.do(key, load)
+
+
+def report_cache_key(report_range, granularity, with_comparison, route=""):
+    end_day = timezone.localdate(report_range.end)
+    return (
+        f"{CACHE_PREFIX}:{report_range.name}:{report_range.start:%Y%m%d}:{end_day:%Y%m%d}"
+        f":{granularity}:{int(with_comparison)}:{route}"
+    )
+
+
+def dashboard_report(report_range, granularity="day", with_comparison=False, route=""):
+    """
+    Cached dashboard figures for ``report_range``.
+
+    Returns compute_figures() with daily_data regrouped by ``granularity``,
+    plus "comparison" (see compare()) when ``with_comparison`` is set and
+    "top_objects" of ``route`` (see rollups.top_objects) when one is given.
+    """
+    config = get_report_cache_config()
+    ttl = config["LIVE_TTL"] if report_range.live else config["HISTORICAL_TTL"]
+
+    def compute():
+        # Fold the backlog first, so the raw part of every figure is only
+        # the hits since, however far behind the rollup job is
+        roll_up()
+        figures = compute_figures(report_range.start, report_range.end)
+        figures["daily_data"] = regroup(figures["daily_data"], granularity)
+        if route:
+            figures["top_objects"] = top_objects(report_range.start, report_range.end, route)
+        if with_comparison:
+            previous = previous_range(report_range)
+            figures["comparison"] = compare(figures, compute_figures(previous.start, previous.end))
+        return figures
+
+    return _cached(report_cache_key(report_range, granularity, with_comparison, route), ttl, compute)
@@ -0,0 +1,277 @@
+"""
+Retention for raw page views: archive old months to files, then delete them.
+
+``apply_retention()`` handles every calendar month that ended before the
+cutoff (DAYS ago, rounded down to the start of its month):
+
+    1. The rollup job runs first. Nothing is archived unless every row
+       before the cutoff is already folded into the hourly rollups and
+       visitor sketches, so the dashboard keeps its history.
+    2. A month's rows not yet in an archive part are written to a new gzip
+       NDJSON part named after the month and its id range. The part goes
+       through a temporary file that is renamed into place once complete.
+    3. Rows covered by an archive part are deleted BATCH_SIZE at a time.
+       Each batch is its own short transaction, with a BATCH_PAUSE_MS
+       pause between batches so tracking writes aren't locked out.
+       Visitor sessions left without page views are removed the same way.
+
+An interrupted run can simply be repeated: rows are never archived twice,
+and never deleted before their part is on disk. Archives are read back
+with ``read_archive()``, e.g. by the ``aggregate_archives`` command.
+
+Configuration lives in ``settings.ANALYTICS_RETENTION``:
+    - DAYS: age after which page views are archived.
+    - DIRECTORY: where the archive parts are written.
+    - BATCH_SIZE: rows deleted per transaction.
+    - BATCH_PAUSE_MS: pause between delete batches.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .export import COLUMNS, ndjson_lines
+from .hll import HyperLogLog
+from .models import PageView, VisitorSession
+from .rollups import high_water_mark, is_tracked_url, roll_up, url_in_section
+from .traffic import classify_referrer
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    "DAYS": 400,
+    "DIRECTORY": "analytics_archive",
+    "BATCH_SIZE": 2000,
+    "BATCH_PAUSE_MS": 50,
+}
+
+# PageView columns written to the archive: the export columns plus the id
+ARCHIVE_COLUMNS = (("id", "id"),) + COLUMNS["pageviews"]
+
+PART_NAME = re.compile(r"^pageviews-(\d{4})-(\d{2})\.(\d+)-(\d+)\.ndjson\.gz$")
+
+ArchivePart = namedtuple("ArchivePart", "path month first_id last_id")
+
+
+class RetentionError(Exception):
+    pass
+
+
+def get_retention_config():
+    config = {**DEFAULTS, **getattr(settings, "ANALYTICS_RETENTION", {})}
+    config["DIRECTORY"] = os.path.join(settings.BASE_DIR, config["DIRECTORY"])
+    return config
+
+
+def month_start(value):
+    """Aware midnight on the first day of the month of ``value`` (a date or datetime)."""
+    day = timezone.localdate(value) if isinstance(value, datetime) else value
+    return timezone.make_aware(datetime.combine(day.replace(day=1), datetime.min.time()))
+
+
+def next_month(start):
+    return month_start((start + timedelta(days=32)).date())
+
+
+def retention_cutoff(days, now=None):
+    """Start of the month containing ``now - days``; older months are archived."""
+    return month_start((now or timezone.now()) - timedelta(days=days))
+
+
+# ============================
+#  Archive files
+# ============================
+
+def archive_parts(directory):
+    """Archive parts in ``directory``, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    parts = []
+    for name in os.listdir(directory):
+        match = PART_NAME.match(name)
+        if match:
+            year, month, first_id, last_id = map(int, match.groups())
+            parts.append(ArchivePart(os.path.join(directory, name), date(year, month, 1), first_id, last_id))
+    return sorted(parts, key=lambda part: (part.month, part.first_id))
+
+
+def read_archive(path):
+    """Rows of one archive part, as dicts keyed by ARCHIVE_COLUMNS names."""
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _write_part(directory, month, queryset, chunk_size):
+    """
+    Write the rows of ``queryset`` to a new archive part for ``month``.
+
+    Returns the part and its row count, or (None, 0) when there were no rows.
+    The file is fsynced before it is renamed into place, so a part that
+    exists under its final name is always complete.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".pageviews-{month:%Y-%m}.{os.getpid()}.tmp")
+    header = [column for column, _ in ARCHIVE_COLUMNS]
+    rows = (
+        queryset.order_by("id")
+        .values_list(*(field for _, field in ARCHIVE_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+    written = {"rows": 0}
+
+    def remember_ids(rows):
+        for row in rows:
+            written.setdefault("first_id", row[0])
+            written["last_id"] = row[0]
+            written["rows"] += 1
+            yield row
+
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for line in ndjson_lines(header, remember_ids(rows)):
+                f.write(line.encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not written["rows"]:
+        os.remove(tmp_path)
+        return None, 0
+
+    first_id, last_id = written["first_id"], written["last_id"]
+    path = os.path.join(directory, f"pageviews-{month:%Y-%m}.{first_id}-{last_id}.ndjson.gz")
+    os.replace(tmp_path, path)
+    part = ArchivePart(path, month, first_id, last_id)
+    return part, written["rows"]
+
+
+def _delete_in_batches(queryset, batch_size, pause):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+# ============================
+#  Applying the policy
+# ============================
+
+def _covered(parts):
+    """Q matching page view ids inside any of ``parts``."""
+    q = Q(pk__in=[])
+    for part in parts:
+        q |= Q(id__range=(part.first_id, part.last_id))
+    return q
+
+
+def apply_retention(days=None, dry_run=False, chunk_size=5000, now=None):
+    """
+    Archive and delete page views of every month before the cutoff.
+
+    Returns one {"month", "archived", "deleted"} dict per month handled
+    (with ``dry_run``, "archived" is the number of rows that would be
+    archived and nothing is written or deleted).
+    """
+    config = get_retention_config()
+    days = config["DAYS"] if days is None else days
+    directory = config["DIRECTORY"]
+    pause = config["BATCH_PAUSE_MS"] / 1000
+    cutoff = retention_cutoff(days, now)
+
+    old = PageView.objects.filter(timestamp__lt=cutoff)
+    bounds = old.aggregate(first=Min("timestamp"), last_id=Max("id"))
+    if bounds["first"] is None:
+        return []
+
+    if not dry_run:
+        roll_up()
+        if bounds["last_id"] > high_water_mark():
+            raise RetentionError(
+                "Rollups are behind the rows to archive; run rollup_analytics and try again."
+            )
+
+    parts = archive_parts(directory)
+    results = []
+    month = month_start(bounds["first"])
+    while month < cutoff:
+        end = next_month(month)
+        rows = PageView.objects.filter(timestamp__gte=month, timestamp__lt=end)
+        month_parts = [part for part in parts if part.month == month.date()]
+
+        pending = rows.exclude(_covered(month_parts))
+        if dry_run:
+            archived, deleted = pending.count(), 0
+        else:
+            part, archived = _write_part(directory, month.date(), pending, chunk_size)
+            if part:
+                month_parts.append(part)
+                logger.info("Archived %d page views to %s", archived, part.path)
+            deleted = _delete_in_batches(
+                rows.filter(_covered(month_parts)), config["BATCH_SIZE"], pause
+            )
+
+        if archived or deleted:
+            results.append({"month": month.date(), "archived": archived, "deleted": deleted})
+        month = end
+
+    if not dry_run:
+        _delete_in_batches(
+            VisitorSession.objects.filter(page_views__isnull=True, start_time__lt=cutoff)
+            .filter(Q(end_time__lt=cutoff) | Q(end_time__isnull=True)),
+            config["BATCH_SIZE"],
+            pause,
+        )
+    return results
+
+
+# ============================
+#  Reading archives
+# ============================
+
+def aggregate_archive_parts(parts, section=None, top=10):
+    """
+    Traffic figures over archive ``parts``, computed offline from the files.
+
+    Counts are weighted by sample_rate like the live dashboard, and unique
+    visitors are a HyperLogLog estimate (see hll.py), so memory stays flat
+    however many months are read.
+    """
+    monthly = Counter()
+    pages = Counter()
+    sources = Counter()
+    sketches = defaultdict(HyperLogLog)
+
+    for part in parts:
+        for row in read_archive(part.path):
+            url = row["url"]
+            if not is_tracked_url(url) or (section and not url_in_section(url, section)):
+                continue
+            weight = row["sample_rate"]
+            monthly[part.month] += weight
+            pages[url] += weight
+            sources[row["traffic_source"] or classify_referrer(row["referrer"])[0]] += weight
+            if row["session"] is not None:
+                sketches[weight].add(row["session"])
+
+    return {
+        "page_views": sum(monthly.values()),
+        "unique_visitors": round(sum(rate * sketch.count() for rate, sketch in sketches.items())),
+        "monthly": sorted(monthly.items()),
+        "traffic_sources": dict(sources.most_common()),
+        "top_pages": pages.most_common(top),
+    }
@@ -0,0 +1,699 @@
+"""
+Pre-aggregated analytics rollups.
+
+``roll_up()`` folds new PageView rows (everything above the stored
+high-water mark) into hourly AnalyticsRollup buckets for these dimensions:
+total, url, route (URL pattern, see UrlPath.route), traffic source, device
+type, browser, operating system and sample rate.
+Each bucket counts hits, plus the sessions whose first tracked page view
+landed in it, so sessions add up across hours without double counting.
+The "total" bucket also counts, for those sessions, the returning ones
+(first visits from an IP address an earlier visitor already used), the
+bounces (sessions with a single tracked page view so far) and the seconds
+from their first to their latest page view. A later page view updates the
+bucket of its session's first one, so these survive retention too.
+Alongside the hourly rows it keeps per-day HyperLogLog sketches of the
+visitor sessions and IP addresses seen (VisitorSketch, see hll.py).
+
+``traffic_summary()`` answers the dashboard for any date range by summing
+rollup rows and only reading raw PageView rows above the high-water mark
+(the part the rollup job has not reached yet, normally the open hour).
+The raw part is a single conditional aggregate plus a few grouped queries
+over one filtered base queryset; only the session counters of the "total"
+bucket fold the raw rows in Python, like the rollup job.
+Ranges are aligned to whole hours. The exception is unique visitor and IP
+counts, which merge whole-day sketches. A 12-month count therefore costs
+about the same as a 1-day count, within the error bound given in hll.py.
+
+Sampling (see sampling.py) keeps visitors whose bucket is a multiple of
+the rate, so the sketch a day keeps for rate M is a 1-in-M subsample of
+everyone seen that day: the visitors tracked at any rate dividing M whose
+bucket is a multiple of M. A range tracked at one rate is counted from
+that rate's sketches. A range that spans a rate change (say 1 and a surge
+at 8) is counted once, from the union of its rate-8 subsamples scaled by
+8, so a visitor seen both normally and during the surge is not counted
+twice.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import AnalyticsRollup, PageView, RollupState, UrlPath, VisitorSketch
+from .routers import analytics_db
+from .sampling import get_sampling_config, visitor_bucket
+from .traffic import classify_referrer
+
+
+STATE_NAME = "pageviews"
+
+# Internal/static paths that never count as public traffic
+EXCLUDED_PREFIXES = ("/analytics/", "/dashboard/", "/admin/", "/static/", "/media/")
+
+# Section name -> (prefix, exact match only)
+SECTIONS = {
+    "Home": ("/", True),
+    "News": ("/news/", False),
+    "Players": ("/players/", False),
+    "Standings": ("/standings/", False),
+}
+
+# Display label -> PageView.traffic_source value
+TRAFFIC_SOURCES = {label: value for value, label in PageView.TRAFFIC_SOURCE_CHOICES}
+
+# PageView columns needed to build rollups (plus the URL, see row_values)
+ROW_FIELDS = (
+    "id",
+    "timestamp",
+    "referrer",
+    "traffic_source",
+    "sample_rate",
+    "visitor_session_id",
+    "visitor_session__session_key",
+    "visitor_session__device_type",
+    "visitor_session__browser",
+    "visitor_session__operating_system",
+    "visitor_session__ip_address",
+)
+
+SESSION_DIMENSIONS = (
+    ("device", "visitor_session__device_type"),
+    ("browser", "visitor_session__browser"),
+    ("os", "visitor_session__operating_system"),
+)
+
+# Values per IN (...) lookup, well under SQLite's bound-parameter limit
+# (999 in older builds)
+IN_BATCH_SIZE = 500
+
+# AnalyticsRollup counters, in the order summarize() keeps them
+METRICS = ("hits", "sessions", "returning", "bounces", "duration")
+
+# VisitorSketch.kind -> PageView column whose distinct values it counts
+SKETCH_FIELDS = (
+    ("sessions", "visitor_session_id"),
+    ("ips", "visitor_session__ip_address"),
+)
+
+
+def url_paths(q):
+    """
+    Q matching page views whose path satisfies ``q`` (a UrlPath lookup).
+
+    The path test runs once against the small UrlPath table and page views
+    are filtered by id, instead of joining every row and comparing strings.
+    """
+    return Q(path__in=UrlPath.objects.filter(q).values("id"))
+
+
+def excluded_paths_q():
+    """Q matching the internal/static URLs left out of every analytics figure."""
+    q = Q()
+    for prefix in EXCLUDED_PREFIXES:
+        q |= Q(path__startswith=prefix)
+    return url_paths(q)
+
+
+def row_values(queryset):
+    """``queryset.values()`` with the columns summarize() reads."""
+    return queryset.values(*ROW_FIELDS, url=F("path__path"), route=F("path__route"))
+
+
+def is_tracked_url(url):
+    return not url.startswith(EXCLUDED_PREFIXES)
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+# ============================
+#  Building rollups
+# ============================
+
+def summarize(rows, seen_sessions, seen_ips):
+    """
+    Fold page-view rows into {(hour, dimension, value): [counter per METRICS]}.
+
+    Counts are weighted by each row's sample_rate (see dashboard/sampling.py);
+    a session is weighted by its first tracked page view.
+
+    ``seen_sessions`` maps the sessions that already had a tracked page view
+    before these rows to [first hour, weight, last seen, page views], and
+    ``seen_ips`` holds the IP addresses seen; both are updated in place.
+    A session's later page views adjust the "total" bucket of its first
+    hour: the second one takes back its bounce, and each one moving the
+    last-seen time forward adds the difference to its duration.
+    """
+    counts = defaultdict(lambda: [0] * len(METRICS))
+    for row in rows:
+        if not is_tracked_url(row["url"]):
+            continue
+
+        hour = floor_hour(row["timestamp"])
+        keys = [
+            (hour, "total", ""),
+            (hour, "url", row["url"]),
+            (hour, "source", row["traffic_source"] or classify_referrer(row["referrer"])[0]),
+        ]
+        if row["route"]:
+            keys.append((hour, "route", row["route"]))
+        # Which rates a range was tracked at decides how visitors are counted
+        keys.append((hour, "rate", str(row["sample_rate"])))
+        keys += [(hour, dimension, row[field] or "") for dimension, field in SESSION_DIMENSIONS]
+
+        # Sampled rows stand for sample_rate page views (and sessions)
+        weight = row["sample_rate"]
+        session_id = row["visitor_session_id"]
+        session = seen_sessions.get(session_id)
+        first_visit = session_id is not None and session is None
+        for key in keys:
+            counts[key][0] += weight
+            if first_visit:
+                counts[key][1] += weight
+
+        if first_visit:
+            seen_sessions[session_id] = [hour, weight, row["timestamp"], 1]
+            counts[(hour, "total", "")][3] += weight
+            ip_address = row["visitor_session__ip_address"]
+            if ip_address:
+                if ip_address in seen_ips:
+                    counts[(hour, "total", "")][2] += weight
+                seen_ips.add(ip_address)
+        elif session is not None:
+            first_hour, session_weight, last_seen, views = session
+            first = counts[(first_hour, "total", "")]
+            if views == 1:
+                first[3] -= session_weight
+            if row["timestamp"] > last_seen:
+                first[4] += session_weight * int((row["timestamp"] - last_seen).total_seconds())
+                session[2] = row["timestamp"]
+            session[3] += 1
+    return counts
+
+
+def sketch_rates():
+    """The sample rates every day keeps a subsample sketch for."""
+    config = get_sampling_config()
+    return {max(int(config["RATE"]), 1), max(int(config["SURGE_RATE"]), 1)}
+
+
+def subsample_rates(visitor_id, sample_rate, rates):
+    """The rates in ``rates`` whose 1-in-M subsample a visitor tracked at ``sample_rate`` belongs to."""
+    bucket = visitor_bucket(visitor_id)
+    return [
+        rate for rate in rates | {sample_rate}
+        if rate % sample_rate == 0 and bucket % rate == 0
+    ]
+
+
+def sketch_rows(rows):
+    """
+    Fold page-view rows into {(day, kind, sample_rate): HyperLogLog}.
+
+    The sketch for rate M holds the 1-in-M subsample of the day's visitors
+    (see the module docstring), so every configured rate has one on every
+    day, surge or not.
+    """
+    rates = sketch_rates()
+    sketches = defaultdict(HyperLogLog)
+    for row in rows:
+        if row["visitor_session_id"] is None or not is_tracked_url(row["url"]):
+            continue
+        day = timezone.localdate(row["timestamp"])
+        for rate in subsample_rates(row["visitor_session__session_key"], row["sample_rate"], rates):
+            for kind, field in SKETCH_FIELDS:
+                if row[field] is not None:
+                    sketches[(day, kind, rate)].add(row[field])
+    return sketches
+
+
+def _batches(values):
+    """``values`` in lists of at most IN_BATCH_SIZE, for IN (...) lookups."""
+    values = list(values)
+    for i in range(0, len(values), IN_BATCH_SIZE):
+        yield values[i:i + IN_BATCH_SIZE]
+
+
+def _sessions_seen_before(rows, earlier):
+    """
+    Sessions in ``rows`` with tracked page views matching ``earlier`` (a Q),
+    as summarize() keeps them: {session id: [first hour, weight, last seen, page views]}.
+    """
+    session_ids = {row["visitor_session_id"] for row in rows if row["visitor_session_id"]}
+    seen = {}
+    for batch in _batches(session_ids):
+        stats = (
+            tracked_pageviews().filter(earlier, visitor_session_id__in=batch)
+            .values("visitor_session_id")
+            .annotate(first_id=Min("id"), last_seen=Max("timestamp"), views=Count("id"))
+            .order_by()
+        )
+        stats = {row["first_id"]: row for row in stats}
+        firsts = PageView.objects.filter(id__in=stats).values_list("id", "timestamp", "sample_rate")
+        for first_id, timestamp, sample_rate in firsts:
+            session = stats[first_id]
+            seen[session["visitor_session_id"]] = [
+                floor_hour(timestamp), sample_rate, session["last_seen"], session["views"],
+            ]
+    return seen
+
+
+def _ips_seen_before(rows, earlier):
+    """IP addresses in ``rows`` with tracked page views matching ``earlier`` (a Q)."""
+    ip_addresses = {row["visitor_session__ip_address"] for row in rows} - {None, ""}
+    seen = set()
+    for batch in _batches(ip_addresses):
+        seen.update(
+            tracked_pageviews().filter(earlier, visitor_session__ip_address__in=batch)
+            .values_list("visitor_session__ip_address", flat=True)
+            .order_by()
+            .distinct()
+        )
+    return seen
+
+
+def seen_before(rows, earlier):
+    """The (seen_sessions, seen_ips) summarize() starts from for ``rows``, given the earlier page views."""
+    return _sessions_seen_before(rows, earlier), _ips_seen_before(rows, earlier)
+
+
+def _apply(counts):
+    """Add ``counts`` onto the stored rollup rows (insert or increment)."""
+    hours = {hour for hour, _, _ in counts}
+    existing = {
+        (r.hour, r.dimension, r.value): r
+        for batch in _batches(hours)
+        for r in AnalyticsRollup.objects.filter(hour__in=batch)
+    }
+
+    rows = []
+    for key, values in counts.items():
+        hour, dimension, value = key
+        current = existing.get(key)
+        rows.append(AnalyticsRollup(
+            hour=hour,
+            dimension=dimension,
+            value=value,
+            **{
+                metric: amount + (getattr(current, metric) if current else 0)
+                for metric, amount in zip(METRICS, values)
+            },
+        ))
+
+    AnalyticsRollup.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["hour", "dimension", "value"],
+        update_fields=list(METRICS),
+    )
+
+
+def _apply_sketches(sketches):
+    """Merge ``sketches`` into the stored per-day VisitorSketch rows."""
+    existing = {
+        (r.day, r.kind, r.sample_rate): r.registers
+        for batch in _batches({day for day, _, _ in sketches})
+        for r in VisitorSketch.objects.filter(day__in=batch)
+    }
+
+    rows = []
+    for key, sketch in sketches.items():
+        if key in existing:
+            sketch.merge(HyperLogLog(existing[key]))
+        day, kind, sample_rate = key
+        rows.append(VisitorSketch(
+            day=day, kind=kind, sample_rate=sample_rate, registers=sketch.to_bytes()
+        ))
+
+    VisitorSketch.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["day", "kind", "sample_rate"],
+        update_fields=["registers"],
+    )
+
+
+def roll_up(chunk_size=5000):
+    """
+    Fold every PageView above the high-water mark into AnalyticsRollup.
+
+    Works in chunks of ``chunk_size`` rows; each chunk and the new
+    high-water mark are committed together, so an interrupted run simply
+    resumes where it stopped. Runs can overlap (the cron job and a
+    dashboard report, see report.py): a chunk is only applied by the run
+    that moves the mark from where it read it, and a run that loses the
+    race stops. Returns the number of page views processed.
+    """
+    state, _ = RollupState.objects.get_or_create(name=STATE_NAME)
+    upper = PageView.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+
+    processed = 0
+    while state.last_pageview_id < upper:
+        rows = list(
+            row_values(PageView.objects.filter(id__gt=state.last_pageview_id, id__lte=upper))
+            .order_by("id")[:chunk_size]
+        )
+        if not rows:
+            break
+
+        counts = summarize(rows, *seen_before(rows, Q(id__lte=state.last_pageview_id)))
+        sketches = sketch_rows(rows)
+        with transaction.atomic(using=analytics_db()):
+            moved = RollupState.objects.filter(
+                pk=state.pk, last_pageview_id=state.last_pageview_id
+            ).update(last_pageview_id=rows[-1]["id"], updated_at=timezone.now())
+            if not moved:
+                break
+            if counts:
+                _apply(counts)
+            if sketches:
+                _apply_sketches(sketches)
+        state.last_pageview_id = rows[-1]["id"]
+        processed += len(rows)
+
+    return processed
+
+
+def rebuild():
+    """
+    Drop the rollups the remaining page views can replace, and rebuild them.
+
+    Retention (see retention.py) deletes raw page views once they are
+    rolled up, so only the days from the oldest remaining page view on are
+    dropped; the rollups and sketches of earlier days are their only record
+    and are kept. Whether a visitor near that boundary is new or returning
+    is decided again from the remaining rows. With no page views left there
+    is nothing to rebuild from, and nothing is dropped.
+    """
+    oldest = PageView.objects.order_by("timestamp").values_list("timestamp", flat=True).first()
+    if oldest is None:
+        return 0
+
+    first_day = timezone.localdate(oldest)
+    boundary = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+    with transaction.atomic(using=analytics_db()):
+        AnalyticsRollup.objects.filter(hour__gte=boundary).delete()
+        VisitorSketch.objects.filter(day__gte=first_day).delete()
+        RollupState.objects.filter(name=STATE_NAME).update(last_pageview_id=0)
+    return roll_up()
+
+
+# ============================
+#  Reading rollups
+# ============================
+
+def high_water_mark():
+    state = RollupState.objects.filter(name=STATE_NAME).first()
+    return state.last_pageview_id if state else 0
+
+
+def tracked_pageviews():
+    """PageView queryset with the internal/static URLs already excluded."""
+    return PageView.objects.exclude(excluded_paths_q())
+
+
+def section_q(name):
+    prefix, exact = SECTIONS[name]
+    return url_paths(Q(path=prefix) if exact else Q(path__startswith=prefix))
+
+
+def url_in_section(url, name):
+    """Python counterpart of section_q(), for URLs already in memory."""
+    prefix, exact = SECTIONS[name]
+    return url == prefix if exact else url.startswith(prefix)
+
+
+def _raw_totals(start, end, last_id, totals, sections, daily):
+    """
+    Add the raw page views the rollup job has not reached yet.
+
+    Four queries over one filtered base queryset: a single conditional
+    aggregate for the headline numbers (visits, sections, and traffic
+    sources via the indexed traffic_source column), then one grouped
+    query each for days, URLs and the device/browser/OS combination of
+    first-visit sessions. Every count is a sum of sample_rate weights; a
+    session is counted at its first tracked page view, like the rollups do.
+    The session counters of the "total" bucket come from
+    _raw_session_totals().
+    """
+    base = tracked_pageviews().filter(id__gt=last_id, timestamp__range=(start, end))
+    first_visit = ~Exists(
+        tracked_pageviews().filter(
+            id__lt=OuterRef("id"), visitor_session_id=OuterRef("visitor_session_id")
+        )
+    )
+    weight = partial(Sum, "sample_rate", default=0)
+
+    aggregates = {"hits": weight()}
+    for name in SECTIONS:
+        aggregates[f"section:{name}"] = weight(filter=section_q(name))
+    for source in TRAFFIC_SOURCES.values():
+        aggregates[f"source:{source}"] = weight(filter=Q(traffic_source=source))
+    headline = base.aggregate(**aggregates)
+
+    totals["total"][""][0] += headline["hits"]
+    for name in SECTIONS:
+        sections[name] += headline[f"section:{name}"]
+    for source in TRAFFIC_SOURCES.values():
+        totals["source"][source][0] += headline[f"source:{source}"]
+
+    if not headline["hits"]:
+        return
+
+    per_day = base.annotate(day=TruncDate("timestamp")).values("day").annotate(count=weight()).order_by()
+    for row in per_day:
+        daily[row["day"]] += row["count"]
+
+    for row in base.values(url=F("path__path"), route=F("path__route")).annotate(count=weight()).order_by():
+        totals["url"][row["url"]][0] += row["count"]
+        if row["route"]:
+            totals["route"][row["route"]][0] += row["count"]
+
+    combos = (
+        base.filter(first_visit, visitor_session__isnull=False)
+        .values(*(field for _, field in SESSION_DIMENSIONS))
+        .annotate(sessions=weight())
+        .order_by()
+    )
+    for row in combos:
+        for dimension, field in SESSION_DIMENSIONS:
+            totals[dimension][row[field] or ""][1] += row["sessions"]
+
+
+def _raw_session_totals(start, end, last_id, totals):
+    """
+    Add the raw page views' share of the "total" session counters.
+
+    A page view can change the bounce and duration of a session that
+    started hours earlier, so the raw rows from ``start`` on are folded with
+    summarize(), starting from what the earlier rows say about their
+    sessions, just as the rollup job will fold them. The counters of the
+    hours inside the range are kept. The dashboard rolls up before it
+    reports (see report.py), so these are only the rows since then.
+    """
+    rows = list(row_values(tracked_pageviews().filter(id__gt=last_id, timestamp__gte=start)).order_by("id"))
+    if not rows:
+        return
+    counts = summarize(rows, *seen_before(rows, Q(id__lte=last_id) | Q(timestamp__lt=start)))
+    for (hour, dimension, _), values in counts.items():
+        if dimension == "total" and start <= hour <= end:
+            for i in range(1, len(METRICS)):
+                totals["total"][""][i] += values[i]
+
+
+def unique_counts(start, end, last_id, rates=()):
+    """
+    Estimated distinct visitor sessions and IP addresses seen in [start, end].
+
+    Merges the stored day sketches covering the range with a sketch of the
+    raw tail above ``last_id``. ``rates`` are the sample rates the rolled-up
+    part of the range was tracked at (the "rate" rollups); the tail adds its
+    own. When they all divide the largest one, M, the count is M times the
+    union of the rate-M subsamples, so each visitor counts once however
+    many rates they were seen at.
+
+    With ``rates`` None (rollups built before the "rate" dimension existed)
+    or with rates that do not nest, each rate's union is scaled by its rate
+    and the results are added up; a visitor seen at two rates then counts
+    twice.
+    """
+    groups = defaultdict(list)
+    stored = VisitorSketch.objects.filter(
+        day__range=(timezone.localdate(start), timezone.localdate(end))
+    ).values_list("kind", "sample_rate", "registers")
+    for kind, sample_rate, registers in stored:
+        groups[(kind, sample_rate)].append(HyperLogLog(registers))
+
+    tail = list(
+        tracked_pageviews()
+        .filter(id__gt=last_id, timestamp__range=(start, end), visitor_session__isnull=False)
+        .values_list(*(field for _, field in SKETCH_FIELDS), "sample_rate", "visitor_session__session_key")
+        .order_by()
+        .distinct()
+    )
+    legacy = rates is None
+    configured = sketch_rates()
+    tail_sketches = defaultdict(HyperLogLog)
+    for *values, sample_rate, visitor_id in tail:
+        # Older sketches only hold what was tracked at their own rate
+        targets = [sample_rate] if legacy else subsample_rates(visitor_id, sample_rate, configured)
+        for rate in targets:
+            for (kind, _), value in zip(SKETCH_FIELDS, values):
+                if value is not None:
+                    tail_sketches[(kind, rate)].add(value)
+    for key, sketch in tail_sketches.items():
+        groups[key].append(sketch)
+
+    if legacy:
+        rates = {sample_rate for _, sample_rate in groups}
+    else:
+        rates = set(rates) | {sample_rate for *_, sample_rate, _ in tail}
+        top = max(rates, default=1)
+        if all(top % rate == 0 for rate in rates):
+            rates = {top}
+
+    counts = {kind: 0 for kind, _ in SKETCH_FIELDS}
+    for kind, _ in SKETCH_FIELDS:
+        for rate in rates:
+            counts[kind] += rate * HyperLogLog.union(groups[(kind, rate)]).count()
+    return {kind: round(count) for kind, count in counts.items()}
+
+
+def _top(totals, dimension, label, metric=0, limit=None):
+    items = sorted(totals[dimension].items(), key=lambda item: (-item[1][metric], item[0]))
+    return [
+        {label: value, "count": counts[metric]}
+        for value, counts in items[:limit]
+        if counts[metric]
+    ]
+
+
+def traffic_summary(start, end):
+    """
+    Traffic figures for [start, end], read from rollups plus the raw tail.
+
+    Returns the keys the analytics dashboard renders: total_visits,
+    unique_visitors, unique_ips, first_visits, new_visitors, returning_visitors,
+    bounces, session_seconds, daily_data,
+    top_pages, top_routes, section_breakdown, traffic_sources, device_types,
+    top_browsers and top_os.
+
+    first_visits counts the visitors whose first tracked page view falls in
+    the range; new_visitors and returning_visitors split them, returning ones
+    having come from an IP address an earlier visitor already used. All
+    three are exact (sample-weighted) counts, not sketch estimates. Of the
+    same visitors, bounces left after a single tracked page view, and
+    session_seconds adds up the time from each one's first page view to its
+    latest.
+    """
+    start = floor_hour(start)
+    last_id = high_water_mark()
+
+    # totals[dimension][value] = [hits, sessions, returning]
+    totals = defaultdict(lambda: defaultdict(lambda: [0] * len(METRICS)))
+    sections = {name: 0 for name in SECTIONS}
+    daily = defaultdict(int)
+
+    rolled = AnalyticsRollup.objects.filter(hour__gte=start, hour__lte=end)
+    sums = {metric: Sum(metric) for metric in METRICS}
+    for row in rolled.values("dimension", "value").annotate(**sums):
+        value = row["value"]
+        if row["dimension"] == "source":
+            # Rollups built before ingest-time classification stored labels
+            value = value.lower()
+        bucket = totals[row["dimension"]][value]
+        for i, metric in enumerate(METRICS):
+            bucket[i] += row[metric]
+        if row["dimension"] == "url":
+            for name in SECTIONS:
+                if url_in_section(row["value"], name):
+                    sections[name] += row["hits"]
+
+    per_day = (
+        rolled.filter(dimension="total")
+        .annotate(day=TruncDate("hour"))
+        .values("day")
+        .annotate(count=Sum("hits"))
+    )
+    for row in per_day:
+        daily[row["day"]] += row["count"]
+
+    # Rollups from before the "rate" dimension leave the rates unknown
+    rates = {int(rate) for rate, (hits, *_) in totals["rate"].items() if hits}
+    if totals["total"][""][0] and not rates:
+        rates = None
+
+    _raw_totals(start, end, last_id, totals, sections, daily)
+    _raw_session_totals(start, end, last_id, totals)
+    uniques = unique_counts(start, end, last_id, rates)
+    _, sessions, returning, bounces, duration = totals["total"][""]
+
+    return {
+        "total_visits": totals["total"][""][0],
+        "unique_visitors": uniques["sessions"],
+        "unique_ips": uniques["ips"],
+        "first_visits": sessions,
+        "new_visitors": sessions - returning,
+        "returning_visitors": returning,
+        "bounces": bounces,
+        "session_seconds": duration,
+        "daily_data": [{"day": day, "count": daily[day]} for day in sorted(daily)],
+        "top_pages": _top(totals, "url", "url", limit=10),
+        "top_routes": _top(totals, "route", "route", limit=10),
+        "section_breakdown": sections,
+        "traffic_sources": {
+            label: totals["source"][source][0] for label, source in TRAFFIC_SOURCES.items()
+        },
+        "device_types": {
+            device: counts[1] for device, counts in totals["device"].items() if counts[1]
+        },
+        "top_browsers": _top(totals, "browser", "browser", metric=1, limit=5),
+        "top_os": _top(totals, "os", "operating_system", metric=1, limit=5),
+    }
+
+
+def top_objects(start, end, route, limit=10):
+    """
+    Most viewed objects (e.g. articles) of one route in [start, end].
+
+    Only the rollup rows and page views of that route's paths are read,
+    grouped by path id; returns [{"object_key", "url", "count"}].
+    """
+    start = floor_hour(start)
+    paths = UrlPath.objects.filter(route=route)
+    counts = defaultdict(int)
+
+    rolled = (
+        AnalyticsRollup.objects.filter(
+            dimension="url", hour__gte=start, hour__lte=end, value__in=paths.values("path")
+        )
+        .values("value")
+        .annotate(hits=Sum("hits"))
+    )
+    by_path = dict(paths.values_list("path", "id"))
+    for row in rolled:
+        counts[by_path[row["value"]]] += row["hits"]
+
+    raw = (
+        tracked_pageviews()
+        .filter(id__gt=high_water_mark(), timestamp__range=(start, end), path__route=route)
+        .values("path_id")
+        .annotate(count=Sum("sample_rate"))
+        .order_by()
+    )
+    for row in raw:
+        counts[row["path_id"]] += row["count"]
+
+    top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    labels = paths.in_bulk([path_id for path_id, _ in top])
+    return [
+        {"object_key": labels[path_id].object_key, "url": labels[path_id].path, "count": count}
+        for path_id, count in top
+    ]
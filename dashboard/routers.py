@@ -0,0 +1,64 @@
+"""
+Database router keeping analytics tables in their own SQLite file.
+
+Page views, visitor sessions, their dimension tables and the rollups are
+read and written through ``settings.ANALYTICS_DATABASE`` so a slow
+analytics flush never holds the writer lock of the content database.
+When that alias is not configured everything stays on ``default``.
+
+Analytics tables are also kept migrated on ``default``: that is where
+existing data lives until ``move_analytics_data`` copies it over.
+"""
+
+from django.conf import settings
+
+
+ANALYTICS_APP = "dashboard"
+
+# Lower-cased model names of the analytics tables
+ANALYTICS_MODELS = {
+    "useragent",
+    "urlpath",
+    "referrerhost",
+    "visitorsession",
+    "pageview",
+    "analyticsrollup",
+    "rollupstate",
+    "bottraffic",
+    "visitorsketch",
+    "livevisitors",
+}
+
+
+def analytics_db():
+    """Alias of the database holding the analytics tables."""
+    alias = getattr(settings, "ANALYTICS_DATABASE", "analytics")
+    return alias if alias in settings.DATABASES else "default"
+
+
+def is_analytics_model(model):
+    return model._meta.app_label == ANALYTICS_APP and model._meta.model_name in ANALYTICS_MODELS
+
+
+class AnalyticsRouter:
+    def db_for_read(self, model, **hints):
+        if is_analytics_model(model):
+            return analytics_db()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if is_analytics_model(model):
+            return analytics_db()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Analytics rows only ever relate to other analytics rows
+        if is_analytics_model(type(obj1)) != is_analytics_model(type(obj2)):
+            return False
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = analytics_db()
+        if alias != "default" and db == alias:
+            return app_label == ANALYTICS_APP and model_name in ANALYTICS_MODELS
+        return None
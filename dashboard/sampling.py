@@ -0,0 +1,108 @@
+"""
+Session sampling and automatic surge mode for analytics tracking.
+
+At sampling rate N only visitors whose id hashes to a multiple of N are
+tracked, so a visitor is either fully tracked or not at all. Every page
+view and visitor session stores the rate it was recorded at, and the
+dashboard sums those weights instead of counting rows, which keeps totals
+and visitor counts unbiased.
+
+Surge mode raises the rate to SURGE_RATE while the write-behind queue or
+the average request latency is above its threshold, and drops back after
+COOLDOWN_SECONDS below both. Keep SURGE_RATE a multiple of RATE so the
+visitors kept during a surge are a subset of those kept normally.
+
+Configuration lives in ``settings.ANALYTICS_SAMPLING``:
+    - RATE: normal sampling rate (1 = track everyone).
+    - SURGE_RATE: rate while surge mode is on.
+    - SURGE_QUEUE_SIZE: buffered hits that switch surge mode on.
+    - SURGE_LATENCY_MS: average request latency that switches it on.
+    - COOLDOWN_SECONDS: how long both must stay low before switching off.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .ingest import hit_buffer
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    "RATE": 1,
+    "SURGE_RATE": 8,
+    "SURGE_QUEUE_SIZE": 5000,
+    "SURGE_LATENCY_MS": 1500,
+    "COOLDOWN_SECONDS": 120,
+}
+
+# Weight of the newest request in the latency moving average
+LATENCY_SMOOTHING = 0.05
+
+
+def get_sampling_config():
+    return {**DEFAULTS, **getattr(settings, "ANALYTICS_SAMPLING", {})}
+
+
+def visitor_bucket(visitor_id):
+    """Stable 64-bit hash of a visitor id (the same in every worker)."""
+    return int.from_bytes(hashlib.blake2b(visitor_id.encode(), digest_size=8).digest(), "big")
+
+
+def is_sampled(visitor_id, rate):
+    return rate <= 1 or visitor_bucket(visitor_id) % rate == 0
+
+
+class Sampler:
+    """Current sampling rate for this process, switching surge mode on and off."""
+
+    def __init__(self):
+        self.surge = False
+        self.latency_ms = 0.0
+        self._calm_since = None
+        self._lock = threading.Lock()
+
+    def observe(self, latency_seconds):
+        """Feed one request's latency and re-evaluate surge mode."""
+        config = get_sampling_config()
+        with self._lock:
+            self.latency_ms += LATENCY_SMOOTHING * (latency_seconds * 1000 - self.latency_ms)
+            busy = (
+                hit_buffer.qsize() >= config["SURGE_QUEUE_SIZE"]
+                or self.latency_ms >= config["SURGE_LATENCY_MS"]
+            )
+            now = time.monotonic()
+            if busy:
+                self._calm_since = None
+                if not self.surge:
+                    self.surge = True
+                    logger.warning(
+                        "Analytics surge mode on: tracking 1 in %d visitors "
+                        "(queue %d, latency %.0f ms)",
+                        config["SURGE_RATE"], hit_buffer.qsize(), self.latency_ms,
+                    )
+            elif self.surge:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= config["COOLDOWN_SECONDS"]:
+                    self.surge = False
+                    self._calm_since = None
+                    logger.warning("Analytics surge mode off")
+
+    def rate(self):
+        config = get_sampling_config()
+        rate = config["SURGE_RATE"] if self.surge else config["RATE"]
+        return max(int(rate), 1)
+
+    def reset(self):
+        with self._lock:
+            self.surge = False
+            self.latency_ms = 0.0
+            self._calm_since = None
+
+
+sampler = Sampler()
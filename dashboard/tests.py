@@ -1,3 +1,732 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import router
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .export import day_range, stream_export
+from .hll import STANDARD_ERROR, HyperLogLog
+from .ingest import HitBuffer, session_heartbeats, write_hits
+from .live import ActiveVisitors, LivePublisher, active_visitors, publish, worker_id
+from .models import BotTraffic, LiveVisitors, PageView, UrlPath, UserAgent, VisitorSession
+from .report import SingleFlight, compute_figures, previous_range, resolve_range
+from .retention import apply_retention, archive_parts, read_archive
+from .rollups import high_water_mark, rebuild, roll_up, top_objects, traffic_summary
+from .sampling import is_sampled, sampler
+from .traffic import classify_referrer
+from .ua import cache_stats as ua_cache_stats, is_bot, parse_user_agent
+
+
+MOBILE_UA = (
+    "Mozilla/5.0 (Linux; Android 13; SM-A145F) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36"
+)
+
+
+def make_hit(session_key, url, referrer=None, hours_ago=0, **extra):
+    traffic_source, host = classify_referrer(referrer, own_hosts=("testserver",))
+    hit = {
+        "session_key": session_key,
+        "url": url,
+        "timestamp": timezone.now() - timedelta(hours=hours_ago),
+        "ip_address": "10.0.0.1",
+        "user_agent": MOBILE_UA,
+        "referrer": referrer,
+        "traffic_source": traffic_source,
+        "referrer_host": host,
+    }
+    hit.update(extra)
+    return hit
+
+
+@override_settings(ANALYTICS_BUFFER={"ENABLED": False}, ANALYTICS_LIVE={"SHARED": False})
+class AnalyticsDashboardTests(TestCase):
+    databases = {"default", "analytics"}
+
+    def setUp(self):
+        session_heartbeats.clear()
+        sampler.reset()
+        cache.clear()
+        active_visitors.clear()
+        # Requests without a user agent are treated as bots
+        self.client.defaults["HTTP_USER_AGENT"] = MOBILE_UA
+        write_hits([
+            make_hit("a", "/", hours_ago=30),
+            make_hit("a", "/news/match-report/", "https://www.google.com/", hours_ago=29),
+            make_hit("b", "/dashboard/", hours_ago=5),
+            make_hit("b", "/players/", "https://m.facebook.com/", hours_ago=5),
+            make_hit("c", "/standings/full/", "https://example.org/", hours_ago=1),
+            make_hit("c", "/", "http://testserver/standings/full/", hours_ago=0),
+        ])
+        self.end = timezone.now()
+        self.start = self.end - timedelta(days=7)
+
+    def test_summary_counts(self):
+        summary = traffic_summary(self.start, self.end)
+
+        self.assertEqual(summary["total_visits"], 5)
+        self.assertEqual(summary["unique_visitors"], 3)
+        self.assertEqual(
+            summary["section_breakdown"],
+            {"Home": 2, "News": 1, "Players": 1, "Standings": 1},
+        )
+        self.assertEqual(
+            summary["traffic_sources"],
+            {"Direct": 1, "Search": 1, "Social": 1, "Email": 0, "Internal": 1, "Other": 1},
+        )
+        self.assertEqual(summary["device_types"], {"Mobile": 3})
+
+    def test_classify_referrer(self):
+        self.assertEqual(classify_referrer(None), ("direct", ""))
+        self.assertEqual(classify_referrer("https://www.google.com.gh/"), ("search", "google.com.gh"))
+        self.assertEqual(classify_referrer("https://mail.google.com/mail/u/0/"), ("email", "mail.google.com"))
+        self.assertEqual(classify_referrer("https://l.facebook.com/l.php?u=x"), ("social", "l.facebook.com"))
+        self.assertEqual(
+            classify_referrer("https://nugatafc.com/news/", own_hosts=("nugatafc.com",)),
+            ("internal", "nugatafc.com"),
+        )
+        self.assertEqual(classify_referrer("https://example.org/"), ("other", "example.org"))
+
+    def test_is_bot(self):
+        self.assertFalse(is_bot(MOBILE_UA))
+        self.assertTrue(is_bot(""))
+        self.assertTrue(is_bot("WhatsApp/2.23.20.0 A"))
+        self.assertTrue(is_bot("facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)"))
+        self.assertTrue(is_bot("Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"))
+        self.assertTrue(is_bot("python-requests/2.31.0"))
+        self.assertTrue(is_bot("Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)"))
+        self.assertTrue(is_bot("Mozilla/5.0 (compatible; Pinterestbot/1.0; +http://www.pinterest.com/bot.html)"))
+        self.assertTrue(is_bot("DuckDuckBot-Https/1.1; (+https://duckduckgo.com/duckduckbot)"))
+        self.assertTrue(is_bot("Mozilla/5.0 (compatible; Baiduspider/2.0; +http://www.baidu.com/search/spider.html)"))
+        self.assertTrue(is_bot("Mozilla/5.0+(compatible; UptimeRobot/2.0; http://www.uptimerobot.com/)"))
+        self.assertTrue(is_bot("Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)"))
+
+    def test_is_bot_spares_real_browsers(self):
+        browsers = [
+            # Device names containing "bot"
+            "Mozilla/5.0 (Linux; Android 10; CUBOT X30) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
+            "Mozilla/5.0 (Linux; Android 9; CUBOT_P30 Build/PPR1.180610.011) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/96.0.4664.104 Mobile Safari/537.36",
+            "Mozilla/5.0 (Linux; Android 12; Bottle Phone) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
+            # Browser builds named "Preview"
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 "
+            "(KHTML, like Gecko) Version/17.4 Safari/605.1.15 Safari Technology Preview",
+            # Words that merely contain "uptime"
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 UptimeDesk/3.1",
+        ]
+        for user_agent in browsers:
+            with self.subTest(user_agent=user_agent):
+                self.assertFalse(is_bot(user_agent))
+
+        # A CUBOT visitor is tracked like anyone else
+        response = self.client.get(reverse("news:news_list"), HTTP_USER_AGENT=browsers[0])
+        self.assertIn("visitor_id", response.cookies)
+
+    def test_bot_hits_are_counted_not_tracked(self):
+        sessions, page_views = VisitorSession.objects.count(), PageView.objects.count()
+        response = self.client.get(reverse("news:news_list"), HTTP_USER_AGENT="WhatsApp/2.23.20.0 A")
+
+        self.assertNotIn("visitor_id", response.cookies)
+        self.assertEqual(VisitorSession.objects.count(), sessions)
+        self.assertEqual(PageView.objects.count(), page_views)
+        self.assertEqual(BotTraffic.objects.get(day=timezone.localdate()).hits, 1)
+
+        self.client.force_login(User.objects.create_user("staff", password="secret"))
+        response = self.client.get(reverse("dashboard:analytics_dashboard"))
+        self.assertEqual(response.context["bot_hits"], 1)
+        self.assertEqual(response.context["total_visits"], 5)
+
+    def test_user_agent_parsed_once_per_new_user_agent(self):
+        parse_user_agent.cache_clear()
+        desktop_ua = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/120.0"
+        write_hits([
+            make_hit("e", "/", user_agent=desktop_ua),
+            make_hit("f", "/news/", user_agent=desktop_ua),
+        ])
+        write_hits([make_hit("e", "/players/", user_agent=desktop_ua)])
+        write_hits([make_hit("g", "/", user_agent=desktop_ua)])
+
+        self.assertEqual(ua_cache_stats()["misses"], 1)
+        self.assertEqual(UserAgent.objects.filter(user_agent=desktop_ua).count(), 1)
+        self.assertEqual(
+            VisitorSession.objects.get(session_key="g").browser, "Firefox"
+        )
+
+    def test_session_heartbeat_is_coalesced(self):
+        write_hits([make_hit("h", "/")])
+        write_hits([make_hit("h", "/news/")])
+        last = make_hit("h", "/players/")
+        write_hits([last])
+
+        # Still inside the heartbeat interval: nothing written yet
+        session = VisitorSession.objects.get(session_key="h")
+        self.assertEqual(session.page_count, 1)
+        self.assertIsNone(session.end_time)
+
+        # savepoint, one narrow UPDATE, release
+        with self.assertNumQueries(3, using="analytics"):
+            session_heartbeats.flush(force=True)
+        session.refresh_from_db()
+        self.assertEqual(session.page_count, 3)
+        self.assertEqual(session.end_time, last["timestamp"])
+
+    def test_heartbeats_survive_a_rolled_back_batch(self):
+        write_hits([make_hit("h", "/")])
+        news = make_hit("h", "/news/")
+        write_hits([news])
+
+        # The pending heartbeat is due, but the batch it is written with fails
+        session_heartbeats.interval = 0
+        self.addCleanup(setattr, session_heartbeats, "interval", 30)
+        with self.assertRaises(Exception):
+            write_hits([make_hit("z", "/", timestamp=None)])
+
+        session = VisitorSession.objects.get(session_key="h")
+        self.assertEqual(session.page_count, 1)
+        session_heartbeats.flush(force=True)
+        session.refresh_from_db()
+        self.assertEqual((session.page_count, session.end_time), (2, news["timestamp"]))
+
+    def test_write_hits_stores_a_batch(self):
+        page_views = PageView.objects.count()
+        write_hits([make_hit("w", "/"), make_hit("w", "/news/")])
+        self.assertEqual(PageView.objects.count(), page_views + 2)
+        self.assertEqual(VisitorSession.objects.filter(session_key="w").count(), 1)
+
+    def test_hit_buffer_drops_when_full_and_flushes_on_stop(self):
+        buffer = HitBuffer(max_size=2, on_full="drop")
+        page_views = PageView.objects.count()
+
+        self.assertTrue(buffer.enqueue(make_hit("q", "/"), autostart=False))
+        self.assertTrue(buffer.enqueue(make_hit("q", "/news/"), autostart=False))
+        self.assertFalse(buffer.enqueue(make_hit("q", "/players/"), autostart=False))
+        self.assertEqual(
+            buffer.stats(), {"queued": 2, "flushed": 0, "dropped": 1, "failed": 0, "pending": 2}
+        )
+
+        buffer.stop()
+        self.assertEqual(
+            buffer.stats(), {"queued": 2, "flushed": 2, "dropped": 1, "failed": 0, "pending": 0}
+        )
+        self.assertEqual(PageView.objects.count(), page_views + 2)
+
+    def test_hit_buffer_blocks_for_room_then_drops(self):
+        buffer = HitBuffer(max_size=1, on_full="block", block_timeout_ms=20)
+        buffer.enqueue(make_hit("q", "/"), autostart=False)
+
+        # Nothing frees a slot within the timeout
+        started = time.monotonic()
+        self.assertFalse(buffer.enqueue(make_hit("q", "/news/"), autostart=False))
+        self.assertGreaterEqual(time.monotonic() - started, 0.02)
+
+        # A slot freed while waiting is taken
+        buffer.block_timeout = 5
+        drain = threading.Timer(0.05, buffer._drain, args=(1,))
+        drain.start()
+        self.assertTrue(buffer.enqueue(make_hit("q", "/players/"), autostart=False))
+        drain.join()
+        self.assertEqual(buffer.stats()["dropped"], 1)
+        self.assertEqual(buffer.stats()["queued"], 2)
+
+    def test_hit_buffer_counts_failed_batches(self):
+        buffer = HitBuffer(max_size=10)
+        buffer.enqueue(make_hit("q", "/"), autostart=False)
+        buffer.enqueue(make_hit("r", "/", timestamp=None), autostart=False)
+
+        with self.assertLogs("dashboard.ingest", "ERROR"):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.stats()["failed"], 2)
+        self.assertEqual(buffer.stats()["pending"], 0)
+
+    @mock.patch("dashboard.ingest.atexit.register")
+    def test_hit_buffer_registers_exit_handler_once(self, register):
+        buffer = HitBuffer(flush_interval_ms=10)
+        for _ in range(3):
+            buffer.start()
+            buffer.stop()
+        register.assert_called_once_with(buffer.stop)
+
+    @mock.patch("dashboard.live.atexit.register")
+    def test_live_publisher_registers_exit_handler_once(self, register):
+        publisher = LivePublisher()
+        for _ in range(3):
+            publisher.start()
+            publisher.stop()
+        register.assert_called_once_with(publisher.stop)
+
+    def test_sampled_hits_are_weighted(self):
+        # A visitor the 1-in-4 sample keeps, in a range tracked only at that rate
+        visitor = next(f"{i:032x}" for i in range(100) if is_sampled(f"{i:032x}", 4))
+        write_hits([
+            make_hit(visitor, "/news/", hours_ago=50, sample_rate=4),
+            make_hit(visitor, "/players/", hours_ago=49, sample_rate=4),
+        ])
+        start, end = self.end - timedelta(hours=51), self.end - timedelta(hours=48)
+
+        summary = traffic_summary(start, end)
+        self.assertEqual(summary["total_visits"], 8)
+        self.assertEqual(summary["unique_visitors"], 4)
+        self.assertEqual(summary["section_breakdown"]["News"], 4)
+
+        roll_up()
+        self.assertEqual(traffic_summary(start, end), summary)
+
+    def test_sampling_is_deterministic_and_nested(self):
+        ids = [f"{i:032x}" for i in range(4000)]
+        kept_2 = {i for i in ids if is_sampled(i, 2)}
+        kept_8 = {i for i in ids if is_sampled(i, 8)}
+
+        self.assertTrue(kept_8 <= kept_2)
+        self.assertAlmostEqual(len(kept_8) / len(ids), 1 / 8, delta=0.02)
+        self.assertEqual(kept_8, {i for i in ids if is_sampled(i, 8)})
+        self.assertTrue(all(is_sampled(i, 1) for i in ids))
+
+    @override_settings(ANALYTICS_SAMPLING={"SURGE_LATENCY_MS": 100, "COOLDOWN_SECONDS": 0})
+    def test_surge_mode_follows_latency(self):
+        self.assertEqual(sampler.rate(), 1)
+        sampler.observe(10)
+        self.assertTrue(sampler.surge)
+        self.assertEqual(sampler.rate(), 8)
+
+        for _ in range(100):
+            sampler.observe(0)
+        self.assertFalse(sampler.surge)
+        self.assertEqual(sampler.rate(), 1)
+
+    def test_visitors_spanning_a_rate_change_count_once(self):
+        visitors = [f"{i:032x}" for i in range(1000)]
+        surge = [visitor for visitor in visitors if is_sampled(visitor, 8)]
+        # Everyone visits normally, then the surge-sampled ones come back
+        write_hits([make_hit(visitor, "/news/", hours_ago=72) for visitor in visitors])
+        write_hits([make_hit(visitor, "/players/", hours_ago=71, sample_rate=8) for visitor in surge])
+
+        start, end = timezone.now() - timedelta(days=4), timezone.now() - timedelta(days=2)
+        # The 1-in-8 subsample of the 1,000 visitors, scaled back up
+        expected = 8 * len(surge)
+        for rolled_up in (False, True):
+            if rolled_up:
+                roll_up()
+            with self.subTest(rolled_up=rolled_up):
+                summary = traffic_summary(start, end)
+                self.assertEqual(summary["total_visits"], 1000 + 8 * len(surge))
+                self.assertAlmostEqual(
+                    summary["unique_visitors"], expected, delta=expected * 3 * STANDARD_ERROR
+                )
+                self.assertAlmostEqual(
+                    summary["unique_visitors"], len(visitors), delta=len(visitors) * 0.15
+                )
+
+    def test_rollups_match_raw_counts(self):
+        raw = traffic_summary(self.start, self.end)
+        roll_up()
+        self.assertEqual(traffic_summary(self.start, self.end), raw)
+
+        # Rows added after the rollup are read from the raw tail
+        write_hits([make_hit("d", "/news/")])
+        roll_up(chunk_size=1)
+        summary = traffic_summary(self.start, self.end)
+        self.assertEqual(summary["total_visits"], raw["total_visits"] + 1)
+        self.assertEqual(summary["unique_visitors"], raw["unique_visitors"] + 1)
+
+    def test_returning_visitors_came_from_a_known_address(self):
+        # All setUp visitors share one IP address: "a" is new, "b" and "c" return
+        raw = traffic_summary(self.start, self.end)
+        self.assertEqual(
+            (raw["first_visits"], raw["new_visitors"], raw["returning_visitors"]), (3, 1, 2)
+        )
+        # A range counts the first visits inside it, against every earlier address
+        recent = traffic_summary(self.end - timedelta(hours=2), self.end)
+        self.assertEqual((recent["new_visitors"], recent["returning_visitors"]), (0, 1))
+
+        roll_up()
+        self.assertEqual(traffic_summary(self.start, self.end), raw)
+
+        write_hits([
+            make_hit("d", "/news/", ip_address="10.0.0.2"),
+            make_hit("e", "/news/"),
+            make_hit("f", "/", ip_address="10.0.0.2"),
+        ])
+        end = timezone.now()
+        summary = traffic_summary(self.start, end)
+        self.assertEqual((summary["new_visitors"], summary["returning_visitors"]), (2, 4))
+        roll_up(chunk_size=2)
+        self.assertEqual(traffic_summary(self.start, end), summary)
+
+    def test_bounce_rate_and_duration_come_from_rollups(self):
+        write_hits([make_hit("d", "/news/", hours_ago=2)])
+        end = timezone.now()
+        # "a" and "c" stay an hour; "b" (one tracked page) and "d" bounce
+        figures = compute_figures(self.start, end)
+        self.assertEqual((figures["first_visits"], figures["bounces"]), (4, 2))
+        self.assertEqual(figures["bounce_rate"], 50.0)
+        self.assertEqual(figures["avg_duration"], 60.0)
+
+        # A later page view takes the bounce back, rolled up or not
+        roll_up()
+        self.assertEqual(compute_figures(self.start, end), figures)
+        write_hits([make_hit("d", "/players/", hours_ago=1)])
+        later = compute_figures(self.start, end)
+        self.assertEqual((later["bounces"], later["bounce_rate"]), (1, 25.0))
+        self.assertEqual(later["avg_duration"], 60.0)
+        roll_up(chunk_size=1)
+        self.assertEqual(compute_figures(self.start, end), later)
+
+    def test_session_figures_survive_retention(self):
+        long_ago = timezone.now() - timedelta(days=500)
+        write_hits([
+            make_hit("old", "/news/", timestamp=long_ago, ip_address="10.0.0.9"),
+            make_hit("old", "/players/", timestamp=long_ago + timedelta(minutes=6), ip_address="10.0.0.9"),
+            make_hit("gone", "/", timestamp=long_ago, ip_address="10.0.0.9"),
+        ])
+        start, end = long_ago - timedelta(days=1), long_ago + timedelta(days=1)
+        before = compute_figures(start, end)
+        self.assertEqual((before["bounce_rate"], before["avg_duration"]), (50.0, 6.0))
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(ANALYTICS_RETENTION={"DIRECTORY": directory}):
+            apply_retention(days=400)
+        self.assertFalse(PageView.objects.filter(timestamp__lte=end).exists())
+        self.assertEqual(compute_figures(start, end), before)
+
+    def test_lookups_are_batched_under_the_parameter_limit(self):
+        # More sessions, addresses and hours in a chunk than one IN (...) takes
+        write_hits([
+            make_hit(f"v{i}", "/news/", hours_ago=i, ip_address=f"10.0.1.{i}") for i in range(12)
+        ] + [make_hit(f"v{i}", "/", ip_address=f"10.0.1.{i}") for i in range(12)])
+        end = timezone.now()
+        raw = traffic_summary(self.start, end)
+
+        with mock.patch("dashboard.rollups.IN_BATCH_SIZE", 5):
+            self.assertEqual(traffic_summary(self.start, end), raw)
+            roll_up(chunk_size=20)
+            self.assertEqual(traffic_summary(self.start, end), raw)
+
+    def test_pages_are_grouped_by_route(self):
+        write_hits([
+            make_hit("d", "/news/match-report/"),
+            make_hit("e", "/news/transfer-news/"),
+        ])
+        self.assertEqual(
+            UrlPath.objects.filter(path="/news/match-report/").values_list("route", "object_key").get(),
+            ("news:news_detail", "match-report"),
+        )
+
+        roll_up()
+        write_hits([make_hit("f", "/news/match-report/")])
+        end = timezone.now()
+        summary = traffic_summary(self.start, end)
+        self.assertIn({"route": "news:news_detail", "count": 4}, summary["top_routes"])
+        self.assertEqual(
+            top_objects(self.start, end, "news:news_detail"),
+            [
+                {"object_key": "match-report", "url": "/news/match-report/", "count": 3},
+                {"object_key": "transfer-news", "url": "/news/transfer-news/", "count": 1},
+            ],
+        )
+
+        self.client.force_login(User.objects.create_user("staff", password="secret"))
+        response = self.client.get(reverse("dashboard:analytics_dashboard"), {"range": "30d", "route": "news:news_detail"})
+        self.assertContains(response, "?range=30d&route=news%3Anews_detail")
+        self.assertContains(response, "transfer-news")
+
+    def test_hyperloglog_error_bound(self):
+        for exact in (1000, 20000, 100000):
+            sketch = HyperLogLog()
+            sketch.update(range(exact))
+            self.assertAlmostEqual(sketch.count() / exact, 1, delta=3 * STANDARD_ERROR)
+
+        # Merging counts the union, not the sum
+        first, second = HyperLogLog(), HyperLogLog()
+        first.update(range(0, 30000))
+        second.update(range(20000, 50000))
+        union = HyperLogLog.union([first, second])
+        self.assertAlmostEqual(union.count() / 50000, 1, delta=3 * STANDARD_ERROR)
+
+    def test_unique_visitors_merge_day_sketches(self):
+        # 300 visitors behind 40 addresses, each seen on three different days
+        write_hits([
+            make_hit(f"v{i}", "/news/", hours_ago=24 * (i % 20 + day * 20),
+                     ip_address=f"10.1.0.{i % 40}")
+            for i in range(300)
+            for day in range(3)
+        ])
+        start = self.end - timedelta(days=90)
+        raw = traffic_summary(start, self.end)
+        roll_up()
+        summary = traffic_summary(start, self.end)
+
+        exact_visitors = VisitorSession.objects.count()
+        exact_ips = VisitorSession.objects.values("ip_address").distinct().count()
+        self.assertAlmostEqual(summary["unique_visitors"] / exact_visitors, 1, delta=3 * STANDARD_ERROR)
+        self.assertAlmostEqual(summary["unique_ips"] / exact_ips, 1, delta=3 * STANDARD_ERROR)
+        # The raw tail and the stored sketches hash the same values
+        self.assertEqual(summary["unique_visitors"], raw["unique_visitors"])
+
+    def test_export_streams_filtered_rows(self):
+        user = User.objects.create_user("staff", password="secret")
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("dashboard:analytics_export"))
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertNotIn("/dashboard/", {row["url"] for row in rows})
+
+        response = self.client.get(
+            reverse("dashboard:analytics_export"), {"section": "News", "format": "ndjson", "gzip": "1"}
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(line)["url"] for line in lines], ["/news/match-report/"])
+
+        response = self.client.get(reverse("dashboard:analytics_export"), {"start": "2020-02-02", "end": "2020-01-01"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command_writes_sessions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "sessions.csv")
+            call_command("export_analytics", dataset="sessions", section="Players", output=output, stdout=StringIO())
+            with open(output) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual([row["session"] for row in rows], [str(VisitorSession.objects.get(session_key="b").id)])
+        self.assertNotIn("ip_address", rows[0])
+
+    def test_export_memory_stays_flat(self):
+        session = VisitorSession.objects.get(session_key="a")
+        path = PageView.objects.filter(visitor_session=session).first().path
+
+        def peak_export_memory(rows):
+            PageView.objects.bulk_create(
+                PageView(path=path, visitor_session=session, referrer="https://www.google.com/")
+                for _ in range(rows - PageView.objects.count())
+            )
+            start, end = day_range(timezone.localdate(), timezone.localdate())
+            tracemalloc.start()
+            size = sum(len(chunk) for chunk in stream_export("pageviews", start, end, chunk_size=500))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return size, peak
+
+        small_size, small_peak = peak_export_memory(1000)
+        large_size, large_peak = peak_export_memory(10000)
+        self.assertGreater(large_size, 9 * small_size)
+        # Ten times the rows, about the same peak memory
+        self.assertLess(large_peak, small_peak * 1.5)
+
+    def test_retention_archives_then_deletes_old_months(self):
+        long_ago = timezone.now() - timedelta(days=500)
+        # From its own address, so no later visitor is returning because of it
+        write_hits([
+            make_hit("old", "/news/", "https://www.google.com/", timestamp=long_ago, ip_address="10.0.0.9"),
+            make_hit("old", "/players/", timestamp=long_ago + timedelta(minutes=5), ip_address="10.0.0.9"),
+        ])
+        start = long_ago - timedelta(days=1)
+        before = traffic_summary(start, self.end)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(ANALYTICS_RETENTION={"DIRECTORY": directory, "BATCH_SIZE": 1}):
+            results = apply_retention(days=400)
+            self.assertEqual(sum(r["archived"] for r in results), 2)
+            self.assertEqual(sum(r["deleted"] for r in results), 2)
+            self.assertFalse(PageView.objects.filter(timestamp__lte=long_ago + timedelta(minutes=5)).exists())
+            self.assertFalse(VisitorSession.objects.filter(session_key="old").exists())
+            self.assertEqual(PageView.objects.count(), 6)
+
+            # Rolled-up history survives, and a second run has nothing to do
+            self.assertEqual(traffic_summary(start, self.end), before)
+            self.assertEqual(apply_retention(days=400), [])
+
+            # Rebuilding only replaces the days that still have page views
+            self.assertEqual(rebuild(), 6)
+            self.assertEqual(traffic_summary(start, self.end), before)
+
+            parts = archive_parts(directory)
+            self.assertEqual(sum(1 for part in parts for _ in read_archive(part.path)), 2)
+            out = StringIO()
+            call_command("aggregate_archives", json=True, stdout=out)
+        figures = json.loads(out.getvalue())
+        self.assertEqual(figures["page_views"], 2)
+        self.assertEqual(figures["unique_visitors"], 1)
+        self.assertEqual(figures["traffic_sources"], {"search": 1, "direct": 1})
+
+    def test_only_public_routes_are_tracked(self):
+        user = User.objects.create_user("staff", password="secret")
+        self.client.force_login(user)
+        before = PageView.objects.count()
+
+        self.client.get(reverse("dashboard:analytics_dashboard"))
+        self.client.get("/static/css/site.css")
+        self.client.get("/favicon.ico")
+        self.assertEqual(PageView.objects.count(), before)
+
+        self.client.get(reverse("news:news_list"))
+        self.assertEqual(PageView.objects.count(), before + 1)
+        self.assertEqual(PageView.objects.latest("id").url, "/news/")
+        self.assertEqual(active_visitors.count(), 1)
+
+    def test_active_visitors_sliding_window(self):
+        window = ActiveVisitors(window=300)
+        window.record("a", now=1000)
+        window.record("a", now=1001)
+        window.record("b", now=1100)
+        self.assertEqual(window.count(now=1200), 2)
+        self.assertEqual(window.count(now=1350), 1)
+
+        # The slot of second 1001 is reused 300 seconds later
+        window.record("c", now=1301)
+        self.assertEqual(window.visitors(now=1301), {"b", "c"})
+
+    @override_settings(ANALYTICS_LIVE={"SHARED": True, "STALE_SECONDS": 30})
+    def test_live_count_merges_workers(self):
+        user = User.objects.create_user("staff", password="secret")
+        self.client.force_login(user)
+        active_visitors.record("a")
+        active_visitors.record("b")
+
+        other = HyperLogLog()
+        other.update(["b", "c"])
+        LiveVisitors.objects.create(
+            worker="other:1", registers=other.to_bytes(), visitors=2, updated_at=timezone.now()
+        )
+        LiveVisitors.objects.create(
+            worker="gone:1", registers=other.to_bytes(), visitors=2,
+            updated_at=timezone.now() - timedelta(hours=1),
+        )
+
+        response = self.client.get(reverse("dashboard:analytics_live"))
+        self.assertEqual(response.json(), {"active_visitors": 3, "workers": 2, "window_seconds": 300})
+
+        publish()
+        self.assertEqual(
+            set(LiveVisitors.objects.values_list("worker", flat=True)), {"other:1", worker_id()}
+        )
+
+    def test_public_pages_are_session_free(self):
+        for url in ("/", "/news/", "/standings/full/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotIn("Cookie", response.get("Vary", ""), url)
+        self.assertFalse(Session.objects.exists())
+
+        # One visitor cookie, issued on the first hit and reused afterwards
+        self.assertIn("visitor_id", self.client.cookies)
+        visitor = VisitorSession.objects.exclude(session_key__in="abc").get()
+        self.assertEqual(visitor.page_views.count(), 3)
+
+    def test_analytics_models_use_analytics_database(self):
+        self.assertEqual(router.db_for_write(PageView), "analytics")
+        self.assertEqual(router.db_for_read(VisitorSession), "analytics")
+        self.assertEqual(router.db_for_read(User), "default")
+        self.assertFalse(router.allow_migrate("analytics", "news", model_name="news"))
+        self.assertTrue(router.allow_migrate("default", "dashboard", model_name="pageview"))
+
+    def test_purge_untracked_pageviews(self):
+        summary = traffic_summary(self.start, self.end)
+        call_command("purge_untracked_pageviews", stdout=StringIO())
+
+        self.assertFalse(PageView.objects.filter(path__path="/dashboard/").exists())
+        self.assertEqual(PageView.objects.count(), 5)
+        self.assertEqual(traffic_summary(self.start, self.end), summary)
+
+    def test_dashboard_query_count(self):
+        user = User.objects.create_user("staff", password="secret")
+        self.client.force_login(user)
+        # The rollup job is up to date
+        roll_up()
+
+        # Keep these numbers from creeping back up. Content database:
+        # auth/session and context processors. Analytics database: the
+        # dashboard itself (dashboard pages are not tracked, see
+        # dashboard/tracking.py).
+        with self.assertNumQueries(4), self.assertNumQueries(10, using="analytics"):
+            response = self.client.get(reverse("dashboard:analytics_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_visits"], 5)
+
+        # Reloads are served from the cache, active visitors from memory
+        write_hits([make_hit("d", "/news/")])
+        with self.assertNumQueries(4), self.assertNumQueries(0, using="analytics"):
+            response = self.client.get(reverse("dashboard:analytics_dashboard"))
+        self.assertEqual(response.context["total_visits"], 5)
+
+    def test_dashboard_rolls_up_before_reporting(self):
+        user = User.objects.create_user("staff", password="secret")
+        self.client.force_login(user)
+        response = self.client.get(reverse("dashboard:analytics_dashboard"))
+        self.assertEqual(response.context["total_visits"], 5)
+        # The backlog was folded, so nothing is left for the raw tail
+        self.assertEqual(high_water_mark(), PageView.objects.latest("id").id)
+
+        # A run that lost the race to another one leaves the chunk to it
+        write_hits([make_hit("d", "/news/")])
+        with mock.patch("dashboard.rollups.RollupState.objects.filter") as state:
+            state.return_value.update.return_value = 0
+            self.assertEqual(roll_up(), 0)
+        self.assertEqual(roll_up(), 1)
+        self.assertEqual(traffic_summary(self.start, timezone.now())["total_visits"], 6)
+
+    def test_dashboard_ranges_and_comparison(self):
+        now = timezone.make_aware(datetime(2026, 3, 15, 12, 0))
+        week = resolve_range("7d", now=now)
+        self.assertEqual((week.start.date(), week.end, week.live), (date(2026, 3, 9), now, True))
+
+        january = resolve_range("custom", date(2026, 1, 1), date(2026, 1, 31), now=now)
+        self.assertFalse(january.live)
+        previous = previous_range(january)
+        self.assertEqual(previous.start, timezone.make_aware(datetime(2025, 12, 1)))
+        self.assertEqual(previous.end, january.start - timedelta(microseconds=1))
+
+        user = User.objects.create_user("staff", password="secret")
+        self.client.force_login(user)
+        response = self.client.get(
+            reverse("dashboard:analytics_dashboard"), {"range": "30d", "granularity": "week", "compare": "1"}
+        )
+        self.assertEqual(response.context["selected_range"], "30d")
+        self.assertEqual(sum(row["count"] for row in response.context["daily_data"]), 5)
+        self.assertTrue(all(row["day"].weekday() == 0 for row in response.context["daily_data"]))
+        change = response.context["comparison"]["total_visits"]
+        self.assertEqual((change["previous"], change["delta"], change["percent"]), (0, 5, None))
+
+        # An incomplete custom range falls back to the default
+        response = self.client.get(reverse("dashboard:analytics_dashboard"), {"range": "custom"})
+        self.assertEqual(response.context["selected_range"], "7d")
+
+    def test_report_computation_is_single_flight(self):
+        flight = SingleFlight()
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"total_visits": 5}
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("report", compute)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"total_visits": 5}] * 10)
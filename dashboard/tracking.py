@@ -0,0 +1,73 @@
+"""
+Which requests count as public page views.
+
+The decision is made per URL pattern rather than per path: the middleware
+looks at the resolver match Django already computed for the request, and
+the verdict for each (route, namespace) pair is cached the first time it is
+seen. Static and media URLs are rejected by prefix before anything else.
+
+Public namespaces are listed in ``settings.ANALYTICS_TRACKED_NAMESPACES``.
+
+``route_for_path()`` names the URL pattern behind a stored path (e.g.
+"news:news_detail") and its main argument (the article slug), memoized
+per path; page views are grouped by these instead of by raw URL.
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+
+# URL namespaces (see nugatafc/urls.py) whose pages are public traffic
+DEFAULT_TRACKED_NAMESPACES = ("home", "news", "players", "matches", "standings")
+
+
+def tracked_namespaces():
+    return tuple(getattr(settings, "ANALYTICS_TRACKED_NAMESPACES", DEFAULT_TRACKED_NAMESPACES))
+
+
+def ignored_prefixes():
+    """URL prefixes that are never tracked (static and media files)."""
+    return tuple(
+        prefix for prefix in (settings.STATIC_URL, settings.MEDIA_URL)
+        if prefix and prefix.startswith("/")
+    )
+
+
+@lru_cache(maxsize=None)
+def is_tracked_route(route, namespace):
+    """Verdict for one URL pattern; there are only ever a few dozen of them."""
+    return namespace.split(":")[0] in tracked_namespaces()
+
+
+def is_tracked_match(match):
+    return match is not None and is_tracked_route(match.route, match.namespace)
+
+
+def is_tracked_path(path):
+    """Resolve a stored ``path`` and apply the same policy as the middleware."""
+    if path.startswith(ignored_prefixes()):
+        return False
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return False
+    return is_tracked_match(match)
+
+
+def route_for_match(match):
+    """(route name, object key) of a resolver match; the key is its URL arguments."""
+    kwargs = "/".join(str(value) for value in match.kwargs.values())
+    return match.view_name or "", kwargs or "/".join(str(arg) for arg in match.args)
+
+
+@lru_cache(maxsize=4096)
+def route_for_path(path):
+    """(route name, object key) of a stored path, or ("", "") if it doesn't resolve."""
+    if path.startswith(ignored_prefixes()):
+        return "", ""
+    try:
+        return route_for_match(resolve(path))
+    except Resolver404:
+        return "", ""
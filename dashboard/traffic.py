@@ -0,0 +1,111 @@
+"""
+Traffic-source classification for analytics hits.
+
+A referrer is classified once, when the hit is recorded, by looking its
+host up in a precompiled suffix table (most specific suffix wins, so
+``mail.google.com`` is email while ``www.google.com`` is search). Hosts
+that only match by brand name, e.g. ``google.com.gh``, fall back to
+BRAND_SOURCES.
+"""
+
+from urllib.parse import urlsplit
+
+
+# Source -> host suffixes attributed to it
+HOST_SUFFIXES = {
+    "search": (
+        "google.com", "bing.com", "yahoo.com", "search.yahoo.com", "duckduckgo.com",
+        "ecosia.org", "baidu.com", "yandex.com", "yandex.ru", "search.brave.com",
+    ),
+    "social": (
+        "facebook.com", "fb.com", "fb.me", "messenger.com", "instagram.com",
+        "twitter.com", "x.com", "t.co", "linkedin.com", "lnkd.in",
+        "whatsapp.com", "wa.me", "tiktok.com", "youtube.com", "youtu.be",
+        "reddit.com", "snapchat.com", "pinterest.com", "telegram.org", "t.me",
+    ),
+    "email": (
+        "mail.google.com", "mail.yahoo.com", "outlook.live.com", "outlook.office.com",
+        "outlook.office365.com", "mail.aol.com", "mail.proton.me", "mailchi.mp",
+        "list-manage.com",
+    ),
+}
+
+# Registrable-name labels that identify a source under any TLD
+BRAND_SOURCES = {
+    "google": "search",
+    "bing": "search",
+    "yahoo": "search",
+    "duckduckgo": "search",
+    "yandex": "search",
+    "facebook": "social",
+    "instagram": "social",
+    "twitter": "social",
+    "linkedin": "social",
+}
+
+# Leading labels of webmail hosts, e.g. mail.example.com / webmail.example.com
+MAIL_LABELS = {"mail", "webmail", "email", "newsletter"}
+
+# Flattened {suffix: source}, built once at import
+_SUFFIX_TABLE = {
+    suffix: source
+    for source, suffixes in HOST_SUFFIXES.items()
+    for suffix in suffixes
+}
+
+
+def referrer_host(referrer):
+    """Lower-cased host of ``referrer`` without a leading ``www.``."""
+    if not referrer:
+        return ""
+    try:
+        host = urlsplit(referrer.strip()).hostname or ""
+    except ValueError:
+        return ""
+    host = host.rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    return host[:255]
+
+
+def _is_own_host(host, own_hosts):
+    for own in own_hosts:
+        own = own.lstrip(".").split(":")[0].lower()
+        if own.startswith("www."):
+            own = own[4:]
+        if own and (host == own or host.endswith("." + own)):
+            return True
+    return False
+
+
+def classify_referrer(referrer, own_hosts=()):
+    """
+    Return ``(traffic_source, referrer_host)`` for a raw referrer.
+
+    traffic_source is one of PageView.TRAFFIC_SOURCE_CHOICES: direct,
+    search, social, email, internal or other.
+    """
+    if not referrer or not referrer.strip():
+        return "direct", ""
+
+    host = referrer_host(referrer)
+    if not host:
+        return "other", ""
+    if _is_own_host(host, own_hosts):
+        return "internal", host
+
+    labels = host.split(".")
+    for i in range(len(labels)):
+        source = _SUFFIX_TABLE.get(".".join(labels[i:]))
+        if source:
+            return source, host
+
+    if len(labels) > 2 and labels[0] in MAIL_LABELS:
+        return "email", host
+
+    for label in labels[:-1]:
+        source = BRAND_SOURCES.get(label)
+        if source:
+            return source, host
+
+    return "other", host
@@ -0,0 +1,102 @@
+"""
+Memoized user-agent parsing.
+
+``user_agents.parse()`` runs a large set of regexes, but a day of traffic
+only brings a few hundred distinct UA strings. ``parse_user_agent()``
+keeps the small result we store for each string in a bounded, thread-safe
+LRU cache (``functools.lru_cache``); ``cache_stats()`` reports hits/misses.
+
+``is_bot()`` is the crawler verdict used at ingest: a signature match
+(DEFAULT_BOT_SIGNATURES plus ``settings.ANALYTICS_BOTS["EXTRA_SIGNATURES"]``)
+or ``user_agents``' own is_bot flag, memoized per UA string the same way.
+The default signatures are word-bounded patterns, not bare substrings, so
+a phone model such as "CUBOT X30" is not mistaken for a bot; the extra
+signatures are plain substrings.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import user_agents
+from django.conf import settings
+
+
+ParsedUserAgent = namedtuple(
+    "ParsedUserAgent", ["device_type", "browser", "operating_system", "is_bot"]
+)
+
+
+def get_device_type(ua):
+    if ua.is_mobile:
+        return 'Mobile'
+    elif ua.is_tablet:
+        return 'Tablet'
+    elif ua.is_pc:
+        return 'Desktop'
+    else:
+        return 'Other'
+
+
+@lru_cache(maxsize=getattr(settings, "ANALYTICS_UA_CACHE_SIZE", 1024))
+def parse_user_agent(user_agent_string):
+    ua = user_agents.parse(user_agent_string)
+    return ParsedUserAgent(
+        device_type=get_device_type(ua),
+        browser=ua.browser.family,
+        operating_system=ua.os.family,
+        is_bot=ua.is_bot,
+    )
+
+
+# Case-insensitive regexes for crawler and link-preview user agents that
+# user_agents.parse() does not flag on its own. "bot" only counts as a word
+# or as the end of a product token ("Googlebot/2.1", "Pinterestbot)"), never
+# inside a device name ("CUBOT X30")
+DEFAULT_BOT_SIGNATURES = (
+    r"\bbot\b", r"bot[/;)+\-]", r"bot$", r"googlebot", r"bingbot",
+    r"\bcrawl", r"crawler", r"spider\b", r"slurp", r"facebookexternalhit", r"facebookcatalog",
+    r"whatsapp", r"skypeuripreview", r"bingpreview", r"google web preview", r"embedly",
+    r"headlesschrome", r"lighthouse", r"pingdom", r"uptimerobot", r"uptime-kuma",
+    r"python-requests", r"python-urllib", r"curl/", r"wget/", r"go-http-client", r"okhttp",
+    r"\bjava/",
+)
+
+BOTS_DEFAULTS = {
+    "MODE": "count",
+    "EXTRA_SIGNATURES": (),
+}
+
+
+def get_bots_config():
+    return {**BOTS_DEFAULTS, **getattr(settings, "ANALYTICS_BOTS", {})}
+
+
+@lru_cache(maxsize=1)
+def _signature_pattern(signatures):
+    return re.compile("|".join(signatures))
+
+
+def bot_signatures():
+    extra = tuple(re.escape(signature.lower()) for signature in get_bots_config()["EXTRA_SIGNATURES"])
+    return DEFAULT_BOT_SIGNATURES + extra
+
+
+@lru_cache(maxsize=getattr(settings, "ANALYTICS_UA_CACHE_SIZE", 1024))
+def is_bot(user_agent_string):
+    """True for crawlers, link-preview fetchers and scripts (no user agent at all)."""
+    if not user_agent_string:
+        return True
+    if _signature_pattern(bot_signatures()).search(user_agent_string.lower()):
+        return True
+    return parse_user_agent(user_agent_string).is_bot
+
+
+def cache_stats():
+    info = parse_user_agent.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+    }
@@ -3,7 +3,7 @@ from dashboard.views import (
     news_create, news_delete,
     news_edit, news_manager, news_publish, standings_delete,
     standings_manager, manage_standings, standings_edit,
-    analytics_dashboard, settings_general, settings_integrations, 
+    analytics_dashboard, analytics_export, analytics_live, settings_general, settings_integrations, 
     settings_team, social_delete, menu_delete, edit_team_member,
     update_club_settings, update_menu_items, update_social_links,
     create_role, create_team_member, assign_cms_user, delete_team_member,
@@ -87,6 +87,8 @@ urlpatterns = [
     
 
     path('analytics/', analytics_dashboard, name='analytics_dashboard'),
+    path('analytics/export/', analytics_export, name='analytics_export'),
+    path('analytics/live/', analytics_live, name='analytics_live'),
     path("login/", auth_views.LoginView.as_view(template_name="dashboard/login.html"), name="login"),
     path("logout/", auth_views.LogoutView.as_view(next_page="dashboard:login"), name="logout"),
 
@@ -5,6 +5,7 @@ from news.forms import (
     NewsCoreForm, NewsSEOForm, NewsSettingsForm, NewsSocialForm
 )
 from matches.forms import StandingForm 
+from matches.standings import cached_table
 from dashboard.models import (
     ClubGeneralSettings, ClubIntegrationSettings, MenuItem,
     ClubTeamMember, ClubRole, SocialLink, Season, get_current_season
@@ -12,19 +13,21 @@ from dashboard.models import (
 from dashboard.forms import (
     ClubGeneralSettingsForm, ClubIntegrationSettingsForm,
     ClubRoleForm, ClubTeamMemberForm, AssignCMSUserForm, 
-    SocialLinkForm, MenuItemForm
+    SocialLinkForm, MenuItemForm, AnalyticsExportForm, AnalyticsRangeForm
 )
 from players.models import Player
 from players.forms import PlayerForm
 from django.contrib.auth.decorators import login_required
 from datetime import date
 from django.utils import timezone
-from django.db.models import Q, Count, Avg, ExpressionWrapper, DurationField, F
-from django.db.models.functions import TruncDate
+from django.db.models import Q
 from datetime import timedelta
-from .models import PageView, VisitorSession
+from .live import live_count
+from .export import FORMATS, day_range, export_filename, stream_export
+from .report import GRANULARITIES, RANGES, dashboard_report, resolve_range
 from django.contrib import messages
 from django.urls import reverse
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.forms import inlineformset_factory
 
 
@@ -176,19 +179,7 @@ def standings_manager(request):
     else:
         season = get_current_season()
 
-    standings = Standing.objects.filter(
-        match_type=match_type,
-        season=season
-    )
-
-    standings = sorted(
-        standings,
-        key=lambda s: (s.points, s.goal_difference, s.goal_for, -s.goal_against),
-        reverse=True
-    )
-
-    for idx, s in enumerate(standings, start=1):
-        s.position = idx
+    standings = cached_table(match_type, season)
 
     match_type_display = dict(Standing.MATCH_TYPE_CHOICES).get(match_type, match_type)
 
@@ -216,25 +207,8 @@ def manage_standings(request):
     else:
         season = get_current_season()
 
-    # Fetch standings
-    standings = Standing.objects.filter(
-        match_type=match_type,
-        season=season
-    )
-
-    # Sort standings
-    sorted_standings = sorted(
-        standings,
-        key=lambda s: (s.points, s.goal_difference, s.goal_for, -s.goal_against),
-        reverse=True
-    )
-
-    standings_with_positions = []
-    for idx, standing in enumerate(sorted_standings, start=1):
-        standings_with_positions.append({
-            'standing': standing,
-            'position': idx
-        })
+    # Cached table, ordered and ranked in SQL, with .position
+    standings = cached_table(match_type, season)
 
     if request.method == "POST":
         form = StandingForm(request.POST)
@@ -262,7 +236,7 @@ def manage_standings(request):
         form = StandingForm(initial={"season": season, "match_type": match_type})
 
     return render(request, "dashboard/standings_form.html", {
-        "standings_with_positions": standings_with_positions,
+        "standings": standings,
         "form": form,
         "selected_season": season.id,  # ✅ Pass ID, not string
         "selected_match_type": match_type,
@@ -327,233 +301,73 @@ def standings_delete(request, pk):
 
 @login_required
 def analytics_dashboard(request):
-    # Date range - last 7 days
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=7)
-    
-    # EXCLUDE analytics/dashboard URLs from all queries
-    excluded_paths = [
-        '/analytics/',
-        '/dashboard/',
-        '/admin/',
-        '/static/',
-        '/media/',
-    ]
-    
-    # Basic metrics - EXCLUDE analytics URLs
-    total_visits = PageView.objects.filter(
-        timestamp__range=(start_date, end_date)
-    ).exclude(
-        Q(url__startswith='/analytics/') |
-        Q(url__startswith='/dashboard/') |
-        Q(url__startswith='/admin/') |
-        Q(url__startswith='/static/') |
-        Q(url__startswith='/media/')
-    ).count()
-    
-    # Get sessions that only visited your tracked pages (not analytics)
-    valid_sessions = PageView.objects.filter(
-        timestamp__range=(start_date, end_date)
-    ).exclude(
-        Q(url__startswith='/analytics/') |
-        Q(url__startswith='/dashboard/') |
-        Q(url__startswith='/admin/') |
-        Q(url__startswith='/static/') |
-        Q(url__startswith='/media/')
-    ).values_list('visitor_session_id', flat=True).distinct()
-    
-    unique_visitors = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        start_time__range=(start_date, end_date)
-    ).count()
-    
-    # Bounce rate calculation - only for valid sessions
-    bounce_sessions = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        start_time__range=(start_date, end_date)
-    ).annotate(
-        page_count=Count('page_views')
-    ).filter(page_count=1).count()
-    
-    bounce_rate = round((bounce_sessions / unique_visitors * 100) if unique_visitors > 0 else 0, 1)
-    
-    # Average session duration - only for valid sessions
-    avg_duration_result = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        start_time__range=(start_date, end_date),
-        end_time__isnull=False
-    ).annotate(
-        duration=ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
-    ).aggregate(avg_duration=Avg('duration'))
-    
-    avg_duration = avg_duration_result['avg_duration'] or timedelta(0)
-    avg_duration_minutes = round(avg_duration.total_seconds() / 60, 1) if avg_duration else 0
-    
-    # New vs returning visitors - only for valid sessions
-    returning_visitors = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        start_time__range=(start_date, end_date)
-    ).values('ip_address').annotate(count=Count('id')).filter(count__gt=1).count()
-    
-    new_visitors = unique_visitors - returning_visitors
-    
-    # Daily data for chart - EXCLUDE analytics URLs
-    daily_data = PageView.objects.filter(
-        timestamp__range=(start_date, end_date)
-    ).exclude(
-        Q(url__startswith='/analytics/') |
-        Q(url__startswith='/dashboard/') |
-        Q(url__startswith='/admin/') |
-        Q(url__startswith='/static/') |
-        Q(url__startswith='/media/')
-    ).annotate(
-        day=TruncDate('timestamp')
-    ).values('day').annotate(
-        count=Count('id')
-    ).order_by('day')
-    
-    # Top pages - EXCLUDE analytics URLs
-    top_pages = PageView.objects.filter(
-        timestamp__range=(start_date, end_date)
-    ).exclude(
-        Q(url__startswith='/analytics/') |
-        Q(url__startswith='/dashboard/') |
-        Q(url__startswith='/admin/') |
-        Q(url__startswith='/static/') |
-        Q(url__startswith='/media/')
-    ).values('url').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
-    
-    # Section breakdown - already filtered by specific URLs
-    section_breakdown = {
-        'Home': PageView.objects.filter(timestamp__range=(start_date, end_date), url='/').count(),
-        'News': PageView.objects.filter(timestamp__range=(start_date, end_date), url__startswith='/news/').count(),
-        'Players': PageView.objects.filter(timestamp__range=(start_date, end_date), url__startswith='/players/').count(),
-        'Standings': PageView.objects.filter(timestamp__range=(start_date, end_date), url__startswith='/standings/').count(),
-    }
-    
-    # --- Helper function for traffic sources ---
-    def count_referrers(*queries):
-        """Utility to count pageviews with one or more Q queries combined."""
-        q_obj = Q()
-        for q in queries:
-            q_obj |= q
-        return PageView.objects.filter(
-            timestamp__range=(start_date, end_date)
-        ).exclude(
-            Q(url__startswith='/analytics/') |
-            Q(url__startswith='/dashboard/') |
-            Q(url__startswith='/admin/') |
-            Q(url__startswith='/static/') |
-            Q(url__startswith='/media/')
-        ).filter(q_obj).count()
-    
-    # Traffic sources - EXCLUDE analytics URLs
-    traffic_sources = {
-        'Direct': PageView.objects.filter(
-            timestamp__range=(start_date, end_date),
-            referrer__isnull=True
-        ).exclude(
-            Q(url__startswith='/analytics/') |
-            Q(url__startswith='/dashboard/') |
-            Q(url__startswith='/admin/') |
-            Q(url__startswith='/static/') |
-            Q(url__startswith='/media/')
-        ).count(),
-        'Search': count_referrers(
-            Q(referrer__icontains='google'),
-            Q(referrer__icontains='bing'),
-            Q(referrer__icontains='yahoo'),
-            Q(referrer__icontains='duckduckgo')
-        ),
-        'Social': count_referrers(
-            Q(referrer__icontains='facebook'),
-            Q(referrer__icontains='twitter'),
-            Q(referrer__icontains='instagram'),
-            Q(referrer__icontains='linkedin')
-        ),
-        'Email': count_referrers(
-            Q(referrer__icontains='mail.'),
-            Q(referrer__icontains='email'),
-            Q(referrer__icontains='newsletter')
-        ),
-        'Other': PageView.objects.filter(
-            timestamp__range=(start_date, end_date),
-            referrer__isnull=False
-        ).exclude(
-            Q(url__startswith='/analytics/') |
-            Q(url__startswith='/dashboard/') |
-            Q(url__startswith='/admin/') |
-            Q(url__startswith='/static/') |
-            Q(url__startswith='/media/') |
-            Q(referrer__icontains='google') |
-            Q(referrer__icontains='bing') |
-            Q(referrer__icontains='yahoo') |
-            Q(referrer__icontains='duckduckgo') |
-            Q(referrer__icontains='facebook') |
-            Q(referrer__icontains='twitter') |
-            Q(referrer__icontains='instagram') |
-            Q(referrer__icontains='linkedin') |
-            Q(referrer__icontains='mail.') |
-            Q(referrer__icontains='email') |
-            Q(referrer__icontains='newsletter')
-        ).count()
-    }
-    
-    # Device types - only for valid sessions
-    device_types = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        start_time__range=(start_date, end_date)
-    ).values('device_type').annotate(
-        count=Count('id')
+    # ?range=, ?granularity= and ?compare=; invalid choices fall back to
+    # the defaults (last 7 days, daily, no comparison)
+    form = AnalyticsRangeForm(request.GET)
+    if not form.is_valid():
+        form = AnalyticsRangeForm({})
+        form.is_valid()
+    options = form.cleaned_data
+
+    # Figures are cached per range, see dashboard/report.py
+    report_range = resolve_range(options['range'], options['start'], options['end'])
+    report = dashboard_report(
+        report_range, options['granularity'], options['compare'], options['route']
     )
-    device_types_dict = {d['device_type']: d['count'] for d in device_types}
-    
-    # Top browsers - only for valid sessions
-    top_browsers = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        start_time__range=(start_date, end_date)
-    ).values('browser').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
-    
-    # Top operating systems - only for valid sessions
-    top_os = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        start_time__range=(start_date, end_date)
-    ).values('operating_system').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
-    
-    # Real-time active visitors (last 5 minutes) - only for valid sessions
-    active_visitors = VisitorSession.objects.filter(
-        id__in=valid_sessions,
-        end_time__gte=timezone.now() - timedelta(minutes=5)
-    ).count()
-    
+
+    range_query = request.GET.copy()
+    range_query.pop('route', None)
+
     context = {
-        'total_visits': total_visits,
-        'unique_visitors': unique_visitors,
-        'bounce_rate': bounce_rate,
-        'avg_duration': avg_duration_minutes,
-        'new_visitors': new_visitors,
-        'returning_visitors': returning_visitors,
-        'active_visitors': active_visitors,
-        'daily_data': list(daily_data),
-        'top_pages': list(top_pages),
-        'section_breakdown': section_breakdown,
-        'traffic_sources': traffic_sources,
-        'device_types': device_types_dict,
-        'top_browsers': list(top_browsers),
-        'top_os': list(top_os),
-        'start_date': start_date,
-        'end_date': end_date,
+        **report,
+        # Real-time count from memory, refreshed by polling analytics_live
+        'active_visitors': live_count()['active_visitors'],
+        'start_date': report_range.start,
+        'end_date': report_range.end,
+        'selected_range': options['range'],
+        'selected_granularity': options['granularity'],
+        'compare': options['compare'],
+        'selected_route': options['route'],
+        # Current query string without ?route=, for the Top Routes links
+        'range_query': range_query.urlencode(),
+        'range_choices': RANGES,
+        'granularity_choices': GRANULARITIES,
     }
     
     return render(request, "dashboard/analytics_dashboard.html", context)
 
 
+@login_required
+def analytics_live(request):
+    """Active visitors right now, polled by the dashboard (see dashboard/live.py)."""
+    return JsonResponse(live_count())
+
+
+@login_required
+def analytics_export(request):
+    """Stream raw page views or sessions as CSV/NDJSON (see dashboard/export.py)."""
+    form = AnalyticsExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    options = form.cleaned_data
+
+    start, end = day_range(options['start'], options['end'])
+    response = StreamingHttpResponse(
+        stream_export(
+            options['dataset'], start, end,
+            fmt=options['format'],
+            section=options['section'] or None,
+            compress=options['gzip'],
+        ),
+        content_type=FORMATS[options['format']],
+    )
+    filename = export_filename(
+        options['dataset'], options['start'], options['end'], options['format'], options['gzip']
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 
 
 def settings_general(request):
@@ -0,0 +1,55 @@
+"""
+Cookie-only visitor identity for analytics.
+
+Each visitor gets a random id in its own signed, long-lived cookie; the id
+is the VisitorSession key. Nothing is stored server-side until a hit is
+written, and public pages never touch ``request.session``, so they don't
+create django_session rows or get ``Vary: Cookie``.
+
+Configuration lives in ``settings.ANALYTICS_VISITOR_COOKIE``:
+    - NAME: cookie name.
+    - MAX_AGE: lifetime in seconds.
+    - SALT: signing salt, so the value can't be reused as another signed cookie.
+"""
+
+import uuid
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    "NAME": "visitor_id",
+    "MAX_AGE": 60 * 60 * 24 * 365 * 2,
+    "SALT": "dashboard.visitor",
+}
+
+
+def get_cookie_config():
+    return {**DEFAULTS, **getattr(settings, "ANALYTICS_VISITOR_COOKIE", {})}
+
+
+def get_visitor_id(request):
+    """The visitor id from a valid signed cookie, or None."""
+    config = get_cookie_config()
+    visitor_id = request.get_signed_cookie(config["NAME"], default=None, salt=config["SALT"])
+    # Ids are uuid4 hex strings; anything else is ignored and replaced
+    if visitor_id and len(visitor_id) == 32 and visitor_id.isalnum():
+        return visitor_id
+    return None
+
+
+def new_visitor_id():
+    return uuid.uuid4().hex
+
+
+def set_visitor_cookie(response, visitor_id):
+    config = get_cookie_config()
+    response.set_signed_cookie(
+        config["NAME"],
+        visitor_id,
+        salt=config["SALT"],
+        max_age=config["MAX_AGE"],
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite="Lax",
+    )
@@ -1,10 +1,51 @@
 from django.shortcuts import render
+from django.core.cache import cache
 from django.db.models import Q
 from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.text import slugify
+from dashboard.models import get_current_season
 from matches.models import Match, Standing
+from matches.standings import (
+    cache_timeout, get_homepage_standings_config, table_version, top_of_table,
+)
 from news.models import News
 
 
+def standings_widget(team_name):
+    """
+    The homepage league table, rendered once per version of its table.
+
+    Shows the top rows of the configured competition in the current
+    season, plus the club's row when it is lower (see
+    settings.HOMEPAGE_STANDINGS). The HTML is cached until a result or a
+    standing changes the table, so a request costs the season lookup and
+    one cache read however much history there is.
+    """
+    config = get_homepage_standings_config()
+    match_type, top = config["MATCH_TYPE"], config["TOP"]
+    season = get_current_season()
+    season_id = season.pk if season else None
+
+    key = (
+        f"home:standings:{season_id}:{match_type}:{top}:{slugify(team_name)}"
+        f":{table_version(season_id, match_type)}"
+    )
+    html = cache.get(key)
+    if html is None:
+        rows, club_row = top_of_table(match_type, season, top, team_name)
+        html = render_to_string("home/partials/standings_widget.html", {
+            "standings": rows,
+            "club_row": club_row,
+            "team_name": team_name,
+            "season": season,
+            "match_type": match_type,
+            "match_type_display": dict(Standing.MATCH_TYPE_CHOICES).get(match_type, match_type),
+        })
+        cache.set(key, html, cache_timeout())
+    return html
+
+
 def home(request):
     """
     Public homepage view.
@@ -12,13 +53,13 @@ def home(request):
     Responsibilities:
     - Show the next 3 upcoming matches involving the configured team.
     - Show the last 3 finished matches involving the configured team.
-    - Display the top 5 league standings (with calculated position).
+    - Display the league table widget (see standings_widget()).
     - Show the latest 3 published news posts.
 
     Context provided to the template:
     - upcoming_matches: Queryset of the next 3 matches.
     - recent_results: Queryset of the last 3 finished matches.
-    - standings: Top 5 standings with calculated_position added dynamically.
+    - standings_widget: Rendered league table (top rows plus the club's row).
     - latest_news: Latest 3 published news articles.
     """
 
@@ -39,20 +80,8 @@ def home(request):
         .order_by("-date")[:3]  # Last 3 finished matches
     )
 
-    # --- Standings (Top 5) ---
-    all_standings = Standing.objects.all()
-
-    # Sort standings by multiple criteria:
-    # Priority: points > goal_difference > goals_for > goals_against (ascending)
-    sorted_standings = sorted(
-        all_standings,
-        key=lambda s: (s.points, s.goal_difference, s.goal_for, -s.goal_against),
-        reverse=True,
-    )
-
-    # Dynamically assign calculated_position (only for top 5)
-    for idx, standing in enumerate(sorted_standings[:5], start=1):
-        standing.calculated_position = idx
+    # --- Standings (top N + the club's row, cached fragment) ---
+    standings_html = standings_widget(team_name)
 
     # --- Latest News ---
     latest_news = (
@@ -67,7 +96,7 @@ def home(request):
         {
             "upcoming_matches": upcoming_matches,
             "recent_results": recent_results,
-            "standings": sorted_standings[:5],
+            "standings_widget": standings_html,
             "latest_news": latest_news,
         },
     )
@@ -1,51 +1,10 @@
 from django import forms
+from django.db import transaction
+from .ledger import apply_match_result
 from .models import Match, Standing, Team
 from dashboard.models import Season, get_current_season
 
 
-# ============================
-# Utility: Update standings
-# ============================
-def update_standings_from_match(match):
-    if match.status != 'finished':
-        return
-    
-    home_standing, _ = Standing.objects.get_or_create(
-        team=match.home_team,
-        match_type=match.match_type,
-        season=match.season,
-        defaults={"played": 0, "won": 0, "drawn": 0, "lost": 0, "goal_for": 0, "goal_against": 0}
-    )
-
-    away_standing, _ = Standing.objects.get_or_create(
-        team=match.away_team,
-        match_type=match.match_type,
-        season=match.season,
-        defaults={"played": 0, "won": 0, "drawn": 0, "lost": 0, "goal_for": 0, "goal_against": 0}
-    )
-
-    home_standing.played += 1
-    away_standing.played += 1
-
-    home_standing.goal_for += match.home_score
-    home_standing.goal_against += match.away_score
-    away_standing.goal_for += match.away_score
-    away_standing.goal_against += match.home_score
-
-    if match.home_score > match.away_score:
-        home_standing.won += 1
-        away_standing.lost += 1
-    elif match.home_score < match.away_score:
-        home_standing.lost += 1
-        away_standing.won += 1
-    else:
-        home_standing.drawn += 1
-        away_standing.drawn += 1
-
-    home_standing.save()
-    away_standing.save()
-
-
 # ============================
 # Match Form
 # ============================
@@ -79,6 +38,23 @@ class MatchForm(forms.ModelForm):
         return match
 
 
+class FinishedMatchForm(MatchForm):
+    """MatchForm for a finished match, whose score can be corrected too."""
+
+    class Meta(MatchForm.Meta):
+        fields = MatchForm.Meta.fields + ["home_score", "away_score"]
+        widgets = {
+            **MatchForm.Meta.widgets,
+            "home_score": forms.NumberInput(attrs={"class": "form-input", "min": 0}),
+            "away_score": forms.NumberInput(attrs={"class": "form-input", "min": 0}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["home_score"].required = True
+        self.fields["away_score"].required = True
+
+
 # ============================
 # Match Result Form
 # ============================
@@ -119,8 +95,10 @@ class MatchResultForm(forms.ModelForm):
         match.status = "finished"
 
         if commit:
-            match.save()
-            update_standings_from_match(match)
+            # The result and its standings update land together or not at all
+            with transaction.atomic():
+                match.save()
+                apply_match_result(match)
 
         return match
 
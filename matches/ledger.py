@@ -0,0 +1,247 @@
+"""
+Standings ledger: what each finished match contributes to the standings.
+
+Every finished match has one StandingEntry per team, holding the played,
+won, drawn, lost, goal_for and goal_against it added to that team's
+Standing. ``apply_match_result()`` brings the standings in line with the
+match as it is now. In one transaction, it compares the recorded entries
+with what the result should contribute and applies only the difference,
+as ``F()`` increments, so results entered at the same time for other
+matches are never overwritten:
+
+    - a new result adds its contribution;
+    - applying the same result again changes nothing;
+    - an edited score (or team, competition or season) applies the change;
+    - a match that is no longer finished has its contribution taken out.
+
+``revert_match()`` takes a match's contribution out before it is deleted.
+
+Entries also record their matchday, and every change refreshes the
+matchday snapshots of the tables it touched from the earliest day that
+changed (see snapshots.py).
+
+``rebuild_standings()`` recomputes the standings and ledger of a whole
+season or competition at once. It is set-based: the database sums the
+finished matches per (team, competition, season), with one grouped query
+for the home sides and one for the away sides, and the standings are
+written back with one bulk upsert. The ledger entries, one per match and
+team, are built from a single read of the matches. There are no
+per-match queries.
+
+The (match, standing) unique constraint on StandingEntry means that when
+two people submit the same result at once, it counts only once: the
+second transaction fails and is rolled back as a whole.
+"""
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, When
+from django.utils import timezone
+
+from .models import Match, Standing, StandingEntry
+from .snapshots import STAT_FIELDS, refresh_snapshots
+from .standings import invalidate_table
+
+
+NO_CONTRIBUTION = dict.fromkeys(STAT_FIELDS, 0)
+
+
+def result_stats(home_team_id, away_team_id, home_score, away_score):
+    """{team_id: {stat: value}} that a final score adds to each team."""
+    return {
+        team_id: {
+            "played": 1,
+            "won": int(scored > conceded),
+            "drawn": int(scored == conceded),
+            "lost": int(scored < conceded),
+            "goal_for": scored,
+            "goal_against": conceded,
+        }
+        for team_id, scored, conceded in (
+            (home_team_id, home_score, away_score),
+            (away_team_id, away_score, home_score),
+        )
+    }
+
+
+def contributions(match):
+    """{team_id: {stat: value}} that the result of ``match`` adds to each team."""
+    if match.status != "finished" or match.home_score is None or match.away_score is None:
+        return {}
+    return result_stats(match.home_team_id, match.away_team_id, match.home_score, match.away_score)
+
+
+def _sync(match, wanted):
+    """
+    Make the ledger entries of ``match`` equal ``wanted`` ({standing_id: stats}).
+
+    The wanted standings are in the match's own table. Every table the
+    entries touch has its cached copy invalidated and its snapshots
+    refreshed from the earliest matchday that changed.
+    """
+    day = timezone.localdate(match.date)
+    table = (match.season_id, match.match_type)
+    recorded = StandingEntry.objects.select_for_update().select_related("standing").filter(match=match)
+    entries = {entry.standing_id: entry for entry in recorded}
+
+    tables = {table} | {(entry.standing.season_id, entry.standing.match_type) for entry in entries.values()}
+    # table -> earliest matchday whose snapshot changes
+    changed = {}
+
+    def touch(table, since):
+        changed[table] = min(changed.get(table, since), since)
+
+    for standing_id in entries.keys() | wanted.keys():
+        entry = entries.get(standing_id)
+        old = {field: getattr(entry, field) for field in STAT_FIELDS} if entry else NO_CONTRIBUTION
+        new = wanted.get(standing_id, NO_CONTRIBUTION)
+        delta = {field: new[field] - old[field] for field in STAT_FIELDS if new[field] != old[field]}
+        moved = entry is not None and entry.day != day
+
+        if delta:
+            Standing.objects.filter(pk=standing_id).update(
+                **{field: F(field) + change for field, change in delta.items()}
+            )
+        if delta or moved:
+            if entry is not None:
+                touch((entry.standing.season_id, entry.standing.match_type), entry.day)
+            if standing_id in wanted:
+                touch(table, day)
+
+        if standing_id not in wanted:
+            entry.delete()
+        elif entry is None:
+            StandingEntry.objects.create(match=match, standing_id=standing_id, day=day, **new)
+        elif delta or moved:
+            StandingEntry.objects.filter(pk=entry.pk).update(day=day, **new)
+
+    for season_id, match_type in tables:
+        invalidate_table(season_id, match_type)
+    for (season_id, match_type), since in changed.items():
+        refresh_snapshots(season_id, match_type, since)
+
+
+@transaction.atomic
+def apply_match_result(match):
+    """Apply ``match``'s current result to the standings, counting only what changed."""
+    wanted = {}
+    for team_id, stats in contributions(match).items():
+        standing, _ = Standing.objects.get_or_create(
+            team_id=team_id, match_type=match.match_type, season_id=match.season_id
+        )
+        wanted[standing.pk] = stats
+    _sync(match, wanted)
+
+
+@transaction.atomic
+def revert_match(match):
+    """Take ``match``'s contribution back out of the standings (e.g. before deleting it)."""
+    _sync(match, {})
+
+
+# ============================
+#  Full rebuild
+# ============================
+
+def finished_matches(**scope):
+    return Match.objects.filter(
+        status="finished", home_score__isnull=False, away_score__isnull=False, **scope
+    ).order_by()
+
+
+def finished_results(**scope):
+    """(id, home_team_id, away_team_id, home_score, away_score, match_type, season_id, date) of finished matches."""
+    return finished_matches(**scope).values_list(
+        "id", "home_team_id", "away_team_id", "home_score", "away_score", "match_type", "season_id", "date"
+    )
+
+
+def side_totals(matches, side):
+    """
+    {(team_id, match_type, season_id): {stat: value}} of the ``side``
+    ("home" or "away") teams of ``matches``, summed by the database.
+    """
+    other = "away" if side == "home" else "home"
+    scored, conceded = f"{side}_score", f"{other}_score"
+
+    def count(lookup):
+        return Sum(Case(When(**{f"{scored}__{lookup}": F(conceded)}, then=1), default=0))
+
+    rows = matches.values(f"{side}_team", "match_type", "season").annotate(
+        played=Count("id"),
+        won=count("gt"),
+        drawn=count("exact"),
+        lost=count("lt"),
+        goal_for=Sum(scored),
+        goal_against=Sum(conceded),
+    )
+    return {
+        (row[f"{side}_team"], row["match_type"], row["season"]): {field: row[field] for field in STAT_FIELDS}
+        for row in rows
+    }
+
+
+@transaction.atomic
+def rebuild_standings(season=None, match_type=None, batch_size=500):
+    """
+    Recompute the standings and ledger in scope from every finished match.
+
+    ``season`` and ``match_type`` narrow the scope; standings in scope that
+    no finished match touches end up at zero. The snapshots of every table
+    in scope are rebuilt as well. Returns the number of matches counted.
+    """
+    scope = {}
+    if season is not None:
+        scope["season"] = season
+    if match_type:
+        scope["match_type"] = match_type
+
+    # (team_id, match_type, season_id) -> totals: home and away sides
+    # summed by the database, then merged
+    totals = side_totals(finished_matches(**scope), "home")
+    for key, stats in side_totals(finished_matches(**scope), "away").items():
+        total = totals.setdefault(key, dict(NO_CONTRIBUTION))
+        for field in STAT_FIELDS:
+            total[field] += stats[field]
+
+    # Each match's share, for the ledger
+    shares = []
+    results = list(finished_results(**scope))
+    for match_id, home_team_id, away_team_id, home_score, away_score, kind, season_id, date in results:
+        day = timezone.localdate(date)
+        for team_id, stats in result_stats(home_team_id, away_team_id, home_score, away_score).items():
+            shares.append((match_id, (team_id, kind, season_id), day, stats))
+
+    standings = Standing.objects.filter(**scope)
+    tables = set(standings.values_list("season_id", "match_type").distinct()) | {
+        (season_id, kind) for _, kind, season_id in totals
+    }
+    StandingEntry.objects.filter(standing__in=standings).delete()
+    standings.update(**NO_CONTRIBUTION)
+
+    written = Standing.objects.bulk_create(
+        [
+            Standing(team_id=team_id, match_type=kind, season_id=season_id, **stats)
+            for (team_id, kind, season_id), stats in totals.items()
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["team", "match_type", "season"],
+        update_fields=list(STAT_FIELDS),
+    )
+    standing_ids = {
+        (standing.team_id, standing.match_type, standing.season_id): standing.pk
+        for standing in written
+    }
+
+    StandingEntry.objects.bulk_create(
+        [
+            StandingEntry(match_id=match_id, standing_id=standing_ids[key], day=day, **stats)
+            for match_id, key, day, stats in shares
+        ],
+        batch_size=batch_size,
+    )
+
+    for season_id, kind in tables:
+        invalidate_table(season_id, kind)
+        refresh_snapshots(season_id, kind, batch_size=batch_size)
+    return len(results)
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from matches.models import Standing, StandingEntry, StandingSnapshot
+from matches.snapshots import refresh_snapshots
+from matches.standings import find_season
+
+
+class Command(BaseCommand):
+    help = 'Build the matchday standings snapshots from the ledger, e.g. for past seasons'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--season',
+            help='Specific season to backfill, by name or id (e.g., "2024/2025")',
+        )
+        parser.add_argument(
+            '--match-type',
+            choices=[choice for choice, _ in Standing.MATCH_TYPE_CHOICES],
+            help='Specific match type to backfill (e.g., "division_two")',
+        )
+
+    def handle(self, *args, **options):
+        entries = StandingEntry.objects.all()
+        snapshots = StandingSnapshot.objects.all()
+        if options['season']:
+            season = find_season(options['season'])
+            if season is None:
+                raise CommandError(f'Season "{options["season"]}" does not exist.')
+            entries = entries.filter(standing__season=season)
+            snapshots = snapshots.filter(season=season)
+        if options['match_type']:
+            entries = entries.filter(standing__match_type=options['match_type'])
+            snapshots = snapshots.filter(match_type=options['match_type'])
+
+        # Tables with results, and any with snapshots left over from results since removed
+        tables = set(
+            entries.order_by().values_list('standing__season_id', 'standing__match_type').distinct()
+        ) | set(snapshots.order_by().values_list('season_id', 'match_type').distinct())
+
+        started = time.perf_counter()
+        rows = 0
+        for season_id, match_type in sorted(tables):
+            rows += refresh_snapshots(season_id, match_type)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Wrote {rows} standing snapshots for {len(tables)} tables in {elapsed:.2f}s'
+            )
+        )
@@ -1,6 +1,11 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from matches.models import Match, Standing  # Replace 'your_app' with your actual app name
+from matches.ledger import apply_match_result, finished_results, rebuild_standings
+from matches.models import Match, Standing, StandingEntry, StandingSnapshot
+from matches.standings import find_season
+
 
 class Command(BaseCommand):
     help = 'Update all standings based on completed matches'
@@ -8,108 +13,68 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             '--season',
-            help='Specific season to update (e.g., "2024/2025")',
+            help='Specific season to update, by name or id (e.g., "2024/2025")',
         )
         parser.add_argument(
             '--match-type',
+            choices=[choice for choice, _ in Standing.MATCH_TYPE_CHOICES],
             help='Specific match type to update (e.g., "division_two")',
         )
+        parser.add_argument(
+            '--per-match',
+            action='store_true',
+            help='Apply the matches one at a time instead of in bulk (slower; for comparison)',
+        )
 
     def handle(self, *args, **options):
-        season = options['season']
+        season = self.get_season(options['season'])
         match_type = options['match_type']
-        
-        # Build query based on provided options
-        match_filters = {'status': 'finished'}
+
+        scope = {}
         if season:
-            match_filters['season'] = season
+            scope['season'] = season
         if match_type:
-            match_filters['match_type'] = match_type
-            
-        # Get finished matches based on filters
-        finished_matches = Match.objects.filter(**match_filters)
-        
-        if not finished_matches.exists():
+            scope['match_type'] = match_type
+
+        if not finished_results(**scope).exists():
             self.stdout.write(self.style.WARNING('No finished matches found to process.'))
             return
-        
-        self.stdout.write(f'Processing {finished_matches.count()} finished matches...')
-        
-        # Use transaction to ensure data consistency
+
+        started = time.perf_counter()
+        if options['per_match']:
+            count = self.apply_per_match(scope)
+            engine = 'per match'
+        else:
+            count = rebuild_standings(season=season, match_type=match_type)
+            engine = 'bulk'
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully updated standings from {count} matches in {elapsed:.2f}s ({engine})'
+            )
+        )
+
+    def get_season(self, value):
+        if not value:
+            return None
+        season = find_season(value)
+        if season is None:
+            raise CommandError(f'Season "{value}" does not exist.')
+        return season
+
+    def apply_per_match(self, scope):
+        """The old engine: reset, then apply every match through the ledger."""
         with transaction.atomic():
-            # Reset relevant standings to zero
-            standing_filters = {}
-            if season:
-                standing_filters['season'] = season
-            if match_type:
-                standing_filters['match_type'] = match_type
-                
-            if standing_filters:  # Only reset filtered standings
-                Standing.objects.filter(**standing_filters).update(
-                    played=0, won=0, drawn=0, lost=0,
-                    goal_for=0, goal_against=0, points=0, goal_difference=0
-                )
-            else:  # Reset all standings if no filters
-                Standing.objects.all().update(
-                    played=0, won=0, drawn=0, lost=0,
-                    goal_for=0, goal_against=0, points=0, goal_difference=0
-                )
-            
-            # Process all finished matches
+            standings = Standing.objects.filter(**scope)
+            StandingEntry.objects.filter(standing__in=standings).delete()
+            StandingSnapshot.objects.filter(**scope).delete()
+            standings.update(played=0, won=0, drawn=0, lost=0, goal_for=0, goal_against=0)
+
             count = 0
-            for match in finished_matches:
-                self.update_standings_from_match(match)
+            # In date order, so each result only rewrites the latest matchday snapshot
+            matches = Match.objects.filter(id__in=finished_results(**scope).values('id')).order_by('date')
+            for match in matches:
+                apply_match_result(match)
                 count += 1
-            
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully updated standings from {count} matches')
-            )
-    
-    def update_standings_from_match(self, match):
-        """Update standings based on a single match"""
-        # Get or create standing for home team
-        home_standing, created = Standing.objects.get_or_create(
-            team=match.home_team,
-            match_type=match.match_type,
-            season=match.season,
-            defaults={
-                'played': 0, 'won': 0, 'drawn': 0, 'lost': 0,
-                'goal_for': 0, 'goal_against': 0
-            }
-        )
-        
-        # Get or create standing for away team
-        away_standing, created = Standing.objects.get_or_create(
-            team=match.away_team,
-            match_type=match.match_type,
-            season=match.season,
-            defaults={
-                'played': 0, 'won': 0, 'drawn': 0, 'lost': 0,
-                'goal_for': 0, 'goal_against': 0
-            }
-        )
-        
-        # Update matches played
-        home_standing.played += 1
-        away_standing.played += 1
-        
-        # Update goals
-        home_standing.goal_for += match.home_score
-        home_standing.goal_against += match.away_score
-        away_standing.goal_for += match.away_score
-        away_standing.goal_against += match.home_score
-        
-        # Update results
-        if match.home_score > match.away_score:
-            home_standing.won += 1
-            away_standing.lost += 1
-        elif match.home_score < match.away_score:
-            home_standing.lost += 1
-            away_standing.won += 1
-        else:
-            home_standing.drawn += 1
-            away_standing.drawn += 1
-        
-        # Save both standings (this will automatically calculate points and GD)
-        home_standing.save()
-        away_standing.save()
\ No newline at end of file
+        return count
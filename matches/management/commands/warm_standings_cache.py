@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from matches.models import Standing
+from matches.standings import cache_is_per_process, cache_stats, cached_table, find_season, table_season
+
+
+class Command(BaseCommand):
+    help = 'Build the cached standings tables of the current season, e.g. after a deploy (needs a shared cache)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--season',
+            help='Season to warm, by name or id (default: the season each table page shows)',
+        )
+
+    def handle(self, *args, **options):
+        # The tables would go into this command's own memory and vanish with it
+        if cache_is_per_process():
+            raise CommandError(
+                'The cache backend is per-process (LocMemCache), so web workers would never see '
+                'the warmed tables. Configure a shared backend in settings.CACHES first.'
+            )
+
+        season = None
+        if options['season']:
+            season = find_season(options['season'])
+            if season is None:
+                raise CommandError(f'Season "{options["season"]}" does not exist.')
+
+        for match_type, label in Standing.MATCH_TYPE_CHOICES:
+            # The current season, or the latest one with standings until it has any
+            warm_season = season or table_season(match_type)
+            table = cached_table(match_type, warm_season)
+            self.stdout.write(f'{label} {warm_season}: {len(table)} teams')
+
+        stats = cache_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {stats["hits"] + stats["misses"]} standings tables '
+            f'({stats["hits"]} already cached, {stats["misses"]} built).'
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-17 02:41
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0001_initial'),
+    ]
+
+    # A regular column can't be altered into a generated one, so both
+    # fields are dropped and re-added; the database fills them in.
+    operations = [
+        migrations.RemoveField(
+            model_name='standing',
+            name='goal_difference',
+        ),
+        migrations.RemoveField(
+            model_name='standing',
+            name='points',
+        ),
+        migrations.AddField(
+            model_name='standing',
+            name='goal_difference',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('goal_for'), '-', models.F('goal_against')), output_field=models.IntegerField()),
+        ),
+        migrations.AddField(
+            model_name='standing',
+            name='points',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('won'), '*', models.Value(3)), '+', models.F('drawn')), output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='standing',
+            index=models.Index(fields=['season', 'match_type', '-points', '-goal_difference', '-goal_for'], name='standing_table_order_idx'),
+        ),
+    ]
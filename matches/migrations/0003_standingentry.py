@@ -0,0 +1,67 @@
+# Generated by Django 5.1 on 2026-10-17 02:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_finished_matches(apps, schema_editor):
+    # Finished matches are already counted in the standings: record their
+    # contributions in the ledger without touching the standings
+    Match = apps.get_model("matches", "Match")
+    Standing = apps.get_model("matches", "Standing")
+    StandingEntry = apps.get_model("matches", "StandingEntry")
+
+    standings = {
+        (s.team_id, s.match_type, s.season_id): s.pk for s in Standing.objects.all()
+    }
+    entries = []
+    finished = Match.objects.filter(
+        status="finished", home_score__isnull=False, away_score__isnull=False
+    )
+    for match in finished.iterator():
+        for team_id, scored, conceded in (
+            (match.home_team_id, match.home_score, match.away_score),
+            (match.away_team_id, match.away_score, match.home_score),
+        ):
+            standing_id = standings.get((team_id, match.match_type, match.season_id))
+            if standing_id is None:
+                continue
+            entries.append(StandingEntry(
+                match_id=match.pk,
+                standing_id=standing_id,
+                played=1,
+                won=int(scored > conceded),
+                drawn=int(scored == conceded),
+                lost=int(scored < conceded),
+                goal_for=scored,
+                goal_against=conceded,
+            ))
+    StandingEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0002_standing_generated_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StandingEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played', models.PositiveIntegerField(default=0)),
+                ('won', models.PositiveIntegerField(default=0)),
+                ('drawn', models.PositiveIntegerField(default=0)),
+                ('lost', models.PositiveIntegerField(default=0)),
+                ('goal_for', models.PositiveIntegerField(default=0)),
+                ('goal_against', models.PositiveIntegerField(default=0)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standing_entries', to='matches.match')),
+                ('standing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='matches.standing')),
+            ],
+            options={
+                'unique_together': {('match', 'standing')},
+            },
+        ),
+        migrations.RunPython(record_finished_matches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1 on 2026-10-17 02:53
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_entry_days(apps, schema_editor):
+    StandingEntry = apps.get_model("matches", "StandingEntry")
+    entries = list(StandingEntry.objects.select_related("match"))
+    for entry in entries:
+        entry.day = timezone.localdate(entry.match.date)
+    StandingEntry.objects.bulk_update(entries, ["day"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('matches', '0003_standingentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='standingentry',
+            name='day',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(set_entry_days, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='standingentry',
+            name='day',
+            field=models.DateField(),
+        ),
+        migrations.CreateModel(
+            name='StandingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_type', models.CharField(choices=[('division_two', 'Division Two League'), ('sub_middle', 'Sub Middle League'), ('middle', 'Middle League'), ('fa_cup', 'FA Cup'), ('friendlies', 'Club Friendlies')], max_length=50)),
+                ('day', models.DateField()),
+                ('position', models.PositiveIntegerField()),
+                ('played', models.PositiveIntegerField(default=0)),
+                ('won', models.PositiveIntegerField(default=0)),
+                ('drawn', models.PositiveIntegerField(default=0)),
+                ('lost', models.PositiveIntegerField(default=0)),
+                ('goal_for', models.PositiveIntegerField(default=0)),
+                ('goal_against', models.PositiveIntegerField(default=0)),
+                ('goal_difference', models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('goal_for'), '-', models.F('goal_against')), output_field=models.IntegerField())),
+                ('points', models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('won'), '*', models.Value(3)), '+', models.F('drawn')), output_field=models.PositiveIntegerField())),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standing_snapshots', to='dashboard.season')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standing_snapshots', to='matches.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['team', 'season', 'match_type', 'day'], name='snapshot_team_series_idx')],
+                'unique_together': {('season', 'match_type', 'day', 'team')},
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from dashboard.models import get_current_season
 
 
@@ -89,9 +90,17 @@ class Standing(models.Model):
     goal_for = models.PositiveIntegerField(default=0)
     goal_against = models.PositiveIntegerField(default=0)
 
-    # Calculated fields
-    goal_difference = models.IntegerField(default=0)
-    points = models.PositiveIntegerField(default=0)
+    # Calculated fields, computed and stored by the database on every write
+    goal_difference = models.GeneratedField(
+        expression=F("goal_for") - F("goal_against"),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+    points = models.GeneratedField(
+        expression=F("won") * 3 + F("drawn"),
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+    )
 
     match_type = models.CharField(max_length=50, choices=MATCH_TYPE_CHOICES, default="division_two")
 
@@ -105,12 +114,78 @@ class Standing(models.Model):
 
     class Meta:
         unique_together = ("team", "match_type", "season")  # one standing per team per league & season
+        indexes = [
+            # League tables: one season & competition in table order
+            models.Index(
+                fields=["season", "match_type", "-points", "-goal_difference", "-goal_for"],
+                name="standing_table_order_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.team.name} ({self.match_type} - {self.season})"
 
-    def save(self, *args, **kwargs):
-        # Calculate points and goal difference before saving
-        self.points = self.won * 3 + self.drawn
-        self.goal_difference = self.goal_for - self.goal_against
-        super().save(*args, **kwargs)
+
+# ============================
+# Standing Ledger Model
+# ============================
+class StandingEntry(models.Model):
+    """What one finished match contributes to one team's standing (see matches/ledger.py)."""
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="standing_entries")
+    standing = models.ForeignKey(Standing, on_delete=models.CASCADE, related_name="entries")
+    day = models.DateField()  # matchday: the local date of the match
+    played = models.PositiveIntegerField(default=0)
+    won = models.PositiveIntegerField(default=0)
+    drawn = models.PositiveIntegerField(default=0)
+    lost = models.PositiveIntegerField(default=0)
+    goal_for = models.PositiveIntegerField(default=0)
+    goal_against = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("match", "standing")  # a result counts once per standing
+
+    def __str__(self):
+        return f"{self.match} → {self.standing}"
+
+
+# ============================
+# Standing Snapshot Model
+# ============================
+class StandingSnapshot(models.Model):
+    """A team's record and table position after one matchday (see matches/snapshots.py)."""
+    season = models.ForeignKey(
+        'dashboard.Season',
+        on_delete=models.CASCADE,
+        related_name="standing_snapshots",
+    )
+    match_type = models.CharField(max_length=50, choices=Standing.MATCH_TYPE_CHOICES)
+    day = models.DateField()
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="standing_snapshots")
+    position = models.PositiveIntegerField()
+    played = models.PositiveIntegerField(default=0)
+    won = models.PositiveIntegerField(default=0)
+    drawn = models.PositiveIntegerField(default=0)
+    lost = models.PositiveIntegerField(default=0)
+    goal_for = models.PositiveIntegerField(default=0)
+    goal_against = models.PositiveIntegerField(default=0)
+    goal_difference = models.GeneratedField(
+        expression=F("goal_for") - F("goal_against"),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+    points = models.GeneratedField(
+        expression=F("won") * 3 + F("drawn"),
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        # Tables as of a day: (season, match_type, day); one row per team
+        unique_together = ("season", "match_type", "day", "team")
+        indexes = [
+            # A team's position series
+            models.Index(fields=["team", "season", "match_type", "day"], name="snapshot_team_series_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.team.name} #{self.position} ({self.match_type} - {self.season}, {self.day})"
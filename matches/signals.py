@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Match, Standing, Team
+from .standings import invalidate_table
+
+
+# Bulk writes (QuerySet.update, bulk_create) send no signals; the ledger
+# invalidates the tables it changes itself, see ledger.py
+@receiver([post_save, post_delete], sender=Match)
+@receiver([post_save, post_delete], sender=Standing)
+def invalidate_standings_table(sender, instance, **kwargs):
+    invalidate_table(instance.season_id, instance.match_type)
+
+
+# Cached tables and the homepage widget show team names and logos. A
+# deleted team is handled before the delete, while its standings still
+# say which tables it is in.
+@receiver([post_save, pre_delete], sender=Team)
+def invalidate_team_tables(sender, instance, **kwargs):
+    tables = (
+        Standing.objects.filter(team_id=instance.pk)
+        .values_list("season_id", "match_type")
+        .distinct()
+    )
+    for season_id, match_type in tables:
+        invalidate_table(season_id, match_type)
@@ -0,0 +1,149 @@
+"""
+Matchday snapshots of the standings: tables as of a date, position series.
+
+A matchday is a day on which a competition had results. After each one,
+every team in the table (played or not) gets a StandingSnapshot row with
+its cumulative record and its table position, ranked like
+``standings_table()``.
+``table_as_of()`` and ``position_series()`` then read history in one
+indexed query each, instead of replaying the matches.
+
+Snapshots are running sums over the ledger, whose StandingEntry rows
+carry their matchday. The database computes each team's running totals
+with a SUM() OVER (PARTITION BY team ORDER BY day) window, see
+``running_totals()``; Python only carries them across the matchdays a
+team sat out and ranks each table.
+``refresh_snapshots(season_id, match_type, since)`` rewrites one table
+from ``since`` on. It starts from the table on the last matchday before
+that day and adds the running totals from then on, so entering the
+latest result only rewrites the latest matchday (a team new to the table
+rewrites all of them). The
+ledger calls it whenever it changes a table (see ledger.py). Without
+``since`` the whole table is built in one pass, which is what the
+``backfill_standing_snapshots`` command does for past seasons.
+"""
+
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F, Subquery, Sum, Window
+
+from .models import Standing, StandingEntry, StandingSnapshot
+from .standings import DEFAULT_MATCH_TYPE
+
+
+STAT_FIELDS = ("played", "won", "drawn", "lost", "goal_for", "goal_against")
+
+
+def _table_key(stats):
+    # Same order as standings.TABLE_ORDER, best first once reversed
+    played, won, drawn, lost, goal_for, goal_against = stats
+    return (won * 3 + drawn, goal_for - goal_against, goal_for, -goal_against)
+
+
+def running_totals(entries):
+    """
+    (day, team_id, *stats) of each team after each of its matchdays in
+    ``entries``, ordered by day. The stats are that team's totals over
+    ``entries`` up to and including the day, summed by the database.
+    """
+    # The default RANGE frame takes in every entry of the same day
+    cumulative = {
+        f"total_{field}": Window(Sum(field), partition_by=F("standing__team_id"), order_by=F("day").asc())
+        for field in STAT_FIELDS
+    }
+    return (
+        entries.annotate(**cumulative)
+        .values_list("day", "standing__team_id", *cumulative)
+        .distinct()
+        .order_by("day", "standing__team_id")
+    )
+
+
+def matchday_rows(season_id, match_type, totals, running):
+    """
+    StandingSnapshot rows for every matchday in ``running``.
+
+    ``totals`` ({team_id: [stat, ...]}) is the table before the first of
+    them and is updated in place. ``running`` holds the running totals
+    since then, as running_totals() returns them.
+    """
+    before = {team_id: stats for team_id, stats in totals.items()}
+    for day, day_totals in groupby(running, key=lambda row: row[0]):
+        for _, team_id, *stats in day_totals:
+            start = before.get(team_id, [0] * len(STAT_FIELDS))
+            totals[team_id] = [a + b for a, b in zip(start, stats)]
+
+        ranked = sorted(totals.items(), key=lambda item: _table_key(item[1]), reverse=True)
+        position, previous = 0, None
+        for index, (team_id, stats) in enumerate(ranked, start=1):
+            key = _table_key(stats)
+            if key != previous:
+                # RANK(): teams level on every criterion share a position
+                position, previous = index, key
+            yield StandingSnapshot(
+                season_id=season_id,
+                match_type=match_type,
+                day=day,
+                team_id=team_id,
+                position=position,
+                **dict(zip(STAT_FIELDS, stats)),
+            )
+
+
+@transaction.atomic
+def refresh_snapshots(season_id, match_type, since=None, batch_size=500):
+    """Rebuild the snapshots of one table from matchday ``since`` (default: all). Returns rows written."""
+    table = StandingSnapshot.objects.filter(season_id=season_id, match_type=match_type)
+    entries = StandingEntry.objects.filter(
+        standing__season_id=season_id, standing__match_type=match_type
+    )
+
+    # Teams yet to play are in the table too, on zero
+    totals = {
+        team_id: [0] * len(STAT_FIELDS)
+        for team_id in Standing.objects.filter(season_id=season_id, match_type=match_type).values_list(
+            "team_id", flat=True
+        )
+    }
+    if since is not None:
+        previous_day = table.filter(day__lt=since).order_by("-day").values("day")[:1]
+        previous = {
+            team_id: list(stats)
+            for team_id, *stats in table.filter(day=Subquery(previous_day)).values_list("team_id", *STAT_FIELDS)
+        }
+        # A team that joined (or left) the table since changes every
+        # matchday, so only carry on when the teams are the same
+        if not previous or previous.keys() == totals.keys():
+            totals.update(previous)
+            entries = entries.filter(day__gte=since)
+            table = table.filter(day__gte=since)
+
+    rows = list(matchday_rows(season_id, match_type, totals, running_totals(entries)))
+    table.delete()
+    StandingSnapshot.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+# ============================
+#  Reading
+# ============================
+
+def table_as_of(day, match_type=DEFAULT_MATCH_TYPE, season=None):
+    """The table after the last matchday on or before ``day``, best first, with ``position``."""
+    table = StandingSnapshot.objects.filter(season=season, match_type=match_type)
+    last_matchday = table.filter(day__lte=day).order_by("-day").values("day")[:1]
+    return (
+        table.filter(day=Subquery(last_matchday))
+        .select_related("team")
+        .order_by("position", "team__name")
+    )
+
+
+def position_series(team, match_type=DEFAULT_MATCH_TYPE, season=None):
+    """[(day, position, points), ...] of ``team`` after each matchday, for charts."""
+    return list(
+        StandingSnapshot.objects.filter(team=team, season=season, match_type=match_type)
+        .order_by("day")
+        .values_list("day", "position", "points")
+    )
@@ -0,0 +1,227 @@
+"""
+League tables, ordered and ranked by the database.
+
+``standings_table()`` returns the standings of one competition and season
+ordered by points, goal difference and goals scored (then fewest goals
+conceded). Each row is annotated with its ``position`` from a RANK()
+window over the same ordering, so teams level on all four share a
+position. The queryset is lazy: slice it to fetch only the rows a page
+shows, e.g. ``standings_table(match_type, season)[:5]``.
+
+``table_season()`` picks the season a page shows by default: the latest
+one with standings in the competition, else the current season.
+
+``top_of_table()`` backs the homepage widget: the first N rows through
+the table index, plus the club's own row (ranked with one count query)
+when it is further down.
+
+``cached_table()`` is what the views render: the table as a list, cached
+per (season, match_type) under a version counter. Any change to a
+table's matches or standings (see signals.py and ledger.py) bumps its
+version once the transaction commits, so the next request builds it
+afresh and stale entries simply expire. ``cache_stats()`` reports the
+hits and misses of this process.
+
+The version is bumped in the cache of the process that made the change.
+Other workers only see it through a shared backend (see settings.CACHES);
+with a per-process LocMemCache their tables are kept LOCAL_TIMEOUT
+seconds instead, so a change reaches every worker within that time.
+
+Configuration lives in ``settings.STANDINGS_CACHE``:
+    - TIMEOUT: seconds a table stays cached when nothing changes it.
+    - LOCAL_TIMEOUT: the same, when the cache backend is per-process.
+
+and the homepage widget's in ``settings.HOMEPAGE_STANDINGS``:
+    - MATCH_TYPE: the competition shown.
+    - TOP: how many rows are shown (the club's row comes on top of these).
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import Rank
+
+from dashboard.models import Season, get_current_season
+
+from .models import Standing
+
+
+DEFAULTS = {
+    "TIMEOUT": 60 * 60 * 24,
+    "LOCAL_TIMEOUT": 60,
+}
+
+DEFAULT_MATCH_TYPE = "division_two"
+
+HOMEPAGE_DEFAULTS = {
+    "MATCH_TYPE": DEFAULT_MATCH_TYPE,
+    "TOP": 5,
+}
+
+CACHE_PREFIX = "standings"
+
+# Table order, best first
+TABLE_ORDER = (
+    F("points").desc(),
+    F("goal_difference").desc(),
+    F("goal_for").desc(),
+    F("goal_against").asc(),
+)
+
+
+def standings_table(match_type=DEFAULT_MATCH_TYPE, season=None):
+    """Standings of ``match_type`` in ``season``, best first, with ``position``."""
+    return (
+        Standing.objects.filter(match_type=match_type, season=season)
+        .select_related("team")
+        .annotate(position=Window(Rank(), order_by=TABLE_ORDER))
+        .order_by(*TABLE_ORDER, "team__name")
+    )
+
+
+def position_of(standing):
+    """RANK() of ``standing`` in its table: one more than the rows ahead of it."""
+    points, goal_difference, goal_for = standing.points, standing.goal_difference, standing.goal_for
+    ahead = (
+        Q(points__gt=points)
+        | Q(points=points, goal_difference__gt=goal_difference)
+        | Q(points=points, goal_difference=goal_difference, goal_for__gt=goal_for)
+        | Q(points=points, goal_difference=goal_difference, goal_for=goal_for,
+            goal_against__lt=standing.goal_against)
+    )
+    return Standing.objects.filter(
+        season_id=standing.season_id, match_type=standing.match_type
+    ).filter(ahead).count() + 1
+
+
+def top_of_table(match_type, season, top, team_name=None):
+    """
+    The first ``top`` rows of a table, and ``team_name``'s row if it is lower.
+
+    Returns (rows, club_row); club_row is None when the club is among the
+    rows or has no standing in this table.
+    """
+    rows = list(standings_table(match_type, season)[:top])
+    if team_name is None or any(row.team.name == team_name for row in rows):
+        return rows, None
+
+    club_row = (
+        Standing.objects.filter(match_type=match_type, season=season, team__name=team_name)
+        .select_related("team")
+        .first()
+    )
+    if club_row is not None:
+        club_row.position = position_of(club_row)
+    return rows, club_row
+
+
+def table_season(match_type=DEFAULT_MATCH_TYPE):
+    """Latest season with ``match_type`` standings, falling back to the current one."""
+    season = (
+        Season.objects.filter(standings__match_type=match_type)
+        .distinct()
+        .order_by("-start_date")
+        .first()
+    )
+    return season or get_current_season()
+
+
+def find_season(value):
+    """The Season named ``value`` ("2024/2025") or with that id, or None."""
+    seasons = Season.objects.filter(id=value) if str(value).isdigit() else Season.objects.filter(name=value)
+    return seasons.first()
+
+
+def get_standings_cache_config():
+    return {**DEFAULTS, **getattr(settings, "STANDINGS_CACHE", {})}
+
+
+def get_homepage_standings_config():
+    return {**HOMEPAGE_DEFAULTS, **getattr(settings, "HOMEPAGE_STANDINGS", {})}
+
+
+# ============================
+#  Caching
+# ============================
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups * 100, 1) if lookups else None,
+    }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def cache_is_per_process():
+    """True when the cache backend is LocMemCache, which other processes never see."""
+    return isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def cache_timeout():
+    """Seconds anything cached under a table version is kept (see the module docstring)."""
+    config = get_standings_cache_config()
+    if cache_is_per_process():
+        return min(config["TIMEOUT"], config["LOCAL_TIMEOUT"])
+    return config["TIMEOUT"]
+
+
+def _version_key(season_id, match_type):
+    return f"{CACHE_PREFIX}:version:{season_id}:{match_type}"
+
+
+def table_version(season_id, match_type):
+    # A counter that was evicted restarts from the clock, never from a
+    # number an older cached table may still be stored under
+    key = _version_key(season_id, match_type)
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def invalidate_table(season_id, match_type):
+    """Drop the cached (season, match_type) table once the current transaction commits."""
+    key = _version_key(season_id, match_type)
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def cached_table(match_type=DEFAULT_MATCH_TYPE, season=None):
+    """standings_table() as a list, cached until its matches or standings change."""
+    season_id = season.pk if season else None
+    key = f"{CACHE_PREFIX}:table:{season_id}:{match_type}:{table_version(season_id, match_type)}"
+    table = cache.get(key)
+    if table is not None:
+        _count("hits")
+        return table
+
+    _count("misses")
+    table = list(standings_table(match_type, season))
+    cache.set(key, table, cache_timeout())
+    return table
@@ -1,3 +1,217 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dashboard.models import Season
+from .ledger import apply_match_result, rebuild_standings, revert_match
+from .models import Match, Standing, StandingEntry, StandingSnapshot, Team
+from .snapshots import position_series, running_totals, table_as_of
+
+
+def table_row(team):
+    standing = Standing.objects.get(team=team)
+    return (
+        standing.played, standing.won, standing.drawn, standing.lost,
+        standing.goal_for, standing.goal_against, standing.points,
+    )
+
+
+@override_settings(ANALYTICS_BUFFER={"ENABLED": False}, ANALYTICS_LIVE={"SHARED": False})
+class StandingsLedgerTests(TestCase):
+    # Page requests go through the analytics middleware
+    databases = {"default", "analytics"}
+
+    def setUp(self):
+        cache.clear()
+        self.season = Season.objects.create(
+            name="2025/2026", start_date=date(2025, 9, 1), end_date=date(2026, 6, 30)
+        )
+        self.home = Team.objects.create(name="Nugata FC", season=self.season)
+        self.away = Team.objects.create(name="Keta FC", season=self.season)
+        self.match = Match.objects.create(
+            home_team=self.home, away_team=self.away, season=self.season,
+            date=datetime(2025, 10, 4, 15, tzinfo=timezone.utc),
+            status="finished", home_score=2, away_score=1,
+        )
+
+    def test_result_is_applied_once(self):
+        apply_match_result(self.match)
+        apply_match_result(self.match)
+
+        self.assertEqual(table_row(self.home), (1, 1, 0, 0, 2, 1, 3))
+        self.assertEqual(table_row(self.away), (1, 0, 0, 1, 1, 2, 0))
+        self.assertEqual(StandingEntry.objects.count(), 2)
+
+    def test_score_edit_applies_the_difference(self):
+        apply_match_result(self.match)
+        # Another result for the home team, entered in between
+        other = Match.objects.create(
+            home_team=self.home, away_team=self.away, season=self.season,
+            date=datetime(2025, 10, 11, 15, tzinfo=timezone.utc),
+            status="finished", home_score=0, away_score=0,
+        )
+        apply_match_result(other)
+
+        self.match.home_score = 1
+        apply_match_result(self.match)
+
+        self.assertEqual(table_row(self.home), (2, 0, 2, 0, 1, 1, 2))
+        self.assertEqual(table_row(self.away), (2, 0, 2, 0, 1, 1, 2))
+
+        revert_match(other)
+        self.assertEqual(table_row(self.home), (1, 0, 1, 0, 1, 1, 1))
+
+    def test_rebuild_matches_incremental_results(self):
+        other = Match.objects.create(
+            home_team=self.away, away_team=self.home, season=self.season,
+            date=datetime(2025, 10, 11, 15, tzinfo=timezone.utc),
+            status="finished", home_score=4, away_score=4,
+        )
+        apply_match_result(self.match)
+        apply_match_result(other)
+        incremental = [table_row(self.home), table_row(self.away)]
+
+        # Stale figures are overwritten
+        Standing.objects.update(won=9, goal_for=9)
+        # home and away totals, ledger read, tables in scope, clear, reset,
+        # upsert, ledger insert, then the table's snapshots: teams, read,
+        # clear, insert (+ savepoints and releases)
+        with self.assertNumQueries(16):
+            self.assertEqual(rebuild_standings(season=self.season), 2)
+        self.assertEqual([table_row(self.home), table_row(self.away)], incremental)
+        self.assertEqual(StandingEntry.objects.count(), 4)
+
+        # The command takes a season name as well as an id
+        call_command("update_all_standings", season="2025/2026", stdout=StringIO())
+        call_command("update_all_standings", season=str(self.season.id), stdout=StringIO())
+        self.assertEqual([table_row(self.home), table_row(self.away)], incremental)
+
+    def test_views_keep_standings_in_step(self):
+        self.client.force_login(User.objects.create_user("staff", password="secret"))
+        upcoming = Match.objects.create(
+            home_team=self.away, away_team=self.home, season=self.season,
+            date=datetime(2025, 10, 18, 15, tzinfo=timezone.utc),
+        )
+
+        self.client.post(reverse("dashboard:manage_match"), {
+            "form_mode": "results", "match_selector": upcoming.id, "match_id": upcoming.id,
+            "home_score": 3, "away_score": 0,
+        })
+        self.assertEqual(table_row(self.away), (1, 1, 0, 0, 3, 0, 3))
+
+        self.client.post(reverse("dashboard:match_edit", args=[upcoming.id]), {
+            "home_team": self.away.id, "away_team": self.home.id,
+            "date": "2025-10-18T15:00", "location": "Keta", "match_type": "division_two",
+            "season": self.season.id, "home_score": 3, "away_score": 3,
+        })
+        self.assertEqual(table_row(self.away), (1, 0, 1, 0, 3, 3, 1))
+
+        self.client.post(reverse("dashboard:match_delete", args=[upcoming.id]))
+        self.assertEqual(table_row(self.away), (0, 0, 0, 0, 0, 0, 0))
+        self.assertFalse(StandingEntry.objects.exists())
+
+
+@override_settings(ANALYTICS_BUFFER={"ENABLED": False}, ANALYTICS_LIVE={"SHARED": False})
+class StandingSnapshotTests(TestCase):
+    databases = {"default", "analytics"}
+
+    def setUp(self):
+        cache.clear()
+        self.season = Season.objects.create(
+            name="2025/2026", start_date=date(2025, 9, 1), end_date=date(2026, 6, 30)
+        )
+        self.nugata, self.keta, self.tema = (
+            Team.objects.create(name=name, season=self.season)
+            for name in ("Nugata FC", "Keta FC", "Tema FC")
+        )
+
+    def play(self, day, home, away, home_score, away_score):
+        match = Match.objects.create(
+            home_team=home, away_team=away, season=self.season,
+            date=datetime(2025, 10, day, 15, tzinfo=timezone.utc),
+            status="finished", home_score=home_score, away_score=away_score,
+        )
+        apply_match_result(match)
+        return match
+
+    def table(self, day):
+        return [
+            (row.team.name, row.position, row.points)
+            for row in table_as_of(date(2025, 10, day), season=self.season)
+        ]
+
+    def test_results_keep_matchday_tables(self):
+        self.play(4, self.nugata, self.keta, 2, 0)
+        self.play(11, self.keta, self.nugata, 3, 0)
+        self.play(11, self.tema, self.keta, 1, 1)
+
+        self.assertEqual(self.table(3), [])
+        # Between matchdays, the table after the last one; Tema, who joined
+        # the table later, are in it on zero
+        self.assertEqual(
+            self.table(8), [("Nugata FC", 1, 3), ("Tema FC", 2, 0), ("Keta FC", 3, 0)]
+        )
+        self.assertEqual(
+            self.table(20), [("Keta FC", 1, 4), ("Nugata FC", 2, 3), ("Tema FC", 3, 1)]
+        )
+        self.assertEqual(
+            position_series(self.nugata, season=self.season),
+            [(date(2025, 10, 4), 1, 3), (date(2025, 10, 11), 2, 3)],
+        )
+
+        with self.assertNumQueries(1):
+            self.table(20)
+
+        # Running totals come from one windowed query, a row per team and
+        # matchday, with Keta's two results of the 11th in a single row
+        with self.assertNumQueries(1):
+            running = list(running_totals(StandingEntry.objects.filter(standing__season=self.season)))
+        keta = [row for row in running if row[1] == self.keta.pk]
+        self.assertEqual(keta, [
+            (date(2025, 10, 4), self.keta.pk, 1, 0, 0, 1, 0, 2),
+            (date(2025, 10, 11), self.keta.pk, 3, 1, 1, 1, 4, 3),
+        ])
+
+    def test_edits_rewrite_from_the_matchday_changed(self):
+        first = self.play(4, self.nugata, self.keta, 2, 0)
+        self.play(11, self.keta, self.nugata, 3, 0)
+        earlier = StandingSnapshot.objects.get(day=date(2025, 10, 4), team=self.keta)
+
+        # A new result only rewrites the latest matchday
+        self.play(18, self.nugata, self.keta, 1, 0)
+        self.assertTrue(StandingSnapshot.objects.filter(pk=earlier.pk).exists())
+        self.assertEqual(self.table(18)[0], ("Nugata FC", 1, 6))
+
+        # Editing an old score carries through to every later matchday
+        first.home_score, first.away_score = 0, 2
+        apply_match_result(first)
+        self.assertEqual(self.table(4), [("Keta FC", 1, 3), ("Nugata FC", 2, 0)])
+        self.assertEqual(self.table(18)[0], ("Keta FC", 1, 6))
+
+        revert_match(first)
+        self.assertEqual(self.table(4), [])
+        incremental = list(StandingSnapshot.objects.values_list("day", "team", "position", "points"))
+
+        # The backfill rebuilds the same snapshots from scratch
+        StandingSnapshot.objects.all().delete()
+        call_command("backfill_standing_snapshots", season="2025/2026", stdout=StringIO())
+        self.assertCountEqual(
+            StandingSnapshot.objects.values_list("day", "team", "position", "points"), incremental
+        )
+
+    def test_full_standings_as_of_date(self):
+        self.play(4, self.nugata, self.keta, 2, 0)
+        self.play(11, self.keta, self.nugata, 3, 0)
+
+        response = self.client.get(
+            reverse("standings:full_standings"), {"season": self.season.id, "as_of": "2025-10-05"}
+        )
+        self.assertEqual(
+            [(row.team.name, row.points) for row in response.context["standings"]],
+            [("Nugata FC", 3), ("Keta FC", 0)],
+        )
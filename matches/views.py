@@ -9,18 +9,20 @@ This module handles:
 
 Dependencies:
     - Django shortcuts, messages, authentication decorators
-    - Models: Team, Match, Standing, ClubGeneralSettings, Season
+    - Models: Team, Match, ClubGeneralSettings, Season
     - Forms: TeamForm, MatchForm, MatchResultForm
 """
 
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Team, Match, Standing
+from .models import Team, Match
 from dashboard.models import ClubGeneralSettings
-from .forms import TeamForm, MatchForm, MatchResultForm
+from .forms import TeamForm, MatchForm, MatchResultForm, FinishedMatchForm
+from .ledger import apply_match_result, revert_match
 from django.http import JsonResponse
 from dashboard.models import Season, get_current_season
 
@@ -277,6 +279,9 @@ def match_edit(request, pk):
     """
     Edit match details (but keep its status unchanged).
 
+    A finished match's score can be corrected too; the standings then
+    change by the difference only (see matches/ledger.py).
+
     Args:
         request (HttpRequest)
         pk (int): Match ID.
@@ -285,16 +290,20 @@ def match_edit(request, pk):
         HttpResponse: Rendered "dashboard/match_form.html".
     """
     match = get_object_or_404(Match, pk=pk)
-    
+    status = match.status
+    form_class = FinishedMatchForm if match.is_finished else MatchForm
+
     if request.method == "POST":
-        match_form = MatchForm(request.POST, instance=match)
+        match_form = form_class(request.POST, instance=match)
         if match_form.is_valid():
             m = match_form.save(commit=False)
-            m.status = match.status  # preserve match status
-            m.save()
+            m.status = status  # preserve match status
+            with transaction.atomic():
+                m.save()
+                apply_match_result(m)
             return redirect("dashboard:match_manager")
     else:
-        match_form = MatchForm(instance=match)
+        match_form = form_class(instance=match)
 
     return render(request, "dashboard/match_form.html", {
         "match_form": match_form,
@@ -320,34 +329,10 @@ def match_delete(request, pk):
     """
     match = get_object_or_404(Match, pk=pk)
 
-    # Revert standings update if match was finished
-    if match.status == "finished":
-        for team, goals_for, goals_against in [
-            (match.home_team, match.home_score, match.away_score),
-            (match.away_team, match.away_score, match.home_score),
-        ]:
-            standing = Standing.objects.get(
-                team=team, 
-                match_type=match.match_type, 
-                season=match.season
-            )
-            standing.played -= 1
-            standing.goal_for -= goals_for
-            standing.goal_against -= goals_against
-
-            if goals_for > goals_against:
-                standing.won -= 1
-                standing.points -= 3
-            elif goals_for < goals_against:
-                standing.lost -= 1
-            else:
-                standing.drawn -= 1
-                standing.points -= 1
-
-            standing.goal_difference = standing.goal_for - standing.goal_against
-            standing.save()
-
-    match.delete()
+    # Take a finished match's result back out of the standings
+    with transaction.atomic():
+        revert_match(match)
+        match.delete()
     return redirect("dashboard:match_manager")
 
 
@@ -130,9 +130,18 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Page views, visitor sessions and rollups (see dashboard/routers.py),
+    # so analytics writes never hold the content database's writer lock
+    'analytics': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'analytics.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = ['dashboard.routers.AnalyticsRouter']
+ANALYTICS_DATABASE = 'analytics'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -195,3 +204,96 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 TEAM_NAME = "Nugata FC"
 
+
+# Analytics ingestion (see dashboard/ingest.py)
+# Tracked hits are queued in-process and written in batches by a background
+# flusher instead of on the request thread.
+ANALYTICS_BUFFER = {
+    "ENABLED": True,
+    "MAX_SIZE": 10000,          # hits held in memory at most
+    "FLUSH_INTERVAL_MS": 1000,  # flush at least this often...
+    "FLUSH_BATCH_SIZE": 500,    # ...or as soon as this many hits are waiting
+    "ON_FULL": "drop",          # "drop" or "block" (up to BLOCK_TIMEOUT_MS)
+    "BLOCK_TIMEOUT_MS": 50,
+}
+
+# Returning visitor sessions get their end_time/page_count written at most
+# this often; hits in between are coalesced in memory (see dashboard/ingest.py)
+ANALYTICS_HEARTBEAT_SECONDS = 30
+
+# Distinct user-agent strings kept in the parse cache (see dashboard/ua.py)
+ANALYTICS_UA_CACHE_SIZE = 1024
+
+# 1-in-N visitor sampling, with an automatic surge mode when the write
+# queue or request latency gets too high (see dashboard/sampling.py)
+ANALYTICS_SAMPLING = {
+    "RATE": 1,                  # normal rate, 1 = track every visitor
+    "SURGE_RATE": 8,            # keep this a multiple of RATE
+    "SURGE_QUEUE_SIZE": 5000,   # buffered hits that trigger surge mode...
+    "SURGE_LATENCY_MS": 1500,   # ...or average request latency
+    "COOLDOWN_SECONDS": 120,    # calm period before switching back
+}
+
+# Crawlers and link-preview fetchers (see dashboard/ua.is_bot) are never
+# recorded as visitors
+ANALYTICS_BOTS = {
+    "MODE": "count",          # "count" per day in BotTraffic, or "drop"
+    "EXTRA_SIGNATURES": (),   # UA substrings added to DEFAULT_BOT_SIGNATURES
+}
+
+# URL namespaces recorded as page views; everything else (dashboard, admin,
+# ckeditor uploads, static/media) is ignored (see dashboard/tracking.py)
+ANALYTICS_TRACKED_NAMESPACES = ("home", "news", "players", "matches", "standings")
+
+# Signed, long-lived analytics visitor cookie, used instead of Django
+# sessions so public pages stay session-free (see dashboard/visitor.py)
+ANALYTICS_VISITOR_COOKIE = {
+    "NAME": "visitor_id",
+    "MAX_AGE": 60 * 60 * 24 * 365 * 2,  # two years
+    "SALT": "dashboard.visitor",
+}
+
+
+# Raw page views older than DAYS are archived to gzip NDJSON files, one set
+# per month, then deleted in small batches (see dashboard/retention.py)
+ANALYTICS_RETENTION = {
+    "DAYS": 400,
+    "DIRECTORY": BASE_DIR / "analytics_archive",
+    "BATCH_SIZE": 2000,       # rows deleted per transaction
+    "BATCH_PAUSE_MS": 50,     # pause between batches so tracking writes get in
+}
+
+# Analytics dashboard figures are cached per date range; ranges that include
+# today expire quickly, closed ones are kept for a day (see dashboard/report.py)
+ANALYTICS_DASHBOARD_CACHE = {
+    "LIVE_TTL": 60,
+    "HISTORICAL_TTL": 60 * 60 * 24,
+    "LOCK_TIMEOUT": 30,   # seconds to wait for another worker's computation
+}
+
+# League tables are cached per (season, match type) until a result or
+# standing changes them (see matches/standings.py). The change only reaches
+# other worker processes through a shared CACHES backend (Redis, database,
+# file); with the default per-process LocMemCache, tables are kept for
+# LOCAL_TIMEOUT seconds instead.
+STANDINGS_CACHE = {
+    "TIMEOUT": 60 * 60 * 24,
+    "LOCAL_TIMEOUT": 60,
+}
+
+# Homepage league table: top rows of this competition in the current
+# season, plus the club's own row when it is lower down
+HOMEPAGE_STANDINGS = {
+    "MATCH_TYPE": "division_two",
+    "TOP": 5,
+}
+
+# In-memory "active now" counter fed by AnalyticsMiddleware; with several
+# worker processes each publishes its window so the counts can be merged
+# (see dashboard/live.py)
+ANALYTICS_LIVE = {
+    "WINDOW_SECONDS": 300,
+    "SHARED": True,
+    "PUBLISH_SECONDS": 5,
+    "STALE_SECONDS": 30,
+}
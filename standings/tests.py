@@ -1,3 +1,199 @@
-from django.test import TestCase
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dashboard.models import Season
+from home.views import standings_widget
+from matches.ledger import apply_match_result
+from matches.models import Match, Standing, Team
+from matches.standings import (
+    cache_stats, cache_timeout, cached_table, reset_cache_stats, standings_table,
+)
+
+
+@override_settings(ANALYTICS_BUFFER={"ENABLED": False}, ANALYTICS_LIVE={"SHARED": False})
+class StandingsTableTests(TestCase):
+    # Page requests go through the analytics middleware
+    databases = {"default", "analytics"}
+
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.season = Season.objects.create(
+            name="2025/2026", start_date=date(2025, 9, 1), end_date=date(2026, 6, 30)
+        )
+        # (won, drawn, lost, goal_for, goal_against)
+        records = {
+            "Nugata FC": (3, 1, 0, 9, 2),
+            "Accra Lions": (3, 1, 0, 9, 5),
+            "Tema Youth": (3, 0, 1, 12, 4),
+            "Dreams FC": (3, 0, 1, 12, 4),
+            "Liberty": (0, 0, 4, 1, 10),
+        }
+        for name, (won, drawn, lost, goal_for, goal_against) in records.items():
+            Standing.objects.create(
+                team=Team.objects.create(name=name, season=self.season),
+                season=self.season,
+                won=won, drawn=drawn, lost=lost,
+                goal_for=goal_for, goal_against=goal_against,
+            )
+        # Another competition never leaks into the table
+        Standing.objects.create(
+            team=Team.objects.get(name="Liberty"), season=self.season, match_type="fa_cup", won=5,
+        )
+
+    def test_table_is_ordered_and_ranked_in_sql(self):
+        with self.assertNumQueries(1):
+            table = [(s.team.name, s.position) for s in standings_table(season=self.season)]
+
+        self.assertEqual(table, [
+            ("Nugata FC", 1),
+            ("Accra Lions", 2),
+            # Level on every criterion: same position
+            ("Dreams FC", 3),
+            ("Tema Youth", 3),
+            ("Liberty", 5),
+        ])
+
+    def test_slice_fetches_only_the_top(self):
+        with self.assertNumQueries(1):
+            top = list(standings_table(season=self.season)[:2])
+        self.assertEqual([s.position for s in top], [1, 2])
+
+    def test_points_are_generated_by_the_database(self):
+        # A bulk update never runs save(), yet points and goal difference follow
+        Standing.objects.filter(team__name="Liberty", match_type="division_two").update(
+            drawn=F("drawn") + 2, goal_for=F("goal_for") + 4
+        )
+        liberty = Standing.objects.get(team__name="Liberty", match_type="division_two")
+        self.assertEqual((liberty.points, liberty.goal_difference), (2, -5))
+
+    def test_full_standings_page(self):
+        response = self.client.get(
+            reverse("standings:full_standings"), {"season": self.season.id}
+        )
+        self.assertEqual(
+            [s.team.name for s in response.context["standings"]],
+            ["Nugata FC", "Accra Lions", "Dreams FC", "Tema Youth", "Liberty"],
+        )
+
+    def test_tables_are_cached_until_a_result_changes_them(self):
+        with self.assertNumQueries(1):
+            cached_table(season=self.season)
+        with self.assertNumQueries(0):
+            top = cached_table(season=self.season)[0]
+        self.assertEqual((top.team.name, top.position), ("Nugata FC", 1))
+        self.assertEqual(cache_stats(), {"hits": 1, "misses": 1, "hit_rate": 50.0})
+
+        # Another competition's result leaves this table cached
+        liberty, lions = Team.objects.get(name="Liberty"), Team.objects.get(name="Accra Lions")
+        with self.captureOnCommitCallbacks(execute=True):
+            cup_tie = Match.objects.create(
+                home_team=liberty, away_team=lions, season=self.season, match_type="fa_cup",
+                date=datetime(2025, 10, 4, 15, tzinfo=timezone.utc),
+                status="finished", home_score=1, away_score=0,
+            )
+            apply_match_result(cup_tie)
+        with self.assertNumQueries(0):
+            cached_table(season=self.season)
+
+        # A league result through the ledger (bulk updates, no signals)
+        with self.captureOnCommitCallbacks(execute=True):
+            match = Match.objects.create(
+                home_team=lions, away_team=liberty, season=self.season,
+                date=datetime(2025, 10, 11, 15, tzinfo=timezone.utc),
+                status="finished", home_score=2, away_score=0,
+            )
+            apply_match_result(match)
+        self.assertEqual(cached_table(season=self.season)[0].team.name, "Accra Lions")
+
+        # A standing edited by hand
+        with self.captureOnCommitCallbacks(execute=True):
+            standing = Standing.objects.get(team=liberty, match_type="division_two")
+            standing.won = 10
+            standing.save()
+        self.assertEqual(cached_table(season=self.season)[0].team.name, "Liberty")
+        self.assertEqual(cache_stats()["misses"], 3)
+
+    def promote_liberty(self, worker_cache):
+        # A standing edited by hand in another worker process
+        with mock.patch("matches.standings.cache", worker_cache), \
+                self.captureOnCommitCallbacks(execute=True):
+            standing = Standing.objects.get(team__name="Liberty", match_type="division_two")
+            standing.won = 10
+            standing.save()
+
+    def test_invalidation_reaches_other_workers_through_a_shared_cache(self):
+        shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache"}
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(CACHES={"default": {**shared, "LOCATION": directory}}):
+            self.assertEqual(cache_timeout(), 60 * 60 * 24)
+            self.assertEqual(cached_table(season=self.season)[0].team.name, "Nugata FC")
+
+            self.promote_liberty(caches.create_connection("default"))
+            self.assertEqual(cached_table(season=self.season)[0].team.name, "Liberty")
+
+    def test_per_process_cache_keeps_tables_briefly(self):
+        self.assertEqual(cache_timeout(), 60)
+        self.assertEqual(cached_table(season=self.season)[0].team.name, "Nugata FC")
+
+        # This worker never sees the other one's version bump...
+        self.promote_liberty(LocMemCache("other-worker", {}))
+        self.assertEqual(cached_table(season=self.season)[0].team.name, "Nugata FC")
+        # ...but its table expires after LOCAL_TIMEOUT
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.assertEqual(cached_table(season=self.season)[0].team.name, "Liberty")
+
+    def test_warmup_command(self):
+        # Warming a per-process cache would be lost with the command
+        with self.assertRaisesMessage(CommandError, "per-process"):
+            call_command("warm_standings_cache", season="2025/2026", stdout=StringIO())
+
+        shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache"}
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(CACHES={"default": {**shared, "LOCATION": directory}}):
+            call_command("warm_standings_cache", season="2025/2026", stdout=StringIO())
+            with self.assertNumQueries(0):
+                cached_table("fa_cup", self.season)
+
+    @override_settings(HOMEPAGE_STANDINGS={"MATCH_TYPE": "division_two", "TOP": 2})
+    def test_homepage_widget_shows_top_rows_and_the_club(self):
+        html = standings_widget("Liberty")
+        self.assertInHTML("Nugata FC", html)
+        self.assertInHTML("Accra Lions", html)
+        self.assertNotIn("Dreams FC", html)
+        # The club's row comes with its real position
+        self.assertRegex(html, r"(?s)<td[^>]*>5</td>\s*<td[^>]*>\s*Liberty")
+
+        # Served from the cache until the table changes
+        # Only the current season lookup (two queries, as the test season has ended)
+        with self.assertNumQueries(2):
+            self.assertEqual(standings_widget("Liberty"), html)
+        with self.captureOnCommitCallbacks(execute=True):
+            Standing.objects.filter(team__name="Dreams FC").first().save()
+        # ...plus top rows, club row and its position
+        with self.assertNumQueries(5):
+            standings_widget("Liberty")
+
+        # Renaming a team shown in the widget refreshes it too
+        with self.captureOnCommitCallbacks(execute=True):
+            lions = Team.objects.get(name="Accra Lions")
+            lions.name = "Accra Great Lions"
+            lions.save()
+        html = standings_widget("Liberty")
+        self.assertInHTML("Accra Great Lions", html)
+        self.assertEqual(cached_table(season=self.season)[1].team.name, "Accra Great Lions")
+
+        # ...and so does deleting one
+        with self.captureOnCommitCallbacks(execute=True):
+            Team.objects.get(name="Nugata FC").delete()
+        self.assertNotIn("Nugata FC", standings_widget("Liberty"))
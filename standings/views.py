@@ -1,13 +1,20 @@
 from django.shortcuts import render
+from django.utils.dateparse import parse_date
 from matches.models import Standing
+from matches.snapshots import table_as_of
+from matches.standings import cached_table, table_season
 from django.shortcuts import get_object_or_404
-from dashboard.models import Season, get_current_season
+from dashboard.models import Season
 
 
 def full_standings(request):
     # --- inputs ---
     match_type = request.GET.get("match_type", "division_two")
     selected_season_id = request.GET.get("season")
+    try:
+        as_of = parse_date(request.GET.get("as_of", ""))
+    except ValueError:
+        as_of = None
 
     # --- available seasons for this match_type ---
     available_seasons = (
@@ -20,31 +27,14 @@ def full_standings(request):
     if selected_season_id:
         season = get_object_or_404(Season, id=selected_season_id)
     else:
-        season = available_seasons.first()
-        if not season:
-            season = get_current_season()
-
-    # --- standings queryset ---
-    standings = Standing.objects.filter(
-        match_type=match_type,
-        season=season,
-    )
-
-    # --- calculate points & GD ---
-    for s in standings:
-        s.points = s.won * 3 + s.drawn
-        s.goal_difference = s.goal_for - s.goal_against
+        season = table_season(match_type)
 
-    # --- sort standings ---
-    standings = sorted(
-        standings,
-        key=lambda s: (s.points, s.goal_difference, s.goal_for, -s.goal_against),
-        reverse=True,
-    )
-
-    # --- assign positions ---
-    for idx, s in enumerate(standings, start=1):
-        s.position = idx
+    # --- standings, ordered and ranked in SQL, cached until a result changes ---
+    # (or the table after the last matchday up to ?as_of=YYYY-MM-DD)
+    if as_of:
+        standings = list(table_as_of(as_of, match_type, season))
+    else:
+        standings = cached_table(match_type, season)
 
     # --- match type display ---
     match_type_display = dict(Standing.MATCH_TYPE_CHOICES).get(match_type, match_type)
@@ -55,6 +45,7 @@ def full_standings(request):
         "season_choices": available_seasons,   # ✅ only relevant seasons
         "selected_match_type": match_type,
         "selected_season": season,
+        "as_of": as_of,
         "selected_match_type_display": match_type_display,
     })
 